@@ -9,6 +9,57 @@ SECRET_KEY = 'django-insecure-z_dk7df48+m8_uxj_o$0=3-%rvt^j0!%hx^%z5^@se+qw@s*(e
 
 REDIS_HOST = os.environ.get('REDIS_HOST', '127.0.0.1')
 REDIS_PORT = os.environ.get('REDIS_PORT', '6379')
+REDIS_DB = int(os.environ.get('REDIS_DB', '0'))
+# 커넥션 풀 (game/redis_manager.py, sync/async 각각 최대 개수)
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', '50'))
+REDIS_POOL_TIMEOUT = 5.0           # 풀이 가득 찼을 때 커넥션 대기(초)
+REDIS_SOCKET_TIMEOUT = 2.0
+REDIS_CONNECT_TIMEOUT = 2.0
+REDIS_HEALTH_CHECK_INTERVAL = 30   # 유휴 커넥션 PING 주기(초)
+
+# 게임 세션 상태를 Redis에 기록하는 주기 (틱 단위, write-behind)
+GAME_CHECKPOINT_TICKS = 10
+# 프로세스 공용 틱 스케줄러: 한 틱을 몇 구간으로 나눠 세션을 분산할지
+GAME_TICK_SLOTS = 10
+# 세션의 적 수가 이 이상이면 numpy 배열 백엔드 사용 (numpy 미설치 시 무시)
+GAME_NUMPY_MIN_ENTITIES = 200
+# 델타 프로토콜(v2): K프레임마다 전체 keyframe
+GAME_KEYFRAME_INTERVAL = 20
+# Ball/EnemyTemplate 캐시: 다른 프로세스의 변경(Redis 버전 키)을 확인하는 주기(초)
+GAME_TEMPLATE_CHECK_INTERVAL = 5.0
+# 컴파일된 스테이지별 웨이브 계획 LRU 크기 (스케줄당)
+GAME_WAVE_PLAN_CACHE = 256
+# 액션(소환/업그레이드)으로 생긴 변경을 내보내는 프레임 사이 최소 간격(초). 틱당 최대 1프레임
+GAME_MIN_BROADCAST_INTERVAL = 0.1
+# 플레이어 액션 입력 큐: 세션당 최대 대기 수(넘으면 거절), 한 틱에 적용하는 최대 수
+GAME_COMMAND_QUEUE_SIZE = 32
+GAME_COMMANDS_PER_TICK = 16
+# 관심 영역 컬링: 화면 가장자리 여유(맵 단위), zoom 1.0 기준 연결당 최대 적 수
+GAME_AOI_MARGIN = 40.0
+GAME_AOI_MAX_ENEMIES = 150
+# 공격 이펙트 이벤트 버퍼 크기 (프레임 사이에 넘치면 오래된 것부터 버림)
+GAME_EFFECT_BUFFER = 256
+# 틱 계측: 세션 하나의 틱 예산(초, 넘으면 overrun), 히스토그램 윈도우(틱), cProfile 저장 위치
+GAME_TICK_BUDGET = 0.02
+GAME_PROFILE_WINDOW_TICKS = 600
+GAME_PROFILE_DIR = BASE_DIR / 'profiles'
+# 세션 소유권 lease TTL(초). 소유 프로세스가 죽으면 이 시간 뒤 다른 연결이 이어받음
+GAME_LEASE_TTL = 5.0
+# Redis 세션 키 만료(초)와 활성 세션의 TTL 연장 주기(초). 버려진 세션은 reap_sessions 로 정리
+GAME_SESSION_TTL = 6 * 3600
+GAME_SESSION_TOUCH_INTERVAL = 60.0
+# PostgreSQL 세션 스냅샷 (Redis 유실 대비): 세션별 주기(초), 모아서 기록하는 주기(초), 한 번에 기록할 최대 세션 수
+GAME_SNAPSHOT_INTERVAL = 30.0
+GAME_SNAPSHOT_FLUSH_INTERVAL = 1.0
+GAME_SNAPSHOT_BATCH_SIZE = 200
+# 시뮬레이션 워커 프로세스 수 (0 = ASGI 프로세스 안에서 틱). >0 이면 run_sim_workers --procs 와 같게, heartbeat 주기(초)
+GAME_SIM_WORKERS = 0
+GAME_SIM_HEARTBEAT = 2.0
+# 소유자가 돌리는 세션에 REST 액션을 넘긴 뒤 응답을 기다리는 시간(초)
+GAME_FORWARD_TIMEOUT = 2.0
+# 큰 세션의 이동/전투 단계를 돌릴 프로세스 풀 크기 (0 = 끔), 이 시간(초)을 넘는 세션만 풀로 (절반 아래로 내려가면 인라인)
+GAME_OFFLOAD_PROCS = 2
+GAME_OFFLOAD_THRESHOLD = 0.03
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'game'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (템플릿 캐시 무효화 receiver 등록)
@@ -0,0 +1,111 @@
+# game/codec.py
+"""
+WebSocket 프레임 인코딩.
+- json    : 기존 텍스트 JSON (기본값, fallback)
+- msgpack : 바이너리. 서브프로토콜 "dotgame.msgpack" 또는 ?encoding=msgpack 로 협상
+
+msgpack 송신 시 좌표 값은 COORD_SCALE 배 정수로 양자화한다 (0.1 단위).
+클라이언트는 COORD_KEYS 필드를 COORD_SCALE로 나눠 쓰면 된다.
+수신(클라이언트 -> 서버) 액션은 양자화하지 않는다.
+"""
+import json
+import time
+from urllib.parse import parse_qs
+
+import msgpack
+
+SUBPROTOCOL_MSGPACK = "dotgame.msgpack"
+COORD_SCALE = 10
+COORD_KEYS = frozenset(("x", "y", "target_x", "target_y", "x1", "y1", "x2", "y2", "dist"))
+
+
+class CodecStats:
+    """
+    연결별 인코딩/디코딩 누적 통계 (JSON 경로와 비교용)
+    """
+    __slots__ = ("frames_out", "bytes_out", "encode_ns", "frames_in", "bytes_in", "decode_ns")
+
+    def __init__(self):
+        self.frames_out = 0
+        self.bytes_out = 0
+        self.encode_ns = 0
+        self.frames_in = 0
+        self.bytes_in = 0
+        self.decode_ns = 0
+
+    def as_dict(self):
+        out = {k: getattr(self, k) for k in self.__slots__}
+        out["bytes_per_frame"] = self.bytes_out / self.frames_out if self.frames_out else 0.0
+        out["encode_us_per_frame"] = (self.encode_ns / self.frames_out / 1000) if self.frames_out else 0.0
+        return out
+
+
+def quantize(obj):
+    if isinstance(obj, dict):
+        return {
+            k: (round(v * COORD_SCALE) if k in COORD_KEYS and isinstance(v, (int, float)) else quantize(v))
+            for k, v in obj.items()
+        }
+    if isinstance(obj, list):
+        return [quantize(v) for v in obj]
+    return obj
+
+
+class JsonCodec:
+    name = "json"
+    binary = False
+
+    def __init__(self):
+        self.stats = CodecStats()
+
+    def encode(self, content):
+        t = time.perf_counter_ns()
+        data = json.dumps(content)
+        self.stats.encode_ns += time.perf_counter_ns() - t
+        self.stats.frames_out += 1
+        self.stats.bytes_out += len(data.encode())
+        return data
+
+    def decode(self, data):
+        t = time.perf_counter_ns()
+        content = json.loads(data)
+        self.stats.decode_ns += time.perf_counter_ns() - t
+        self.stats.frames_in += 1
+        self.stats.bytes_in += len(data)
+        return content
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        self.stats = CodecStats()
+
+    def encode(self, content):
+        t = time.perf_counter_ns()
+        data = msgpack.packb(quantize(content), use_bin_type=True)
+        self.stats.encode_ns += time.perf_counter_ns() - t
+        self.stats.frames_out += 1
+        self.stats.bytes_out += len(data)
+        return data
+
+    def decode(self, data):
+        t = time.perf_counter_ns()
+        content = msgpack.unpackb(data, raw=False)
+        self.stats.decode_ns += time.perf_counter_ns() - t
+        self.stats.frames_in += 1
+        self.stats.bytes_in += len(data)
+        return content
+
+
+def negotiate(scope):
+    """
+    return (codec, 수락할 subprotocol 또는 None)
+    """
+    if SUBPROTOCOL_MSGPACK in scope.get("subprotocols", []):
+        return MsgpackCodec(), SUBPROTOCOL_MSGPACK
+    qs = parse_qs(scope.get("query_string", b"").decode())
+    if qs.get("encoding", [""])[0] == "msgpack":
+        return MsgpackCodec(), None
+    return JsonCodec(), None
@@ -0,0 +1,88 @@
+# game/commands.py
+"""
+플레이어 액션 입력 큐 (세션당 하나, 크기 제한).
+
+consumer 는 메시지를 받으면 parse_command 로 검증만 하고 큐에 넣는다.
+실제 적용은 simulation.step 시작 부분에서 도착 순서대로 한 번에 (apply_commands).
+큐가 가득 차면 push 가 False => 그 자리에서 거절 (flood 방지).
+"""
+import math
+from collections import deque
+from typing import Any, NamedTuple
+
+from django.conf import settings
+
+from .spatial import MAP_WIDTH, MAP_HEIGHT
+
+QUEUE_SIZE = int(getattr(settings, 'GAME_COMMAND_QUEUE_SIZE', 32))
+# 한 틱에 적용하는 최대 명령 수 (나머지는 다음 틱)
+MAX_PER_TICK = int(getattr(settings, 'GAME_COMMANDS_PER_TICK', 16))
+
+
+class CommandError(ValueError):
+    pass
+
+
+class Command(NamedTuple):
+    kind: str
+    args: tuple
+    # 적용 결과를 받을 곳 (consumer 의 reply 함수 등). 시뮬레이션은 건드리지 않음
+    reply: Any = None
+
+
+class CommandQueue:
+    def __init__(self, maxlen=QUEUE_SIZE):
+        self.maxlen = maxlen
+        self.items = deque()
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def push(self, cmd):
+        if len(self.items) >= self.maxlen:
+            self.rejected += 1
+            return False
+        self.items.append(cmd)
+        return True
+
+    def drain(self, limit=MAX_PER_TICK):
+        n = min(limit, len(self.items))
+        return [self.items.popleft() for _ in range(n)]
+
+
+def _coord(v, hi):
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        raise CommandError("invalid coordinate")
+    if not math.isfinite(v):
+        raise CommandError("invalid coordinate")
+    return min(max(v, 0.0), float(hi))
+
+
+def parse_command(content):
+    """
+    move_ball / upgrade_color / spawn_enemy 메시지 검증 => (kind, args)
+    summon_ball 은 템플릿 pick 이 필요해서 consumer 가 직접 만든다
+    spawn_enemy 는 REST 가 소유자에게 넘기는 것만 (GAME_ACTIONS 에 없어서 클라이언트는 못 보냄)
+    """
+    action = content.get("action")
+    if action == "move_ball":
+        idx = content.get("ball_idx", 0)
+        if not isinstance(idx, int) or isinstance(idx, bool):
+            raise CommandError("invalid ball idx")
+        return action, (idx, _coord(content.get("tx", 200), MAP_WIDTH),
+                        _coord(content.get("ty", 200), MAP_HEIGHT))
+    if action == "upgrade_color":
+        from .simulation import COLORS
+        color = content.get("color", "red")
+        if color not in COLORS:
+            raise CommandError("invalid color")
+        return action, (color,)
+    if action == "spawn_enemy":
+        stage = content.get("stage", 1)
+        if not isinstance(stage, int) or isinstance(stage, bool) or stage < 1:
+            raise CommandError("invalid stage")
+        return action, (stage,)
+    raise CommandError("unknown action")
@@ -0,0 +1,96 @@
+# game/delta.py
+"""
+tick_update 델타 압축 (protocol v2).
+
+broadcast_state가 보낸 전체 payload를 연결(클라이언트)별로 받아서,
+클라이언트가 마지막으로 ack한 프레임 대비 생성/변경/삭제된 엔티티만 보낸다.
+- 엔티티는 "id"로 식별. 변경된 엔티티는 바뀐 필드 + id 만 보냄
+- ack한 프레임이 없거나(접속 직후), resync 요청, K프레임마다 => keyframe(전체)
+- protocol v1(기존 클라이언트)은 이 인코더를 거치지 않고 전체 payload를 받는다
+
+v2 프레임 예:
+    {"kind":"tick_update","v":2,"frame":12,"base":10,"keyframe":false,
+     "enemies":{"set":[{"id":3,"dist":120.5,...}],"del":[1]},
+     "balls":{"set":[],"del":[]}, "upgrades":{...}(변경 시에만), ...}
+"""
+from collections import OrderedDict
+
+from django.conf import settings
+
+PROTOCOL_FULL = 1
+PROTOCOL_DELTA = 2
+
+KEYFRAME_INTERVAL = int(getattr(settings, 'GAME_KEYFRAME_INTERVAL', 20))
+# ack를 기다리며 보관할 프레임 수 (이보다 오래된 프레임을 ack하면 keyframe)
+FRAME_HISTORY = 32
+
+ENTITY_KEYS = ("enemies", "balls")
+
+
+def _index(entities):
+    return {ent["id"]: ent for ent in entities}
+
+
+def _diff(base, cur):
+    changed = []
+    for eid, ent in cur.items():
+        old = base.get(eid)
+        if old is None:
+            changed.append(ent)
+        elif old != ent:
+            part = {k: v for k, v in ent.items() if old.get(k) != v}
+            part["id"] = eid
+            changed.append(part)
+    removed = [eid for eid in base if eid not in cur]
+    return {"set": changed, "del": removed}
+
+
+class DeltaEncoder:
+    """
+    연결 하나당 하나. 보낸 프레임의 엔티티 스냅샷을 FRAME_HISTORY개까지 보관
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.history = OrderedDict()
+        self.acked = None
+        self.since_keyframe = 0
+        self.force_keyframe = True
+
+    def ack(self, frame):
+        if frame in self.history:
+            self.acked = frame
+            # ack 이전 프레임은 더 이상 base로 쓰이지 않음
+            while self.history and next(iter(self.history)) < frame:
+                self.history.popitem(last=False)
+
+    def request_keyframe(self):
+        self.force_keyframe = True
+
+    def encode(self, payload):
+        frame = payload["frame"]
+        snap = {key: _index(payload[key]) for key in ENTITY_KEYS}
+        snap["upgrades"] = payload["upgrades"]
+
+        base = self.history.get(self.acked) if self.acked is not None else None
+        keyframe = (
+            base is None or self.force_keyframe
+            or self.since_keyframe >= self.keyframe_interval
+        )
+
+        self.history[frame] = snap
+        while len(self.history) > FRAME_HISTORY:
+            self.history.popitem(last=False)
+
+        if keyframe:
+            self.force_keyframe = False
+            self.since_keyframe = 0
+            return {**payload, "v": PROTOCOL_DELTA, "keyframe": True}
+
+        self.since_keyframe += 1
+        out = {**payload, "v": PROTOCOL_DELTA, "keyframe": False, "base": self.acked}
+        for key in ENTITY_KEYS:
+            out[key] = _diff(base[key], snap[key])
+        if base["upgrades"] == snap["upgrades"]:
+            del out["upgrades"]
+        return out
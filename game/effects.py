@@ -0,0 +1,57 @@
+# game/effects.py
+"""
+공격 이펙트 = 한 번만 보내는 이벤트 (발생 틱 + 지속시간).
+
+예전에는 이펙트 dict 마다 timer 를 매 틱 깎고, 상태(Redis)에 저장하고, 만료될 때까지 매 프레임 다시 보냈다.
+이제 공격 시 EffectRing 에 (발생 틱, 좌표) 하나만 넣고, 다음 프레임에 한 번 보낸 뒤 잊는다.
+클라이언트는 프레임의 "tick" 과 이벤트의 "tick" 차이로 경과 시간을 계산해 duration 동안 그린다.
+
+    {"kind":"tick_update", "tick":1234, ...,
+     "effects":[{"x1":..,"y1":..,"x2":..,"y2":..,"tick":1231,"duration":0.3}, ...]}
+
+살아있는 이펙트에 대한 틱당 작업은 없음. 버퍼는 크기 고정 (프레임 사이에 넘치면 오래된 것부터 버림).
+프레임을 만들 때 이미 duration 이 지난 이벤트는 보내지 않는다 (예전에 timer 가 끝난 이펙트가 빠지던 것과 같음).
+"""
+from django.conf import settings
+
+EFFECT_DURATION = 0.3
+# 프레임 사이에 쌓아둘 최대 이펙트 수
+BUFFER_SIZE = int(getattr(settings, 'GAME_EFFECT_BUFFER', 256))
+
+
+class EffectRing:
+    """
+    크기 고정 ring buffer. seq = 지금까지 넣은 수, sent = 이미 내보낸 위치
+    """
+    __slots__ = ("buf", "size", "seq", "sent", "dropped")
+
+    def __init__(self, size=BUFFER_SIZE):
+        self.buf = [None] * size
+        self.size = size
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return min(self.seq - self.sent, self.size)
+
+    def push(self, tick, x1, y1, x2, y2):
+        self.buf[self.seq % self.size] = (tick, x1, y1, x2, y2)
+        self.seq += 1
+
+    def drain(self, now, max_age):
+        """
+        아직 안 보낸 이벤트 중 now - 발생 틱 < max_age 인 것 (오래된 순) => 이펙트 dict 리스트
+        """
+        start = max(self.sent, self.seq - self.size)
+        self.dropped += start - self.sent
+        buf, size = self.buf, self.size
+        out = []
+        for i in range(start, self.seq):
+            tick, x1, y1, x2, y2 = buf[i % size]
+            if now - tick >= max_age:
+                continue
+            out.append({"x1": x1, "y1": y1, "x2": x2, "y2": y2,
+                        "tick": tick, "duration": EFFECT_DURATION})
+        self.sent = self.seq
+        return out
@@ -0,0 +1,49 @@
+# game/entities.py
+"""
+적 엔티티 ID 풀: 세대(generation) ID + 빈 슬롯 재사용(free list).
+
+id = (generation << SLOT_BITS) | slot
+적이 죽으면 compact_enemies()가 리스트에서 제거하고 슬롯을 free list에 돌려준다.
+같은 슬롯이 재사용되면 generation이 올라가므로 예전 id와 겹치지 않는다.
+풀은 st["enemy_pool"] 에 JSON으로 같이 저장된다.
+"""
+SLOT_BITS = 20
+SLOT_MASK = (1 << SLOT_BITS) - 1
+
+
+def new_pool():
+    return {"gens": [], "free": []}
+
+
+def alloc_id(pool):
+    gens = pool["gens"]
+    if pool["free"]:
+        slot = pool["free"].pop()
+        gens[slot] += 1
+    else:
+        slot = len(gens)
+        gens.append(0)
+    return (gens[slot] << SLOT_BITS) | slot
+
+
+def release_id(pool, eid):
+    slot = eid & SLOT_MASK
+    gens = pool["gens"]
+    # 이미 반납된(세대가 다른) id는 무시
+    if slot < len(gens) and gens[slot] == (eid >> SLOT_BITS):
+        pool["free"].append(slot)
+
+
+def compact_enemies(st):
+    """
+    죽은 적을 st["enemies"]에서 제거하고 id를 반납. return 죽은 적 id 리스트
+    """
+    enemies = st["enemies"]
+    killed = [e["id"] for e in enemies if e["is_dead"]]
+    if not killed:
+        return killed
+    st["enemies"] = [e for e in enemies if not e["is_dead"]]
+    pool = st["enemy_pool"]
+    for eid in killed:
+        release_id(pool, eid)
+    return killed
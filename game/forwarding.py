@@ -0,0 +1,54 @@
+# game/forwarding.py
+"""
+REST => 세션 소유자에게 액션 넘기기.
+
+소유자(lease, game/ownership.py)가 있는 세션은 소유자 메모리 상태가 원본이고, 체크포인트마다
+meta/balls/enemies 를 다시 쓴다. REST 가 Redis 를 직접 고치면 (Lua 스크립트라도) 그때 사라지므로
+redis_scripts 는 OWNED 로 거절하고, view 는 여기서 액션을 소유자 입력 큐로 보낸다
+(viewer 연결이 넘기는 것과 같은 경로, 응답은 임시 채널로 action_reply):
+- GAME_SIM_WORKERS=0 : session_{id} group 에 player_action (소유자 consumer 만 처리)
+- GAME_SIM_WORKERS>0 : 담당 워커 채널에 sim.action
+
+    payload = async_to_sync(ask_owner)(session_id, {"action":"upgrade_color", "color":"red"})
+"""
+import asyncio
+
+from django.conf import settings
+from channels.layers import get_channel_layer
+
+from . import sim_workers
+from .runner import group_name
+
+# 소유자 응답 대기 시간(초)
+FORWARD_TIMEOUT = float(getattr(settings, 'GAME_FORWARD_TIMEOUT', 2.0))
+
+
+class OwnerUnavailable(Exception):
+    """
+    lease 는 있는데 소유자가 응답하지 않음 (소유자가 죽었으면 lease TTL 후 만료)
+    """
+
+
+async def ask_owner(session_id, content, timeout=FORWARD_TIMEOUT):
+    """
+    content 를 소유자의 SessionRunner.apply_action 으로. return 소유자 응답 payload
+    """
+    layer = get_channel_layer()
+    reply_to = await layer.new_channel()
+    sid = str(session_id)
+    if sim_workers.WORKER_COUNT > 0:
+        await layer.send(sim_workers.channel_for(sid), {
+            "type":"sim.action", "session_id": sid,
+            "content": content, "reply_to": reply_to,
+        })
+    else:
+        await layer.group_send(group_name(sid), {
+            "type":"player_action",
+            "content": content,
+            "reply_to": reply_to,
+        })
+    try:
+        msg = await asyncio.wait_for(layer.receive(reply_to), timeout)
+    except asyncio.TimeoutError:
+        raise OwnerUnavailable(sid) from None
+    return msg["payload"]
@@ -0,0 +1,172 @@
+# game/interest.py
+"""
+관심 영역(AOI) 컬링: 연결마다 클라이언트가 알려준 화면 사각형(+줌) 밖의 엔티티를 뺀다.
+
+    {action:"viewport", x, y, w, h, zoom}    (zoom 1.0 = 기본, 작을수록 멀리 본 화면)
+
+- 적: 화면(+MARGIN) 안에 있는 것만 보냄. 화면 밖 적은 경로 구간별 개수만
+  "offscreen": [구간0 개수, 구간1 개수, ...]  (path.PATH_POINTS 구간 순서)
+- 화면 안 적이 한도(MAX_ENEMIES * zoom)를 넘으면 id 기준으로 솎아냄 (프레임마다 같은 적이 남도록).
+  솎아낸 적도 offscreen 개수에 포함
+- 이펙트: 선분의 bounding box 가 화면과 겹치는 것만
+- 볼(플레이어 소유, 수가 적음), upgrades, killed 는 그대로
+viewport 를 보내지 않은 연결은 기존처럼 전체 payload.
+
+프레임 하나의 격자 인덱스(FrameIndex)는 같은 프로세스의 연결들이 같이 쓴다 (세션/프레임 키 캐시).
+"""
+import math
+from collections import OrderedDict
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .path import SEGMENT_LENGTHS, segment_at
+from .spatial import MAP_WIDTH, MAP_HEIGHT
+
+# 화면 가장자리 여유(맵 단위). 들어오는 적이 갑자기 나타나지 않게
+MARGIN = float(getattr(settings, 'GAME_AOI_MARGIN', 40.0))
+# zoom 1.0 기준 화면에 보내는 최대 적 수
+MAX_ENEMIES = int(getattr(settings, 'GAME_AOI_MAX_ENEMIES', 150))
+CELL_SIZE = 50.0
+MIN_ZOOM = 0.1
+MAX_ZOOM = 8.0
+# 최근 프레임 인덱스 몇 개를 보관할지 (세션 여러 개가 한 프로세스에 있음)
+INDEX_CACHE_SIZE = 64
+
+
+class ViewportError(ValueError):
+    pass
+
+
+class Viewport(NamedTuple):
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    zoom: float
+
+    def contains(self, x, y):
+        return self.x0 <= x <= self.x1 and self.y0 <= y <= self.y1
+
+    def overlaps(self, x0, y0, x1, y1):
+        return x0 <= self.x1 and x1 >= self.x0 and y0 <= self.y1 and y1 >= self.y0
+
+    @property
+    def enemy_limit(self):
+        return max(1, int(MAX_ENEMIES * min(self.zoom, 1.0)))
+
+
+def _num(content, key, default=None):
+    v = content.get(key, default)
+    if isinstance(v, bool) or not isinstance(v, (int, float)) or not math.isfinite(v):
+        raise ViewportError(f"invalid viewport {key}")
+    return float(v)
+
+
+def parse_viewport(content):
+    """
+    {action:"viewport", x, y, w, h, zoom} => Viewport (MARGIN 포함, 맵 범위로 자름)
+    w/h 가 없거나 0 이하 => None (컬링 끔)
+    """
+    if content.get("w") is None or content.get("h") is None:
+        return None
+    x, y = _num(content, "x", 0), _num(content, "y", 0)
+    w, h = _num(content, "w"), _num(content, "h")
+    if w <= 0 or h <= 0:
+        return None
+    zoom = min(max(_num(content, "zoom", 1.0), MIN_ZOOM), MAX_ZOOM)
+    return Viewport(
+        max(x - MARGIN, 0.0), max(y - MARGIN, 0.0),
+        min(x + w + MARGIN, float(MAP_WIDTH)), min(y + h + MARGIN, float(MAP_HEIGHT)),
+        zoom,
+    )
+
+
+class FrameIndex:
+    """
+    tick_update payload 의 적을 CELL_SIZE 격자 칸별로 (리스트 인덱스)
+    """
+
+    def __init__(self, enemies, cell_size=CELL_SIZE):
+        self.enemies = enemies
+        self.cell_size = cell_size
+        self.cols = int(math.ceil(MAP_WIDTH / cell_size)) + 1
+        self.rows = int(math.ceil(MAP_HEIGHT / cell_size)) + 1
+        self.cells = [[] for _ in range(self.cols * self.rows)]
+        # 전체 구간별 개수 (화면 밖 개수 = 전체 - 보낸 것)
+        self.segment_totals = [0] * len(SEGMENT_LENGTHS)
+        self.segments = []
+        for i, e in enumerate(enemies):
+            self.cells[self._row(e["y"]) * self.cols + self._col(e["x"])].append(i)
+            seg = segment_at(e["dist"])
+            self.segments.append(seg)
+            self.segment_totals[seg] += 1
+
+    def _col(self, x):
+        c = int(x // self.cell_size)
+        return 0 if c < 0 else (self.cols - 1 if c >= self.cols else c)
+
+    def _row(self, y):
+        r = int(y // self.cell_size)
+        return 0 if r < 0 else (self.rows - 1 if r >= self.rows else r)
+
+    def query(self, vp):
+        """
+        화면 안 적의 리스트 인덱스 (원래 순서)
+        """
+        enemies = self.enemies
+        cols = self.cols
+        out = []
+        for row in range(self._row(vp.y0), self._row(vp.y1) + 1):
+            base = row * cols
+            for col in range(self._col(vp.x0), self._col(vp.x1) + 1):
+                for i in self.cells[base + col]:
+                    e = enemies[i]
+                    if vp.contains(e["x"], e["y"]):
+                        out.append(i)
+        out.sort()
+        return out
+
+
+_index_cache = OrderedDict()
+
+
+def frame_index(key, payload):
+    """
+    key: (session_id, frame, time_in_stage) 같은 프레임 식별자. 같은 프레임은 한 번만 색인
+    """
+    idx = _index_cache.get(key)
+    if idx is None:
+        idx = _index_cache[key] = FrameIndex(payload["enemies"])
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return idx
+
+
+def cull(payload, vp, index=None):
+    """
+    연결 하나용 payload (원본은 건드리지 않음)
+    """
+    if index is None:
+        index = FrameIndex(payload["enemies"])
+    enemies = payload["enemies"]
+    visible = index.query(vp)
+    limit = vp.enemy_limit
+    if len(visible) > limit:
+        # id % stride 로 솎아냄 => 적이 움직여도 남는 적이 잘 안 바뀜 (델타 프레임이 작게 유지)
+        stride = -(-len(visible) // limit)
+        visible = [i for i in visible if enemies[i]["id"] % stride == 0][:limit]
+    offscreen = list(index.segment_totals)
+    for i in visible:
+        offscreen[index.segments[i]] -= 1
+    effects = [
+        fx for fx in payload["effects"]
+        if vp.overlaps(min(fx["x1"], fx["x2"]), min(fx["y1"], fx["y2"]),
+                       max(fx["x1"], fx["x2"]), max(fx["y1"], fx["y2"]))
+    ]
+    return {
+        **payload,
+        "enemies": [enemies[i] for i in visible],
+        "effects": effects,
+        "offscreen": offscreen,
+    }
@@ -0,0 +1,87 @@
+# game/management/commands/codecbench.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from game.codec import JsonCodec, MsgpackCodec
+from game.interest import parse_viewport, cull
+from game.path import position_at
+
+
+def make_frame(enemy_count, ball_count, effect_count):
+    """
+    broadcast_state 와 같은 모양의 tick_update payload
+    """
+    enemies = []
+    for i in range(enemy_count):
+        dist = random.uniform(0, 3000)
+        x, y = position_at(dist)
+        enemies.append({
+            "id": i + 1, "name": random.choice(["Slime","Wolf","Goblin"]),
+            "hp": 10, "defense": 1, "shield": 0,
+            "dist": dist, "speed": random.uniform(5, 8), "is_dead": False,
+            "x": x, "y": y,
+        })
+    balls = [{
+        "id": enemy_count + i + 1,
+        "x": random.uniform(0, 400), "y": random.uniform(0, 400),
+        "target_x": 200.0, "target_y": 200.0,
+        "color": "red", "rarity": "common", "damage": 5, "cooldown": 0.4,
+    } for i in range(ball_count)]
+    effects = [{
+        "x1": random.uniform(0, 400), "y1": random.uniform(0, 400),
+        "x2": random.uniform(0, 400), "y2": random.uniform(0, 400),
+        "tick": 120, "duration": 0.3,
+    } for _ in range(effect_count)]
+    return {
+        "kind": "tick_update", "frame": 1, "tick": 123, "stage": 3, "time_in_stage": 12.3,
+        "enemies": enemies, "balls": balls,
+        "upgrades": {"red":1,"orange":0,"yellow":0,"green":0,"blue":0,"navy":0,"purple":0},
+        "effects": effects,
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare JSON vs msgpack encode/decode cost and bytes per tick_update frame"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--enemies", type=int, default=200)
+        parser.add_argument("--balls", type=int, default=20)
+        parser.add_argument("--effects", type=int, default=10)
+        parser.add_argument("--frames", type=int, default=200)
+        parser.add_argument("--viewport", default=None,
+                            help="x,y,w,h[,zoom] => 이 화면으로 컬링한 프레임도 비교")
+
+    def handle(self, *args, **options):
+        frame = make_frame(options["enemies"], options["balls"], options["effects"])
+        n = options["frames"]
+        self.stdout.write(
+            f"frame: {options['enemies']} enemies, {options['balls']} balls, "
+            f"{options['effects']} effects, x{n}"
+        )
+        frames = [("full", frame)]
+        if options["viewport"]:
+            parts = [float(v) for v in options["viewport"].split(",")]
+            vp = parse_viewport(dict(zip(("x", "y", "w", "h", "zoom"), parts)))
+            t = time.perf_counter()
+            for _ in range(n):
+                culled = cull(frame, vp)
+            self.stdout.write(f"cull: {(time.perf_counter() - t) / n * 1e6:.1f}us/frame, "
+                              f"{len(culled['enemies'])} enemies sent, offscreen={culled['offscreen']}")
+            frames.append(("culled", culled))
+        for label, payload in frames:
+            for codec in (JsonCodec(), MsgpackCodec()):
+                t = time.perf_counter()
+                for _ in range(n):
+                    data = codec.encode(payload)
+                enc = (time.perf_counter() - t) / n
+                t = time.perf_counter()
+                for _ in range(n):
+                    codec.decode(data)
+                dec = (time.perf_counter() - t) / n
+                self.stdout.write(
+                    f"{label:6s} {codec.name:8s} "
+                    f"bytes/frame={codec.stats.bytes_out // codec.stats.frames_out:7d} "
+                    f"encode={enc*1e6:8.1f}us decode={dec*1e6:8.1f}us"
+                )
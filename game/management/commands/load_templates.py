@@ -1,6 +1,7 @@
 # game/management/commands/load_templates.py
 from django.core.management.base import BaseCommand
 from game.models import BallTemplate, EnemyTemplate
+from game import template_cache
 
 class Command(BaseCommand):
     help = "Load seed data into BallTemplate & EnemyTemplate"
@@ -43,4 +44,7 @@ class Command(BaseCommand):
 
         self.stdout.write("Created EnemyTemplate records.")
 
+        # 실행 중인 서버 프로세스들의 템플릿 캐시도 다시 읽도록
+        template_cache.invalidate()
+
         self.stdout.write(self.style.SUCCESS("Seed data loaded successfully."))
@@ -0,0 +1,240 @@
+# game/management/commands/loadtest.py
+"""
+로컬 WebSocket 부하 테스트 (오프라인, 단일 머신).
+
+dotgame/asgi.py 의 ASGI 앱을 같은 프로세스에서 띄우고 (in-memory channel layer),
+Redis는 임시 redis-server 프로세스(없으면 fakeredis)로 대체한 뒤
+ws/game/<id>/ 연결 수백~수천 개를 열어 summon_ball/move_ball/upgrade_color 를 섞어 보낸다.
+
+측정:
+- action -> 다음 tick_update 수신까지 지연 p50/p95/p99
+- 세션별 실제 틱 속도 (스케줄러 기준), 스케줄러 lag
+- 드롭된 프레임 (frame 번호 건너뜀)
+"""
+import asyncio
+import json
+import random
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+ACTION_MIX = (("move_ball", 6), ("summon_ball", 2), ("upgrade_color", 2))
+COLORS = ["red","orange","yellow","green","blue","navy","purple"]
+
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, int(round(p * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_redis_standin(stdout):
+    """
+    return cleanup 함수. redis-server 바이너리가 있으면 임시 포트로 띄우고,
+    없으면 fakeredis(설치되어 있을 때)로 대체
+    """
+    from game import redis_manager
+
+    binary = shutil.which("redis-server")
+    if binary:
+        port = _free_port()
+        workdir = tempfile.mkdtemp(prefix="dotgame-loadtest-")
+        proc = subprocess.Popen(
+            [binary, "--port", str(port), "--save", "", "--appendonly", "no",
+             "--dir", workdir],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        redis_manager.configure(host="127.0.0.1", port=port)
+        for _ in range(50):
+            try:
+                redis_manager.get_redis().ping()
+                break
+            except Exception:
+                time.sleep(0.1)
+        else:
+            proc.kill()
+            raise CommandError("redis-server did not start")
+        stdout.write(f"redis stand-in: redis-server on 127.0.0.1:{port}")
+
+        def cleanup():
+            proc.terminate()
+            proc.wait(timeout=5)
+            shutil.rmtree(workdir, ignore_errors=True)
+        return cleanup
+
+    try:
+        import fakeredis
+        import fakeredis.aioredis
+    except ImportError:
+        raise CommandError("need redis-server on PATH or the fakeredis package for a local Redis stand-in")
+    server = fakeredis.FakeServer()
+    redis_manager.configure(
+        sync_client=fakeredis.FakeRedis(server=server, decode_responses=True),
+        async_factory=lambda: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+    )
+    stdout.write("redis stand-in: fakeredis (in-process)")
+    return lambda: None
+
+
+class LoadClient:
+    def __init__(self, app, session_id, rate, protocol):
+        from channels.testing import WebsocketCommunicator
+        path = f"/ws/game/{session_id}/"
+        if protocol == 2:
+            path += "?protocol=2"
+        self.comm = WebsocketCommunicator(app, path)
+        self.protocol = protocol
+        self.rate = rate
+        self.pending = deque()  # 아직 broadcast를 못 받은 action 전송 시각
+        self.latencies = []
+        self.frames = 0
+        self.dropped = 0
+        self.last_frame = None
+        self.ball_count = 0
+        self.errors = 0
+
+    async def connect(self):
+        ok, _ = await self.comm.connect(timeout=10)
+        if not ok:
+            raise CommandError("websocket connect rejected")
+        await self.comm.receive_output(timeout=10)  # "세션 연결 성공"
+
+    async def reader(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            msg = await self.comm.receive_output(timeout=3600)
+            if msg["type"] == "websocket.close":
+                return
+            text = msg.get("text")
+            if text is None:
+                continue
+            data = json.loads(text)
+            if data.get("kind") != "tick_update":
+                if "error" in data:
+                    self.errors += 1
+                continue
+            now = loop.time()
+            self.frames += 1
+            frame = data["frame"]
+            if self.last_frame is not None and frame > self.last_frame + 1:
+                self.dropped += frame - self.last_frame - 1
+            self.last_frame = frame
+            balls = data.get("balls")
+            if isinstance(balls, list):
+                self.ball_count = len(balls)
+            while self.pending:
+                self.latencies.append(now - self.pending.popleft())
+            if self.protocol == 2:
+                await self.comm.send_json_to({"action": "ack", "frame": frame})
+
+    async def actor(self):
+        loop = asyncio.get_running_loop()
+        names = [a for a, _ in ACTION_MIX]
+        weights = [w for _, w in ACTION_MIX]
+        await asyncio.sleep(random.uniform(0, 1 / self.rate))
+        while True:
+            action = random.choices(names, weights)[0]
+            if action == "move_ball" and self.ball_count == 0:
+                action = "summon_ball"
+            msg = {"action": action}
+            if action == "move_ball":
+                msg.update(ball_idx=random.randrange(self.ball_count),
+                           tx=random.uniform(20, 380), ty=random.uniform(20, 380))
+            elif action == "upgrade_color":
+                msg["color"] = random.choice(COLORS)
+            self.pending.append(loop.time())
+            await self.comm.send_json_to(msg)
+            await asyncio.sleep(random.expovariate(self.rate))
+
+
+class Command(BaseCommand):
+    help = "Offline WebSocket load test against the in-process ASGI app"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=200)
+        parser.add_argument("--duration", type=float, default=20.0, help="seconds of measured load")
+        parser.add_argument("--rate", type=float, default=1.0, help="actions per second per connection")
+        parser.add_argument("--protocol", type=int, default=1, choices=(1, 2))
+        parser.add_argument("--session-base", type=int, default=900000, help="first session id")
+        parser.add_argument("--per-session", type=int, default=1,
+                            help="connections sharing one session (1 owner + viewers)")
+        parser.add_argument("--ramp", type=int, default=50, help="connections opened per batch")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        cleanup = start_redis_standin(self.stdout)
+        layers = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+        try:
+            with override_settings(CHANNEL_LAYERS=layers):
+                asyncio.run(self.run(options))
+        finally:
+            cleanup()
+
+    async def run(self, opts):
+        from dotgame.asgi import application
+        from game.runner import INTERNAL_TICK
+        from game.scheduler import get_scheduler
+
+        clients = [
+            LoadClient(application, opts["session_base"] + i // max(1, opts["per_session"]),
+                       opts["rate"], opts["protocol"])
+            for i in range(opts["connections"])
+        ]
+        t0 = time.perf_counter()
+        for i in range(0, len(clients), opts["ramp"]):
+            await asyncio.gather(*(c.connect() for c in clients[i:i + opts["ramp"]]))
+        self.stdout.write(f"opened {len(clients)} connections in {time.perf_counter() - t0:.1f}s")
+
+        scheduler = get_scheduler(INTERNAL_TICK)
+        ticks_before = {k: e.ticks for k, e in scheduler.entries.items()}
+        for e in scheduler.entries.values():
+            e.max_lag = 0.0
+
+        tasks = [asyncio.create_task(c.reader()) for c in clients]
+        tasks += [asyncio.create_task(c.actor()) for c in clients]
+        started = time.perf_counter()
+        await asyncio.sleep(opts["duration"])
+        elapsed = time.perf_counter() - started
+
+        ticks = [e.ticks - ticks_before.get(k, 0) for k, e in scheduler.entries.items()]
+        max_lag = max((e.max_lag for e in scheduler.entries.values()), default=0.0)
+        skipped = sum(e.skipped for e in scheduler.entries.values())
+
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*(c.comm.disconnect() for c in clients), return_exceptions=True)
+
+        lat = sorted(x for c in clients for x in c.latencies)
+        frames = sum(c.frames for c in clients)
+        dropped = sum(c.dropped for c in clients)
+        target_rate = 1 / INTERNAL_TICK
+        rates = sorted(t / elapsed for t in ticks) or [0.0]
+
+        w = self.stdout.write
+        w(f"load: {len(clients)} connections x {opts['rate']} actions/s for {elapsed:.1f}s "
+          f"(protocol v{opts['protocol']})")
+        w(f"simulated sessions (tick loops): {len(ticks)}")
+        w(f"actions answered: {len(lat)}  errors: {sum(c.errors for c in clients)}")
+        w("action -> broadcast latency (ms): "
+          f"p50={percentile(lat, 0.50)*1000:.1f} p95={percentile(lat, 0.95)*1000:.1f} "
+          f"p99={percentile(lat, 0.99)*1000:.1f} max={(lat[-1] if lat else 0)*1000:.1f}")
+        w(f"tick rate per session (target {target_rate:.0f}/s): "
+          f"mean={sum(rates)/len(rates):.2f} min={rates[0]:.2f}  "
+          f"scheduler max lag={max_lag*1000:.1f}ms skipped periods={skipped}")
+        w(f"frames received: {frames}  dropped: {dropped} "
+          f"({(dropped / (frames + dropped) * 100) if frames + dropped else 0:.2f}%)")
@@ -0,0 +1,31 @@
+# game/management/commands/migrate_session_layout.py
+from django.core.management.base import BaseCommand
+
+from game.redis_manager import get_redis
+from game.session_store import migrate_session
+
+
+class Command(BaseCommand):
+    help = "Convert session:{id}:state blobs and old per-view JSON keys to the hash layout"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        r = get_redis()
+        session_ids = set()
+        for pattern in ("session:*:state", "session:*:color_upgrades", "session:*:info"):
+            for key in r.scan_iter(match=pattern, count=500):
+                session_ids.add(key.split(":")[1])
+
+        counts = {}
+        for sid in sorted(session_ids, key=lambda s: (len(s), s)):
+            if options["dry_run"]:
+                self.stdout.write(f"would migrate session {sid}")
+                continue
+            kind = migrate_session(r, sid)
+            if kind:
+                counts[kind] = counts.get(kind, 0) + 1
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(session_ids)} legacy sessions found, migrated: {counts or 'none'}"
+        ))
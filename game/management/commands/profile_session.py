@@ -0,0 +1,63 @@
+# game/management/commands/profile_session.py
+import io
+import json
+import pstats
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.redis_manager import get_redis
+from game.profiling import (
+    profile_request_key, profile_result_key, profile_stats_key, MAX_CAPTURE_SECONDS,
+)
+
+
+class Command(BaseCommand):
+    help = "Show tick phase stats for a session, or capture a cProfile for N seconds"
+
+    def add_arguments(self, parser):
+        parser.add_argument("session_id", type=int)
+        parser.add_argument("--seconds", type=int, default=0,
+                            help="cProfile capture length (0 = stats only)")
+        parser.add_argument("--top", type=int, default=25)
+
+    def handle(self, *args, **options):
+        sid = options["session_id"]
+        r = get_redis()
+
+        raw = r.get(profile_stats_key(sid))
+        if not raw:
+            raise CommandError(f"session {sid} is not running (no profile stats)")
+        stats = json.loads(raw)
+        self.stdout.write(f"session {sid}: ticks={stats['ticks']} overruns={stats['overruns']} "
+                          f"(budget {stats['budget_ms']}ms)")
+        for name, h in [("total", stats["total"])] + list(stats["phases"].items()):
+            self.stdout.write(f"  {name:14s} last={h['last_ms']:8.3f}ms "
+                              f"p50<={h['p50_ms']} p95<={h['p95_ms']} p99<={h['p99_ms']}")
+        off = stats.get("offload")
+        if off:
+            self.stdout.write(f"  offload: {off['mode']} (combat {off['step_ms']}ms, threshold {off['threshold_ms']}ms) "
+                              f"switches={off['switches']} offloaded={off['offloaded_ticks']} "
+                              f"skipped={off['skipped_ticks']} pool={off['pool']}")
+
+        seconds = min(options["seconds"], MAX_CAPTURE_SECONDS)
+        if seconds <= 0:
+            return
+
+        before = r.get(profile_result_key(sid))
+        r.set(profile_request_key(sid), seconds, ex=60)
+        self.stdout.write(f"capture requested for {seconds}s, waiting...")
+        # 요청은 다음 checkpoint 때 시작되고, 끝난 뒤 checkpoint 때 저장됨
+        deadline = time.monotonic() + seconds + 30
+        while time.monotonic() < deadline:
+            path = r.get(profile_result_key(sid))
+            if path and path != before:
+                break
+            time.sleep(0.5)
+        else:
+            raise CommandError("capture did not finish (session ended?)")
+
+        self.stdout.write(self.style.SUCCESS(f"saved: {path}"))
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(options["top"])
+        self.stdout.write(out.getvalue())
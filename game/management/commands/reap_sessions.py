@@ -0,0 +1,137 @@
+# game/management/commands/reap_sessions.py
+"""
+버려진 세션 정리: sessions:active 인덱스에서 마지막 활동이 --idle 초보다 오래된 세션의 키를
+배치 단위 UNLINK (삭제는 Redis 백그라운드 스레드) 하고 해당 GameSession 을 한 번에 비활성으로.
+소유자 lease 가 살아있는 세션은 건너뜀 (활동 시각만 갱신).
+
+    python manage.py reap_sessions                     # 한 번
+    python manage.py reap_sessions --interval 300      # 5분마다 계속
+    python manage.py reap_sessions --scan --dry-run    # 인덱스 밖(배포 전) 세션까지, 삭제 없이 확인
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from redis.exceptions import ResponseError
+
+from game.models import GameSession
+from game.ownership import lease_key
+from game.redis_manager import get_redis
+from game.session_store import ACTIVE_INDEX, SESSION_TTL, keys, legacy_keys
+
+
+def session_key_names(session_id):
+    return sorted({*keys(session_id), *legacy_keys(session_id).values()})
+
+
+def memory_usage(r, names):
+    """
+    return 키들의 MEMORY USAGE 합 (지원 안 하는 서버면 None)
+    """
+    pipe = r.pipeline(transaction=False)
+    for name in names:
+        pipe.memory_usage(name)
+    results = pipe.execute(raise_on_error=False)
+    if any(isinstance(v, ResponseError) for v in results):
+        return None
+    return sum(v or 0 for v in results)
+
+
+def adopt_unindexed(r, dry_run):
+    """
+    인덱스에 없는 세션 (TTL 도입 전에 만들어진 키) 을 활동 시각 0 으로 인덱스에 넣음
+    return 넣은 세션 수
+    """
+    ids = set()
+    for pattern in ("session:*:meta", "session:*:state", "session:*:info"):
+        for key in r.scan_iter(match=pattern, count=500):
+            ids.add(key.split(":")[1])
+    ids = sorted(ids)
+    pipe = r.pipeline(transaction=False)
+    for sid in ids:
+        pipe.zscore(ACTIVE_INDEX, sid)
+    missing = [sid for sid, score in zip(ids, pipe.execute()) if score is None]
+    if missing and not dry_run:
+        r.zadd(ACTIVE_INDEX, {sid: 0 for sid in missing})
+    return len(missing)
+
+
+class Command(BaseCommand):
+    help = "Unlink Redis keys of sessions idle longer than --idle seconds and mark them inactive"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--idle", type=float, default=SESSION_TTL,
+                            help="seconds since last activity (default: GAME_SESSION_TTL)")
+        parser.add_argument("--batch", type=int, default=500)
+        parser.add_argument("--scan", action="store_true",
+                            help="first add sessions missing from the index (SCAN)")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="repeat every N seconds (0 = run once)")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        r = get_redis()
+        if options["scan"]:
+            n = adopt_unindexed(r, options["dry_run"])
+            self.stdout.write(f"{n} unindexed sessions {'found' if options['dry_run'] else 'indexed'}")
+        while True:
+            self.reap(r, options["idle"], max(1, options["batch"]), options["dry_run"])
+            if options["interval"] <= 0:
+                break
+            time.sleep(options["interval"])
+
+    def reap(self, r, idle, batch, dry_run):
+        t0 = time.perf_counter()
+        cutoff = time.time() - idle
+        reaped = skipped = unlinked = deactivated = 0
+        reclaimed = 0
+        offset = 0
+        while True:
+            ids = r.zrangebyscore(ACTIVE_INDEX, "-inf", cutoff, start=offset, num=batch)
+            if not ids:
+                break
+
+            pipe = r.pipeline(transaction=False)
+            for sid in ids:
+                pipe.exists(lease_key(sid))
+            owned = pipe.execute()
+            live = [sid for sid, o in zip(ids, owned) if o]
+            dead = [sid for sid, o in zip(ids, owned) if not o]
+            skipped += len(live)
+
+            names = [name for sid in dead for name in session_key_names(sid)]
+            usage = memory_usage(r, names) if names else 0
+            if usage is None or reclaimed is None:
+                reclaimed = None
+            else:
+                reclaimed += usage
+
+            if dry_run:
+                offset += len(ids)
+                reaped += len(dead)
+                continue
+
+            pipe = r.pipeline(transaction=False)
+            if live:
+                # 소유자가 있으면 살아있는 세션 => 다음 정리 대상에서 빠지도록
+                pipe.zadd(ACTIVE_INDEX, {sid: time.time() for sid in live})
+            if names:
+                pipe.unlink(*names)
+            if dead:
+                pipe.zrem(ACTIVE_INDEX, *dead)
+            results = pipe.execute()
+            if names:
+                unlinked += results[1 if live else 0]
+            reaped += len(dead)
+
+            numeric = [int(sid) for sid in dead if sid.isdigit()]
+            if numeric:
+                deactivated += GameSession.objects.filter(
+                    id__in=numeric, is_active=True).update(is_active=False)
+
+        mem = "n/a (MEMORY USAGE unsupported)" if reclaimed is None else f"{reclaimed / 1024:,.1f} KiB"
+        verb = "would reap" if dry_run else "reaped"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {reaped} sessions idle > {idle:.0f}s ({unlinked} keys unlinked, "
+            f"{deactivated} GameSession rows deactivated, {skipped} still owned), "
+            f"memory reclaimed: {mem}, {time.perf_counter() - t0:.2f}s"
+        ))
@@ -0,0 +1,79 @@
+# game/management/commands/run_sim_workers.py
+"""
+시뮬레이션 워커 프로세스 실행 (game/sim_workers.py).
+
+    python manage.py run_sim_workers --procs 4            # 워커 0..3 (죽으면 다시 띄움)
+    python manage.py run_sim_workers --procs 4 --index 2  # 워커 2 하나만 (컨테이너/호스트별 배치)
+
+ASGI 쪽 GAME_SIM_WORKERS 와 --procs 가 같아야 세션이 같은 워커로 간다.
+channel layer 는 프로세스 사이에서 공유되는 백엔드(channels_redis)여야 한다.
+"""
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from game.sim_workers import WORKER_COUNT, run_worker, worker_channel
+
+# 자식이 이보다 빨리 죽으면 다시 띄우기 전에 기다림(초)
+RESTART_BACKOFF = 2.0
+
+
+class Command(BaseCommand):
+    help = "Start simulation worker processes that own sessions by consistent hashing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procs", type=int, default=WORKER_COUNT or multiprocessing.cpu_count(),
+                            help="total number of workers in the ring (default: GAME_SIM_WORKERS)")
+        parser.add_argument("--index", type=int, default=None,
+                            help="run only this worker index (0..procs-1) in this process")
+
+    def handle(self, *args, **options):
+        procs = options["procs"]
+        if procs < 1:
+            raise CommandError("--procs must be >= 1")
+        if procs != WORKER_COUNT:
+            self.stderr.write(self.style.WARNING(
+                f"--procs {procs} != GAME_SIM_WORKERS {WORKER_COUNT}: "
+                "the ASGI front end will route sessions to a different set of workers"))
+        if "InMemory" in settings.CHANNEL_LAYERS["default"]["BACKEND"]:
+            raise CommandError("sim workers need a shared channel layer (channels_redis)")
+
+        if options["index"] is not None:
+            if not 0 <= options["index"] < procs:
+                raise CommandError(f"--index must be in 0..{procs - 1}")
+            self.stdout.write(f"sim worker {options['index']} on {worker_channel(options['index'])}")
+            run_worker(options["index"])
+            return
+
+        ctx = multiprocessing.get_context("spawn")
+        children = {}
+        started = {}
+
+        def spawn(i):
+            # daemon 이 아니어야 워커 안에서 전투 단계 프로세스 풀을 만들 수 있음 (game/offload.py)
+            p = ctx.Process(target=run_worker, args=(i,), name=f"sim-worker-{i}")
+            p.start()
+            children[i] = p
+            started[i] = time.monotonic()
+            self.stdout.write(f"sim worker {i} pid={p.pid} on {worker_channel(i)}")
+
+        for i in range(procs):
+            spawn(i)
+        try:
+            while True:
+                time.sleep(1.0)
+                for i, p in list(children.items()):
+                    if p.is_alive():
+                        continue
+                    self.stderr.write(self.style.ERROR(f"sim worker {i} exited (code {p.exitcode}), restarting"))
+                    if time.monotonic() - started[i] < RESTART_BACKOFF:
+                        time.sleep(RESTART_BACKOFF)
+                    spawn(i)
+        except KeyboardInterrupt:
+            self.stdout.write("stopping sim workers")
+            for p in children.values():
+                p.terminate()
+            for p in children.values():
+                p.join(timeout=10)
@@ -0,0 +1,160 @@
+# game/management/commands/scriptbench.py
+"""
+REST 전투/업그레이드: 예전 read-modify-write(GET -> json -> SET) vs Lua 스크립트.
+스레드 N개가 같은 세션에 동시에 요청 => 처리량과 유실된 업데이트 수 비교.
+숫자를 의미 있게 보려면 실제 redis-server 에 대고 돌린다 (--host/--port).
+settings 의 Redis 에 접속이 안 되면 loadtest 와 같은 임시 redis-server/fakeredis 로 대체.
+"""
+import json
+import threading
+import time
+
+import redis
+from django.core.management.base import BaseCommand
+
+from game import session_store
+from game.redis_manager import get_redis
+from game.management.commands.loadtest import start_redis_standin
+from game.redis_scripts import session_scripts
+from game.simulation import new_state
+
+
+# --- 예전 view 방식 (GET/json/SET, 키마다 왕복) ---
+
+def rmw_upgrade(r, session_id, color):
+    key = f"session:{session_id}:color_upgrades"
+    upgrades = json.loads(r.get(key))
+    upgrades[color] += 1
+    r.set(key, json.dumps(upgrades))
+    return upgrades[color]
+
+
+def rmw_attack(r, session_id):
+    p = f"session:{session_id}"
+    ball_list = json.loads(r.get(f"{p}:balls"))
+    enemy_list = json.loads(r.get(f"{p}:enemies"))
+    color_upgrades = json.loads(r.get(f"{p}:color_upgrades"))
+    for b in ball_list:
+        total_dmg = b["damage"] + color_upgrades.get(b["color"], 0)
+        for e in enemy_list:
+            if e["is_dead"]:
+                continue
+            net = max(0, total_dmg - e["defense"])
+            if net > 0 and e["shield"] > 0:
+                if e["shield"] >= net:
+                    e["shield"] -= net
+                    net = 0
+                else:
+                    net -= e["shield"]
+                    e["shield"] = 0
+            if net > 0:
+                e["hp"] -= net
+                if e["hp"] <= 0:
+                    e["hp"] = 0
+                    e["is_dead"] = True
+    r.set(f"{p}:enemies", json.dumps(enemy_list))
+
+
+def make_enemies(n):
+    return [{"name": f"E{i}", "hp": 10**9, "defense": 0, "shield": 0, "is_dead": False}
+            for i in range(n)]
+
+
+def make_balls(n):
+    return [{"color": "red", "rarity": "common", "damage": 1} for _ in range(n)]
+
+
+class Command(BaseCommand):
+    help = "Compare read-modify-write REST handlers with the atomic Lua scripts under concurrency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=200, help="requests per thread")
+        parser.add_argument("--enemies", type=int, default=50)
+        parser.add_argument("--balls", type=int, default=10)
+        parser.add_argument("--host", default=None, help="redis host (default: settings)")
+        parser.add_argument("--port", type=int, default=6379)
+
+    def handle(self, *args, **options):
+        cleanup = lambda: None
+        if options["host"]:
+            r = redis.Redis(host=options["host"], port=options["port"], decode_responses=True,
+                            max_connections=options["threads"] * 2)
+        else:
+            try:
+                get_redis().ping()
+            except redis.ConnectionError:
+                cleanup = start_redis_standin(self.stdout)
+            r = get_redis()
+        try:
+            self.bench(r, options)
+        finally:
+            cleanup()
+
+    def bench(self, r, options):
+        threads = options["threads"]
+        per = options["requests"]
+        total = threads * per
+        sid_old, sid_new = "bench-rmw", "bench-lua"
+
+        def setup():
+            p = f"session:{sid_old}"
+            r.set(f"{p}:balls", json.dumps(make_balls(options["balls"])))
+            r.set(f"{p}:enemies", json.dumps(make_enemies(options["enemies"])))
+            r.set(f"{p}:color_upgrades", json.dumps({"red": 0}))
+
+            st = new_state()
+            st["enemies"] = make_enemies(options["enemies"])
+            for i, b in enumerate(make_balls(options["balls"]), start=1):
+                st["balls"].append({**b, "id": i})
+            st["next_id"] = options["balls"] + 1
+            pipe = r.pipeline(transaction=False)
+            session_store.queue_new_session(pipe, sid_new, st)
+            pipe.execute()
+
+        def run(fn):
+            barrier = threading.Barrier(threads + 1)
+
+            def worker():
+                barrier.wait()
+                for _ in range(per):
+                    fn()
+            ts = [threading.Thread(target=worker) for _ in range(threads)]
+            for t in ts:
+                t.start()
+            barrier.wait()
+            t0 = time.perf_counter()
+            for t in ts:
+                t.join()
+            return time.perf_counter() - t0
+
+        scripts = session_scripts(r)
+        dmg_per_attack = options["balls"]  # 볼 데미지 1, 방어 0
+
+        setup()
+        rows = []
+        el = run(lambda: rmw_upgrade(r, sid_old, "red"))
+        got = json.loads(r.get(f"session:{sid_old}:color_upgrades"))["red"]
+        rows.append(("upgrade rmw", el, total - got))
+        el = run(lambda: scripts.upgrade_color(sid_new, "red"))
+        got = int(r.hget(session_store.keys(sid_new).upgrades, "red"))
+        rows.append(("upgrade lua", el, total - got))
+
+        # 업그레이드 레벨이 같아야 공격량 비교가 됨
+        setup()
+        el = run(lambda: rmw_attack(r, sid_old))
+        hp = json.loads(r.get(f"session:{sid_old}:enemies"))[0]["hp"]
+        rows.append(("attack rmw", el, total - (10**9 - hp) // dmg_per_attack))
+        el = run(lambda: scripts.attack(sid_new))
+        hp = json.loads(r.get(session_store.keys(sid_new).enemies))[0]["hp"]
+        rows.append(("attack lua", el, total - (10**9 - hp) // dmg_per_attack))
+
+        r.delete(*[f"session:{sid_old}:{n}" for n in ("balls", "enemies", "color_upgrades")],
+                 *session_store.keys(sid_new))
+        r.zrem(session_store.ACTIVE_INDEX, sid_new)
+
+        self.stdout.write(f"{threads} threads x {per} requests, {options['enemies']} enemies, "
+                          f"{options['balls']} balls")
+        self.stdout.write(f"{'handler':14s} {'req/s':>10s} {'lost updates':>14s}")
+        for name, el, lost in rows:
+            self.stdout.write(f"{name:14s} {total / el:10,.0f} {lost:14,d}")
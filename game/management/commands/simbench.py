@@ -0,0 +1,126 @@
+# game/management/commands/simbench.py
+import json
+import random
+import resource
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from game import offload, simulation
+from game.profiling import TickProfiler, PHASES
+
+
+def make_session(idx, balls, enemies):
+    """
+    합성 세션: 볼은 경로 근처에 흩어 놓고, 적은 경로 위에 미리 깔아둠
+    """
+    st = simulation.new_state()
+    rt = simulation.SimRuntime(TickProfiler(f"bench-{idx}"))
+    for _ in range(balls):
+        c = random.choice(simulation.COLORS)
+        b = simulation.add_ball(st, rt, c, "common")
+        b["x"] = b["target_x"] = random.choice([60.0, 200.0, 340.0])
+        b["y"] = b["target_y"] = random.uniform(40, 360)
+    for _ in range(enemies):
+        e = simulation.spawn_enemy(st, rt)
+        e["dist"] = random.uniform(0, 1280)
+        e["hp"] = 10**6  # 벤치 도중 죽지 않게
+    return st, rt
+
+
+def offload_tick(pool, sessions):
+    """
+    모든 세션 한 틱: numpy 세션의 전투 단계는 풀에 한꺼번에 보내고 나머지는 인라인 (game/offload.py)
+    """
+    waves = [simulation.begin_step(st, simulation.TICK, rt) for st, rt in sessions]
+    futures = []
+    for st, rt in sessions:
+        if rt.world is not None:
+            futures.append(offload.submit_combat(pool, rt.world, simulation.TICK, st["color_upgrades"], rt.tick))
+        else:
+            futures.append(None)
+            simulation.combat(st, simulation.TICK, rt)
+    for (st, rt), fut, wave in zip(sessions, futures, waves):
+        if fut is not None:
+            mark = rt.profiler.now()
+            offload.apply_combat(rt.world, rt.effects, fut.result())
+            rt.profiler.lap("offload", mark)
+        simulation.end_step(st, rt, wave)
+
+
+class Command(BaseCommand):
+    help = "Run N synthetic sessions for M ticks as fast as possible (headless simulation benchmark)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=100)
+        parser.add_argument("--ticks", type=int, default=600)
+        parser.add_argument("--balls", type=int, default=10, help="balls per session")
+        parser.add_argument("--enemies", type=int, default=0, help="pre-spawned enemies per session")
+        parser.add_argument("--stage", type=int, default=1, help="starting stage")
+        parser.add_argument("--frames", action="store_true",
+                            help="also build + json-encode a tick_update every 5 ticks")
+        parser.add_argument("--offload", action="store_true",
+                            help="run the move/attack phase of numpy-backend sessions in the process pool")
+        parser.add_argument("--tracemalloc", action="store_true",
+                            help="track Python peak memory (slower)")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        if options["tracemalloc"]:
+            tracemalloc.start()
+
+        sessions = [make_session(i, options["balls"], options["enemies"])
+                    for i in range(options["sessions"])]
+        for st, _ in sessions:
+            st["stage"] = options["stage"]
+
+        ticks = options["ticks"]
+        pool = offload.get_pool() if options["offload"] else None
+        if pool is not None:
+            # 워커 프로세스 시작 시간은 측정에서 뺌
+            for fut in [pool.submit(time.sleep, 0.2) for _ in range(offload.POOL_SIZE)]:
+                fut.result()
+        frame_time = 0.0
+        t0 = time.perf_counter()
+        for n in range(ticks):
+            if pool is not None:
+                offload_tick(pool, sessions)
+            else:
+                for st, rt in sessions:
+                    simulation.step(st, simulation.TICK, rt)
+            if options["frames"] and n % 5 == 4:
+                f0 = time.perf_counter()
+                for st, rt in sessions:
+                    json.dumps(simulation.build_frame(st, rt))
+                frame_time += time.perf_counter() - f0
+        elapsed = time.perf_counter() - t0
+
+        total_ticks = ticks * len(sessions)
+        rate = total_ticks / elapsed if elapsed else 0.0
+        self.stdout.write(
+            f"{len(sessions)} sessions x {ticks} ticks in {elapsed:.2f}s => "
+            f"{rate:,.0f} ticks/s ({rate * simulation.TICK:,.0f} sessions at real-time 10Hz)"
+        )
+
+        enemies = sum(len(rt.world.enemy_meta) if rt.world else len(st["enemies"]) for st, rt in sessions)
+        numpy_sessions = sum(1 for _, rt in sessions if rt.world is not None)
+        self.stdout.write(f"live enemies at end: {enemies} ({numpy_sessions} sessions on numpy backend)")
+
+        self.stdout.write("per-phase time (ms per session tick):")
+        for phase in PHASES:
+            spent = sum(rt.profiler.totals[phase] for _, rt in sessions)
+            if spent:
+                self.stdout.write(f"  {phase:14s} {spent / total_ticks * 1000:8.4f}  ({spent:.2f}s)")
+        if options["frames"]:
+            frames = (ticks // 5) * len(sessions)
+            self.stdout.write(f"  {'frame+json':14s} {frame_time / max(frames, 1) * 1000:8.4f}  "
+                              f"per frame ({frame_time:.2f}s)")
+
+        maxrss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(f"peak RSS: {maxrss_mb:.1f} MB")
+        if options["tracemalloc"]:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f"peak traced Python memory: {peak / 1024 / 1024:.1f} MB")
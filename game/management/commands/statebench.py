@@ -0,0 +1,99 @@
+# game/management/commands/statebench.py
+"""
+액션 하나당 Redis에 쓰는 바이트 비교: 예전 JSON blob(session:{id}:state) vs 필드 단위 레이아웃.
+명령은 pipeline에 쌓기만 하고 실행하지 않으므로 Redis 서버가 필요 없다.
+"""
+import json
+import random
+
+import redis
+from django.core.management.base import BaseCommand
+from redis.connection import Connection
+
+from game import simulation
+from game.session_store import StateWriter
+
+
+def command_bytes(pipe):
+    """
+    pipeline에 쌓인 명령들의 RESP 인코딩 크기 합
+    """
+    conn = Connection()
+    return sum(
+        sum(len(chunk) for chunk in conn.pack_command(*args))
+        for args, _ in pipe.command_stack
+    )
+
+
+def blob_bytes(session_id, st):
+    pipe = redis.Redis().pipeline(transaction=False)
+    pipe.set(f"session:{session_id}:state", json.dumps(st))
+    return command_bytes(pipe)
+
+
+def field_bytes(writer, st):
+    pipe = redis.Redis().pipeline(transaction=False)
+    pending = writer.queue(pipe, st)
+    if pending:
+        writer.confirm(pending)
+    return command_bytes(pipe)
+
+
+class Command(BaseCommand):
+    help = "Bytes written to Redis per action: JSON state blob vs field-level hash layout"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--enemies", type=int, default=200)
+        parser.add_argument("--balls", type=int, default=20)
+        parser.add_argument("--actions", type=int, default=200, help="samples per action type")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        st = simulation.new_state()
+        rt = simulation.SimRuntime()
+        for _ in range(options["balls"]):
+            simulation.add_ball(st, rt, random.choice(simulation.COLORS), "common")
+        for _ in range(options["enemies"]):
+            e = simulation.spawn_enemy(st, rt)
+            e["dist"] = random.uniform(0, 1280)
+            e["hp"] = 10**6  # 벤치 도중 죽지 않게
+        simulation.sync(st, rt)
+
+        writer = StateWriter("bench")
+        initial = field_bytes(writer, st)
+
+        def move():
+            idx = random.randrange(simulation.ball_count(st, rt))
+            simulation.set_ball_target(st, rt, idx, random.uniform(0, 400), random.uniform(0, 400))
+
+        def upgrade():
+            simulation.upgrade_color(st, random.choice(simulation.COLORS))
+
+        def summon():
+            simulation.add_ball(st, rt, random.choice(simulation.COLORS), "common")
+
+        def checkpoint():
+            for _ in range(10):
+                simulation.step(st, simulation.TICK, rt)
+
+        rows = []
+        for name, action in (("upgrade_color", upgrade), ("move_ball", move),
+                             ("summon_ball", summon), ("checkpoint (10 ticks)", checkpoint)):
+            old = new = 0
+            for _ in range(options["actions"]):
+                action()
+                simulation.sync(st, rt)
+                old += blob_bytes("bench", st)
+                new += field_bytes(writer, st)
+            n = options["actions"]
+            rows.append((name, old / n, new / n))
+
+        self.stdout.write(
+            f"session: {len(st['enemies'])} enemies, {len(st['balls'])} balls at end "
+            f"(initial field-layout write {initial:,} B)"
+        )
+        self.stdout.write(f"{'action':24s} {'blob B':>10s} {'fields B':>10s} {'ratio':>8s}")
+        for name, old, new in rows:
+            ratio = old / new if new else float("inf")
+            self.stdout.write(f"{name:24s} {old:10,.0f} {new:10,.0f} {ratio:8.1f}x")
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_balltemplate_enemytemplate_remove_ball_session_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionSnapshot',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='game.gamesession')),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('schema', models.PositiveSmallIntegerField(default=1)),
+                ('stage', models.IntegerField(default=1)),
+                ('is_active', models.BooleanField(default=True)),
+                ('data', models.BinaryField()),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 User = settings.AUTH_USER_MODEL
 
@@ -11,6 +12,23 @@ class GameSession(models.Model):
     def __str__(self):
         return f"GameSession {self.id} (User={self.user}, active={self.is_active})"
 
+class SessionSnapshot(models.Model):
+    """
+    세션 진행 상황의 최신 압축 스냅샷 (Redis 유실 대비 복구용). 세션당 한 행
+    data = zlib(JSON), 형식은 game/snapshots.py
+    """
+    session = models.OneToOneField(GameSession, on_delete=models.CASCADE, primary_key=True,
+                                   related_name="snapshot")
+    version = models.PositiveIntegerField(default=1)       # 기록할 때마다 +1
+    schema = models.PositiveSmallIntegerField(default=1)   # data 형식 버전
+    stage = models.IntegerField(default=1)
+    is_active = models.BooleanField(default=True)
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"SessionSnapshot {self.session_id} v{self.version} (stage={self.stage})"
+
 class BallTemplate(models.Model):
     color = models.CharField(max_length=20)
     rarity = models.CharField(max_length=20)
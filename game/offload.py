@@ -0,0 +1,153 @@
+# game/offload.py
+"""
+큰 세션의 이동/전투 단계(simulation.combat)를 프로세스 풀에서 돌리기.
+
+적이 수천 마리 쌓인 세션은 틱 하나가 틱 주기(100ms)보다 길어질 수 있고, 그동안 같은 이벤트 루프의
+다른 세션 틱/소켓/HTTP 가 모두 멈춘다. 세션마다 전투 단계 시간을 재서 (EWMA)
+- OFFLOAD_THRESHOLD 를 넘으면 그 단계만 ProcessPoolExecutor 로 (나머지 단계와 Redis/broadcast 는 그대로 루프에서)
+- THRESHOLD/2 아래로 내려오면 다시 인라인
+- 전환 후 MIN_DWELL_TICKS 틱은 같은 모드 유지 (경계에서 왔다갔다 하지 않게)
+
+numpy 백엔드(sim_numpy.NumpyWorld) 세션만 보낼 수 있다: dict 변환 없이 배열 그대로 pickle 하고
+바뀌는 배열만 돌려받는다 (sim_numpy.pack_combat / combat_step). 작은 세션은 항상 인라인.
+풀은 처음 필요할 때 만든다 (큰 세션이 없으면 프로세스도 없음). 풀이 깨지면 인라인으로 돌아가고 다음에 새로 만든다.
+전환 횟수/오프로드 틱 수는 프로파일 통계의 "offload" (profile_session, 프로파일 API).
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from . import simulation
+from .sim_numpy import NUMPY_AVAILABLE, combat_step
+
+logger = logging.getLogger(__name__)
+
+# 전투 단계 전용 프로세스 수 (0 = 끔, 항상 인라인)
+POOL_SIZE = int(getattr(settings, 'GAME_OFFLOAD_PROCS', 2))
+# 세션 하나의 전투 단계가 이 시간(초)을 넘으면 프로세스 풀로
+OFFLOAD_THRESHOLD = float(getattr(settings, 'GAME_OFFLOAD_THRESHOLD', 0.03))
+MIN_DWELL_TICKS = 20
+EWMA_ALPHA = 0.2
+
+_pool = None
+# 프로세스 전체 통계 (풀 생성/깨짐 횟수, 지금 풀을 쓰는 세션 수)
+pool_stats = {"started": 0, "broken": 0, "sessions": 0}
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # fork 는 이벤트 루프/스레드(snapshot writer 등) 상태까지 복사하므로 spawn
+        _pool = ProcessPoolExecutor(POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+        pool_stats["started"] += 1
+    return _pool
+
+
+def reset_pool(pool):
+    """
+    깨진 풀 버리기 (여러 세션이 같은 풀에서 실패해도 새로 만든 풀은 그대로). return 버렸으면 True
+    """
+    global _pool
+    if _pool is not pool:
+        return False
+    pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    return True
+
+
+def submit_combat(pool, world, dt, color_upgrades, tick):
+    """
+    return concurrent.futures.Future => sim_numpy.combat_step 결과
+    """
+    return pool.submit(combat_step, world.pack_combat(color_upgrades), dt, tick,
+                       world.ball_speed, world.attack_range)
+
+
+def apply_combat(world, effects, result):
+    """
+    풀 결과를 world/이펙트 버퍼에 반영. return 워커에서 걸린 계산 시간(초)
+    """
+    arrays, events, elapsed = result
+    world.unpack_combat(arrays)
+    for ev in events:
+        effects.push(*ev)
+    return elapsed
+
+
+class CombatOffload:
+    """
+    세션 하나의 인라인 / 프로세스 풀 선택
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.active = False
+        self.step_time = 0.0   # 전투 단계 시간 EWMA(초, 풀에서는 워커 계산 시간)
+        self.dwell = 0
+        self.switches = 0
+        self.offloaded = 0     # 풀에서 돈 틱 수
+        self.skipped = 0       # 앞 틱이 풀에서 안 끝나 건너뛴 틱 수
+
+    def usable(self, rt):
+        return self.active and rt.world is not None
+
+    def observe(self, seconds):
+        self.step_time += EWMA_ALPHA * (seconds - self.step_time)
+        self.dwell += 1
+        if self.dwell < MIN_DWELL_TICKS:
+            return
+        if not self.active and self.step_time > OFFLOAD_THRESHOLD and POOL_SIZE > 0 and NUMPY_AVAILABLE:
+            self.switch(True)
+        elif self.active and self.step_time < OFFLOAD_THRESHOLD / 2:
+            self.switch(False)
+
+    def switch(self, active):
+        self.active = active
+        self.dwell = 0
+        self.switches += 1
+        pool_stats["sessions"] += 1 if active else -1
+        logger.info("session %s combat => %s (step %.1fms)", self.session_id,
+                    "process pool" if active else "inline", self.step_time * 1000)
+
+    def close(self):
+        if self.active:
+            self.active = False
+            pool_stats["sessions"] -= 1
+
+    async def run(self, st, dt, rt):
+        """
+        rt.world 의 이동/전투 단계를 풀에서. 풀이 깨졌으면 인라인으로 돌리고 인라인 모드로
+        """
+        prof = rt.profiler
+        mark = prof.now()
+        pool = get_pool()
+        try:
+            fut = submit_combat(pool, rt.world, dt, st["color_upgrades"], rt.tick)
+            result = await asyncio.wrap_future(fut)
+        except BrokenProcessPool:
+            logger.error("combat process pool broken, session %s back to inline", self.session_id)
+            if reset_pool(pool):
+                pool_stats["broken"] += 1
+            self.switch(False)
+            self.observe(simulation.combat(st, dt, rt))
+            return
+        elapsed = apply_combat(rt.world, rt.effects, result)
+        prof.lap("offload", mark)
+        self.offloaded += 1
+        self.observe(elapsed)
+
+    def summary(self):
+        return {
+            "mode": "pool" if self.active else "inline",
+            "step_ms": round(self.step_time * 1000, 3),
+            "threshold_ms": OFFLOAD_THRESHOLD * 1000,
+            "switches": self.switches,
+            "offloaded_ticks": self.offloaded,
+            "skipped_ticks": self.skipped,
+            "pool": {"procs": POOL_SIZE, **pool_stats},
+        }
+
@@ -0,0 +1,154 @@
+# game/ownership.py
+"""
+세션 시뮬레이션 소유권 (Redis lease).
+
+세션마다 소유자는 정확히 하나: session:{id}:owner 키를 SET NX PX 로 잡은 consumer만
+틱을 돌리고 Redis에 기록한다. 같은 세션의 나머지 연결은 viewer (group broadcast만 받음,
+액션은 group으로 넘겨 소유자가 처리).
+
+- 소유자: RENEW_INTERVAL 마다 lease 갱신 (값이 내 토큰일 때만 PEXPIRE)
+  갱신 실패 = 소유권 잃음 => 틱 중단, viewer 로 강등
+- 소유자 disconnect: 체크포인트 후 lease 삭제 (내 토큰일 때만) => 같은 프로세스 viewer 즉시 승격
+- 소유자 프로세스가 죽으면 lease 가 TTL 후 만료 => 아무 프로세스의 viewer 가 승격 (마지막 체크포인트부터)
+
+프로세스당 LeaseManager 하나가 모든 lease 갱신/승격 시도를 한 루프에서 처리
+(비용은 소켓 수가 아니라 세션 수에 비례).
+"""
+import asyncio
+import logging
+import os
+import socket
+from collections import defaultdict
+
+from django.conf import settings
+
+from .redis_manager import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+LEASE_TTL = float(getattr(settings, 'GAME_LEASE_TTL', 5.0))
+RENEW_INTERVAL = LEASE_TTL / 3
+
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# 내 토큰일 때만 만료 연장 / 삭제
+RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def lease_key(session_id):
+    return f"session:{session_id}:owner"
+
+
+def lease_token(channel_name):
+    return f"{PROCESS_ID}:{channel_name}"
+
+
+class LeaseManager:
+    """
+    consumer 쪽 인터페이스:
+        consumer.session_id, consumer.lease_token
+        await consumer.become_owner()   승격 (상태 로드 + 틱 등록)
+        await consumer.lose_ownership() lease 를 잃음 (틱 중단, viewer 로)
+    """
+
+    def __init__(self):
+        self.owned = {}                   # session_id -> 소유 consumer
+        self.viewers = defaultdict(set)   # session_id -> 이 프로세스의 viewer consumer들
+        self.task = None
+
+    def _ensure_task(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def claim(self, consumer):
+        """
+        return lease 를 잡았으면 True
+        """
+        r = get_async_redis()
+        ok = await r.set(lease_key(consumer.session_id), consumer.lease_token,
+                         nx=True, px=int(LEASE_TTL * 1000))
+        if ok:
+            self.owned[consumer.session_id] = consumer
+            self._ensure_task()
+        return bool(ok)
+
+    async def release(self, consumer):
+        sid = consumer.session_id
+        if self.owned.get(sid) is consumer:
+            del self.owned[sid]
+        r = get_async_redis()
+        await r.eval(RELEASE, 1, lease_key(sid), consumer.lease_token)
+        # 같은 프로세스 viewer 가 있으면 TTL 기다리지 않고 바로 넘김
+        await self.try_promote(sid)
+
+    def add_viewer(self, consumer):
+        self.viewers[consumer.session_id].add(consumer)
+        self._ensure_task()
+
+    def remove_viewer(self, consumer):
+        vs = self.viewers.get(consumer.session_id)
+        if vs is not None:
+            vs.discard(consumer)
+            if not vs:
+                del self.viewers[consumer.session_id]
+
+    async def try_promote(self, session_id):
+        if session_id in self.owned:
+            return
+        for consumer in list(self.viewers.get(session_id, ())):
+            if await self.claim(consumer):
+                self.remove_viewer(consumer)
+                try:
+                    await consumer.become_owner()
+                except Exception:
+                    logger.exception("promotion failed for session %s", session_id)
+                    await self.release(consumer)
+            return
+
+    async def renew_all(self):
+        owned = list(self.owned.items())
+        if not owned:
+            return
+        r = get_async_redis()
+        ttl_ms = int(LEASE_TTL * 1000)
+        async with r.pipeline(transaction=False) as pipe:
+            for sid, c in owned:
+                pipe.eval(RENEW, 1, lease_key(sid), c.lease_token, ttl_ms)
+            results = await pipe.execute()
+        for (sid, c), ok in zip(owned, results):
+            if not ok and self.owned.get(sid) is c:
+                logger.warning("lost lease for session %s", sid)
+                del self.owned[sid]
+                await c.lose_ownership()
+
+    async def _run(self):
+        while self.owned or self.viewers:
+            await asyncio.sleep(RENEW_INTERVAL)
+            try:
+                await self.renew_all()
+                # 소유자가 없는 (다른 프로세스 소유자가 죽었거나 떠난) 세션의 viewer 승격 시도
+                for sid in [s for s in self.viewers if s not in self.owned]:
+                    await self.try_promote(sid)
+            except Exception:
+                logger.exception("lease loop failed")
+
+
+_manager = None
+
+
+def get_lease_manager():
+    global _manager
+    if _manager is None:
+        _manager = LeaseManager()
+    return _manager
@@ -0,0 +1,49 @@
+# game/path.py
+"""
+큰 사각형을 (20,20)-(20,380)-(380,380)-(380,20)-(20,20) 로 설정
+작은 사각형을 (100,100)-(300,100)-(300,300)-(100,300)-(100,100)
+적은 PATH_POINTS를 따라 반시계 이동 (마지막 점 다음은 다시 첫 점)
+
+경로를 누적 길이(arc-length)로 미리 계산해 두고, 적은 "이동한 거리" 스칼라 하나만 가진다.
+x/y는 타겟팅/broadcast 때만 position_at()으로 구한다.
+"""
+from bisect import bisect_right
+
+PATH_POINTS = [
+    (20,20),(20,380),(100,380),(100,300),(300,300),(300,100),(100,100),(100,20)
+    # 다시 (20,20)로
+]
+
+# 닫힌 경로 꼭짓점 (마지막에 시작점 추가)
+LOOP_POINTS = PATH_POINTS + [PATH_POINTS[0]]
+LOOP_X = [p[0] for p in LOOP_POINTS]
+LOOP_Y = [p[1] for p in LOOP_POINTS]
+
+SEGMENT_LENGTHS = [
+    ((x1-x0)**2 + (y1-y0)**2)**0.5
+    for (x0, y0), (x1, y1) in zip(LOOP_POINTS, LOOP_POINTS[1:])
+]
+# CUMULATIVE[i] = i번째 꼭짓점까지의 거리, 마지막 값 = 한 바퀴 길이
+CUMULATIVE = [0.0]
+for _l in SEGMENT_LENGTHS:
+    CUMULATIVE.append(CUMULATIVE[-1] + _l)
+TOTAL_LENGTH = CUMULATIVE[-1]
+
+
+def segment_at(dist):
+    """
+    dist(누적 이동거리)가 속한 구간 번호 (0 ~ len(PATH_POINTS)-1)
+    """
+    d = dist % TOTAL_LENGTH
+    i = bisect_right(CUMULATIVE, d) - 1
+    return min(i, len(SEGMENT_LENGTHS) - 1)
+
+
+def position_at(dist):
+    d = dist % TOTAL_LENGTH
+    i = min(bisect_right(CUMULATIVE, d) - 1, len(SEGMENT_LENGTHS) - 1)
+    t = (d - CUMULATIVE[i]) / SEGMENT_LENGTHS[i]
+    return (
+        LOOP_X[i] + (LOOP_X[i+1] - LOOP_X[i]) * t,
+        LOOP_Y[i] + (LOOP_Y[i+1] - LOOP_Y[i]) * t,
+    )
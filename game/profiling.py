@@ -0,0 +1,198 @@
+# game/profiling.py
+"""
+틱 단계별(input, spawn, move_enemies, ..., redis, broadcast) 경량 계측.
+offload = 이동/전투 단계를 프로세스 풀에서 기다린 시간 (game/offload.py, 그 틱은 move_*/balls_attack 대신).
+
+- 세션별 TickProfiler: 단계별 최근 WINDOW_TICKS 틱의 롤링 히스토그램 + 예산 초과(overrun) 카운터
+- cProfile 전체 캡처: 특정 세션 하나에 대해 N초 동안만 켠다 (꺼져 있으면 비용 없음)
+  틱의 동기 구간(capturing())에서만 켠다: await 사이에는 다른 세션/소켓 코루틴이 돌기 때문.
+  cProfile 은 스레드당 하나라 프로세스 전체에서 캡처는 한 번에 하나 (나머지 요청은 대기).
+  요청은 Redis 키(profile_request_key)로 전달되므로 DRF view / 관리 명령 어느 프로세스에서도 가능.
+  결과 .prof 파일 경로는 profile_result_key 에, 요약 통계는 profile_stats_key 에 기록된다.
+"""
+import cProfile
+import os
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+PHASES = ("input", "spawn", "move_enemies", "move_balls", "balls_attack", "offload", "compact",
+          "redis", "broadcast")
+
+# 히스토그램 버킷 상한 (ms). 마지막 버킷은 그 이상 전부
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+WINDOW_TICKS = int(getattr(settings, 'GAME_PROFILE_WINDOW_TICKS', 600))
+# 세션 하나의 틱이 이 시간(초)을 넘으면 overrun
+TICK_BUDGET = float(getattr(settings, 'GAME_TICK_BUDGET', 0.02))
+PROFILE_DIR = str(getattr(settings, 'GAME_PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+MAX_CAPTURE_SECONDS = 300
+
+
+def profile_request_key(session_id):
+    return f"session:{session_id}:profile_request"
+
+
+def profile_result_key(session_id):
+    return f"session:{session_id}:profile_result"
+
+
+def profile_stats_key(session_id):
+    return f"session:{session_id}:profile_stats"
+
+
+class RollingHistogram:
+    __slots__ = ("counts", "window", "last")
+
+    def __init__(self, size=WINDOW_TICKS):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.window = deque(maxlen=size)
+        self.last = 0.0
+
+    def add(self, ms):
+        b = bisect_left(BUCKETS_MS, ms)
+        if len(self.window) == self.window.maxlen:
+            self.counts[self.window[0]] -= 1
+        self.window.append(b)
+        self.counts[b] += 1
+        self.last = ms
+
+    def percentile(self, p):
+        """
+        버킷 상한 기준 근사값 (ms). 마지막 버킷(100ms 초과)이면 None
+        """
+        n = len(self.window)
+        if not n:
+            return 0.0
+        rank = p * n
+        seen = 0
+        for b, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return BUCKETS_MS[b] if b < len(BUCKETS_MS) else None
+        return None
+
+    def summary(self):
+        return {
+            "n": len(self.window),
+            "last_ms": round(self.last, 3),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": self.counts[:],
+        }
+
+
+class TickProfiler:
+    def __init__(self, session_id, budget=TICK_BUDGET):
+        self.session_id = session_id
+        self.budget = budget
+        self.phases = {name: RollingHistogram() for name in PHASES}
+        # 단계별 누적 시간(초), 벤치마크 집계용
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.total = RollingHistogram()
+        self.ticks = 0
+        self.overruns = 0
+        self.capture = None
+        self.capture_until = 0.0
+
+    def begin_tick(self):
+        return time.perf_counter()
+
+    @contextmanager
+    def capturing(self):
+        """
+        캡처 중이면 이 블록 동안만 cProfile 켜기 (블록 안에 await 가 없어야 함)
+        """
+        if self.capture is None:
+            yield
+            return
+        self.capture.enable()
+        try:
+            yield
+        finally:
+            self.capture.disable()
+
+    now = staticmethod(time.perf_counter)
+
+    def lap(self, phase, since):
+        """
+        since 이후 경과 시간을 phase에 기록하고 현재 시각 반환 (다음 lap의 기준)
+        """
+        now = time.perf_counter()
+        self.phases[phase].add((now - since) * 1000)
+        self.totals[phase] += now - since
+        return now
+
+    def end_tick(self, started):
+        elapsed = time.perf_counter() - started
+        self.ticks += 1
+        self.total.add(elapsed * 1000)
+        if elapsed > self.budget:
+            self.overruns += 1
+        return elapsed
+
+    # --- cProfile 캡처 ---
+
+    def start_capture(self, seconds):
+        """
+        return 시작했으면 True. 다른 세션이 캡처 중이면 False
+        """
+        global _capturing
+        if _capturing is not None and _capturing is not self:
+            return False
+        seconds = max(1, min(int(seconds), MAX_CAPTURE_SECONDS))
+        if self.capture is None:
+            self.capture = cProfile.Profile()
+        _capturing = self
+        self.capture_until = time.monotonic() + seconds
+        return True
+
+    def cancel_capture(self):
+        global _capturing
+        self.capture = None
+        if _capturing is self:
+            _capturing = None
+
+    def finish_capture_if_due(self):
+        """
+        캡처 시간이 끝났으면 .prof 파일로 저장하고 경로 반환 (아니면 None)
+        """
+        if self.capture is None or time.monotonic() < self.capture_until:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"session_{self.session_id}_{int(time.time())}.prof")
+        self.capture.dump_stats(path)
+        self.cancel_capture()
+        return path
+
+    def summary(self):
+        return {
+            "session_id": self.session_id,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "budget_ms": self.budget * 1000,
+            "capturing": self.capture is not None,
+            "total": self.total.summary(),
+            "phases": {name: h.summary() for name, h in self.phases.items()},
+        }
+
+
+_profilers = {}
+# 지금 cProfile 캡처 중인 TickProfiler (프로세스당 하나)
+_capturing = None
+
+
+def get_profiler(session_id):
+    prof = _profilers.get(session_id)
+    if prof is None:
+        prof = _profilers[session_id] = TickProfiler(session_id)
+    return prof
+
+
+def drop_profiler(session_id):
+    prof = _profilers.pop(session_id, None)
+    if prof is not None:
+        prof.cancel_capture()
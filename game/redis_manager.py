@@ -1,12 +1,84 @@
 # game/redis_manager.py
+import asyncio
+import weakref
+
 import redis
+import redis.asyncio as aioredis
 from django.conf import settings
 
 REDIS_HOST = getattr(settings, 'REDIS_HOST', '127.0.0.1')
 REDIS_PORT = int(getattr(settings, 'REDIS_PORT', 6379))
+REDIS_DB = int(getattr(settings, 'REDIS_DB', 0))
+REDIS_MAX_CONNECTIONS = int(getattr(settings, 'REDIS_MAX_CONNECTIONS', 50))
+REDIS_POOL_TIMEOUT = float(getattr(settings, 'REDIS_POOL_TIMEOUT', 5.0))
+REDIS_SOCKET_TIMEOUT = float(getattr(settings, 'REDIS_SOCKET_TIMEOUT', 2.0))
+REDIS_CONNECT_TIMEOUT = float(getattr(settings, 'REDIS_CONNECT_TIMEOUT', 2.0))
+REDIS_HEALTH_CHECK_INTERVAL = int(getattr(settings, 'REDIS_HEALTH_CHECK_INTERVAL', 30))
+
+
+def _pool_kwargs():
+    return {
+        "host": _target["host"],
+        "port": _target["port"],
+        "db": REDIS_DB,
+        "decode_responses": True,
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "timeout": REDIS_POOL_TIMEOUT,  # 풀이 가득 찼을 때 대기 시간
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_CONNECT_TIMEOUT,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+_target = {"host": REDIS_HOST, "port": REDIS_PORT}
+
+# 동기 클라이언트 (DRF view 등 sync 코드용)
+_sync_pool = redis.BlockingConnectionPool(**_pool_kwargs())
+r = redis.Redis(connection_pool=_sync_pool)
+
+# 비동기 클라이언트 (consumer 등 async 코드용)
+# asyncio 커넥션은 생성된 event loop에 묶이므로 loop마다 풀을 하나씩 둔다
+_async_clients = weakref.WeakKeyDictionary()
+_async_factory = None
 
-# 단일 Redis connection
-r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
 
 def get_redis():
+    """
+    sync 코드 전용. async 핸들러 안에서 호출하면 event loop 전체가 블로킹됨
+    """
     return r
+
+
+def get_async_redis():
+    """
+    async 코드 전용. 현재 event loop에 묶인 redis.asyncio 클라이언트 반환
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        if _async_factory is not None:
+            client = _async_factory()
+        else:
+            pool = aioredis.BlockingConnectionPool(**_pool_kwargs())
+            client = aioredis.Redis(connection_pool=pool)
+        _async_clients[loop] = client
+    return client
+
+
+def configure(host=None, port=None, sync_client=None, async_factory=None):
+    """
+    접속 대상 교체 (부하 테스트 등 관리 명령용). 기존 클라이언트/풀은 버린다.
+    sync_client/async_factory 를 주면 host/port 대신 그 클라이언트를 쓴다.
+    """
+    global r, _sync_pool, _async_factory
+    if host is not None:
+        _target["host"] = host
+    if port is not None:
+        _target["port"] = int(port)
+    if sync_client is not None:
+        r = sync_client
+    else:
+        _sync_pool = redis.BlockingConnectionPool(**_pool_kwargs())
+        r = redis.Redis(connection_pool=_sync_pool)
+    _async_factory = async_factory
+    _async_clients.clear()
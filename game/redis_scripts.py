@@ -0,0 +1,240 @@
+# game/redis_scripts.py
+"""
+REST 엔드포인트용 Redis Lua 스크립트 (session_store 레이아웃 기준).
+
+GET -> json.loads -> 수정 -> SET 을 여러 번 왕복하면 동시 요청끼리 업데이트가 사라진다.
+여기 스크립트는 서버에서 한 번에(원자적으로) 실행되고 왕복도 한 번 (EVALSHA,
+서버에 없으면 redis-py 가 SCRIPT LOAD 후 재시도).
+
+    from .redis_scripts import session_scripts
+    level = session_scripts().upgrade_color(session_id, "red")
+
+실패는 SessionStateError(code) 로 올라온다.
+소유자(game/ownership.py lease)가 돌리고 있는 세션은 OWNED 로 거절 => view 가 소유자에게 넘김.
+"""
+import json
+import time
+import weakref
+from typing import List, NamedTuple, Tuple, Union
+
+from redis.exceptions import ResponseError
+
+from .redis_manager import get_redis
+from .session_store import keys, SESSION_TTL, ACTIVE_INDEX
+from .ownership import lease_key
+from .entities import SLOT_BITS
+
+SessionId = Union[int, str]
+
+# 모든 스크립트 공통
+#   KEYS = meta, balls, upgrades, enemies, owner lease, sessions:active (session_keys)
+#   ARGV[1]=SESSION_TTL ARGV[2]=지금(unix) ARGV[3]=session id, 스크립트별 인자는 ARGV[4]부터
+# meta 가 없으면 (만료/종료된 세션) 키를 TTL 없이 다시 만들지 않도록 거절.
+# 소유자가 있는 세션은 소유자 메모리 상태가 원본이고 다음 체크포인트에 Redis 를 덮어쓴다
+# => 여기서 고치면 사라지므로 거절 (view 가 소유자에게 넘김, game/forwarding.py)
+# 성공하면 touch(): 세션 키 TTL 연장 + 인덱스에 활동 시각 (session_store.queue_touch 와 같음)
+_GUARD = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return redis.error_reply('NO_SESSION')
+end
+if redis.call('EXISTS', KEYS[5]) == 1 then
+    return redis.error_reply('OWNED')
+end
+local function touch()
+    for i = 1, 4 do redis.call('EXPIRE', KEYS[i], ARGV[1]) end
+    redis.call('ZADD', KEYS[6], ARGV[2], ARGV[3])
+end
+"""
+
+# ARGV[4]=color
+UPGRADE_COLOR = _GUARD + """
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    return redis.error_reply('NO_UPGRADES')
+end
+if redis.call('HEXISTS', KEYS[3], ARGV[4]) == 0 then
+    return redis.error_reply('INVALID_COLOR')
+end
+local level = redis.call('HINCRBY', KEYS[3], ARGV[4], 1)
+touch()
+return level
+"""
+
+# ARGV[4]=id 를 뺀 ball JSON 객체 (비어 있지 않음)
+# return {ball_id, ball_count}
+SUMMON_BALL = _GUARD + """
+local id = redis.call('HINCRBY', KEYS[1], 'next_id', 1) - 1
+local body = '{"id":' .. id .. ',' .. string.sub(ARGV[4], 2)
+redis.call('HSET', KEYS[2], tostring(id), body)
+touch()
+return {id, redis.call('HLEN', KEYS[2])}
+"""
+
+# ARGV[4..n]=id 를 뺀 적 JSON 객체 (simulation 형식, simulation.enemy_fields)
+# id 는 meta 의 enemy_pool 에서 entities.alloc_id 와 같은 규칙으로 할당
+# 적 리스트는 JSON 배열 문자열 이어붙이기만 하므로 기존 적은 디코딩하지 않는다
+# return 새 id 리스트
+SPAWN_ENEMIES = _GUARD + """
+local SLOT_SIZE = %d
+local raw_pool = redis.call('HGET', KEYS[1], 'enemy_pool')
+local pool = raw_pool and cjson.decode(raw_pool) or {}
+local gens, free = pool.gens or {}, pool.free or {}
+local ids, items = {}, {}
+for i = 4, #ARGV do
+    local slot
+    if #free > 0 then
+        slot = table.remove(free)
+        gens[slot + 1] = gens[slot + 1] + 1
+    else
+        slot = #gens
+        gens[slot + 1] = 0
+    end
+    local id = gens[slot + 1] * SLOT_SIZE + slot
+    ids[#ids + 1] = id
+    items[#items + 1] = '{"id":' .. id .. ',' .. string.sub(ARGV[i], 2)
+end
+-- cjson 은 빈 배열을 {} 로 인코딩하므로 직접
+redis.call('HSET', KEYS[1], 'enemy_pool',
+    '{"gens":[' .. table.concat(gens, ',') .. '],"free":[' .. table.concat(free, ',') .. ']}')
+local added = table.concat(items, ',')
+local cur = redis.call('GET', KEYS[4])
+if (not cur) or cur == '[]' then
+    redis.call('SET', KEYS[4], '[' .. added .. ']', 'KEEPTTL')
+else
+    redis.call('SET', KEYS[4], string.sub(cur, 1, -2) .. ',' .. added .. ']', 'KEEPTTL')
+end
+touch()
+return ids
+""" % (1 << SLOT_BITS)
+
+# 모든 볼이 살아있는 모든 적을 한 번씩 공격 (AttackView 규칙 그대로)
+# return {attacked 이름 JSON, killed 이름 JSON}
+ATTACK = _GUARD + """
+local raw_balls = redis.call('HVALS', KEYS[2])
+local raw_enemies = redis.call('GET', KEYS[4])
+local raw_up = redis.call('HGETALL', KEYS[3])
+if #raw_balls == 0 or (not raw_enemies) or #raw_up == 0 then
+    return redis.error_reply('NO_STATE')
+end
+local up = {}
+for i = 1, #raw_up, 2 do up[raw_up[i]] = tonumber(raw_up[i + 1]) end
+local enemies = cjson.decode(raw_enemies)
+local attacked, killed, seen_a, seen_k = {}, {}, {}, {}
+for _, raw in ipairs(raw_balls) do
+    local b = cjson.decode(raw)
+    local dmg = (b.damage or 0) + (up[b.color] or 0)
+    for _, e in ipairs(enemies) do
+        if not e.is_dead then
+            local net = math.max(0, dmg - (e.defense or 0))
+            local sh = e.shield or 0
+            if net > 0 and sh > 0 then
+                if sh >= net then
+                    e.shield = sh - net
+                    net = 0
+                else
+                    net = net - sh
+                    e.shield = 0
+                end
+            end
+            if net > 0 then
+                e.hp = e.hp - net
+                if e.hp <= 0 then
+                    e.hp = 0
+                    e.is_dead = true
+                    if not seen_k[e.name] then seen_k[e.name] = true; killed[#killed + 1] = e.name end
+                end
+            end
+            if not seen_a[e.name] then seen_a[e.name] = true; attacked[#attacked + 1] = e.name end
+        end
+    end
+end
+if #enemies > 0 then
+    redis.call('SET', KEYS[4], cjson.encode(enemies), 'KEEPTTL')
+end
+touch()
+return {cjson.encode(attacked), cjson.encode(killed)}
+"""
+
+
+class SessionStateError(Exception):
+    """
+    code: NO_SESSION (meta 없음) | NO_UPGRADES | INVALID_COLOR | NO_STATE | OWNED (소유자가 돌리는 세션)
+    """
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class AttackResult(NamedTuple):
+    attacked: List[str]
+    killed: List[str]
+
+
+def session_keys(session_id):
+    return [*keys(session_id), lease_key(session_id), ACTIVE_INDEX]
+
+
+def _names(raw):
+    # cjson은 빈 배열을 {} 로 인코딩
+    v = json.loads(raw)
+    return v if isinstance(v, list) else []
+
+
+class SessionScripts:
+    def __init__(self, client):
+        self.client = client
+        self._upgrade = client.register_script(UPGRADE_COLOR)
+        self._summon = client.register_script(SUMMON_BALL)
+        self._spawn = client.register_script(SPAWN_ENEMIES)
+        self._attack = client.register_script(ATTACK)
+
+    def _run(self, script, session_id, args=()):
+        args = [SESSION_TTL, time.time(), str(session_id), *args]
+        try:
+            return script(keys=session_keys(session_id), args=args)
+        except ResponseError as e:
+            code = str(e)
+            if code in ("NO_SESSION", "NO_UPGRADES", "INVALID_COLOR", "NO_STATE", "OWNED"):
+                raise SessionStateError(code) from None
+            raise
+
+    def upgrade_color(self, session_id: SessionId, color: str) -> int:
+        """
+        return 올린 뒤 레벨
+        """
+        return int(self._run(self._upgrade, session_id, [color]))
+
+    def summon_ball(self, session_id: SessionId, ball: dict) -> Tuple[int, int]:
+        """
+        ball: id 없는 볼 dict (id는 meta next_id 에서 할당). return (ball_id, ball_count)
+        """
+        body = json.dumps({key: v for key, v in ball.items() if key != "id"})
+        ball_id, count = self._run(self._summon, session_id, [body])
+        return int(ball_id), int(count)
+
+    def spawn_enemies(self, session_id: SessionId, enemies: List[dict]) -> List[int]:
+        """
+        enemies: id 없는 적 dict (simulation.enemy_fields). return 할당된 id
+        """
+        if not enemies:
+            return []
+        bodies = [json.dumps({key: v for key, v in e.items() if key != "id"}) for e in enemies]
+        return [int(i) for i in self._run(self._spawn, session_id, bodies)]
+
+    def attack(self, session_id: SessionId) -> AttackResult:
+        attacked, killed = self._run(self._attack, session_id)
+        return AttackResult(_names(attacked), _names(killed))
+
+
+_by_client = weakref.WeakKeyDictionary()
+
+
+def session_scripts(client=None) -> SessionScripts:
+    """
+    client 별로 한 번만 등록 (sha 계산). 기본은 get_redis()
+    """
+    client = client if client is not None else get_redis()
+    scripts = _by_client.get(client)
+    if scripts is None:
+        scripts = _by_client[client] = SessionScripts(client)
+    return scripts
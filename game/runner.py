@@ -0,0 +1,331 @@
+# game/runner.py
+"""
+세션 하나의 시뮬레이션 소유자 쪽 로직 (상태 로드, 틱, 액션 적용, broadcast, 체크포인트/스냅샷).
+
+소유자가 누구든 같은 코드:
+- GAME_SIM_WORKERS=0 : lease 를 잡은 GameConsumer 가 SessionRunner 를 하나 들고 돌린다 (ASGI 프로세스 안)
+- GAME_SIM_WORKERS>0 : run_sim_workers 워커 프로세스가 세션별로 들고 돌린다 (game/sim_workers.py),
+                       consumer 는 액션을 넘기고 프레임을 받기만 함
+
+상태는 self.state(메모리)가 원본. Redis에는 checkpoint()로 CHECKPOINT_TICKS마다 또는 중요 이벤트
+(스테이지 변경, stop, end_game) 시점에만 기록한다. 프레임은 session_{id} group 으로 보낸다.
+
+전투 단계가 오래 걸리는 세션은 그 단계를 프로세스 풀에서 돌린다 (game/offload.py). 그 틱은 별도 task 로 돌아
+스케줄러 slot 을 붙잡지 않고, 앞 틱이 아직 안 끝났으면 다음 틱은 건너뛴다 (그 세션의 게임 시간만 느려짐).
+"""
+import asyncio
+import json
+import logging
+
+from django.conf import settings
+from channels.db import database_sync_to_async
+
+from . import simulation, template_cache, waves
+from .session_store import StateWriter, aload_state
+from .redis_manager import get_async_redis
+from .scheduler import get_scheduler
+from .snapshots import get_snapshot_writer, aload_snapshot, SNAPSHOT_INTERVAL
+from .commands import parse_command, CommandError
+from .offload import CombatOffload
+from .profiling import (
+    get_profiler, drop_profiler,
+    profile_request_key, profile_result_key, profile_stats_key,
+)
+
+logger = logging.getLogger(__name__)
+
+INTERNAL_TICK = simulation.TICK
+BROADCAST_INTERVAL = 0.5
+# 액션으로 생긴 변경을 내보내는 프레임 사이 최소 간격(초). 틱당 최대 1프레임
+MIN_BROADCAST_INTERVAL = float(getattr(settings, 'GAME_MIN_BROADCAST_INTERVAL', INTERNAL_TICK))
+# N틱마다 메모리 상태를 Redis에 기록 (write-behind)
+CHECKPOINT_TICKS = int(getattr(settings, 'GAME_CHECKPOINT_TICKS', 10))
+# 소유자만 처리하는 액션 (클라이언트가 보낼 수 있는 것. REST 전달용 spawn_enemy 는 제외)
+GAME_ACTIONS = ("end_game", "summon_ball", "upgrade_color", "move_ball")
+
+
+def group_name(session_id):
+    return f"session_{session_id}"
+
+
+class SessionRunner:
+    """
+    key: 스케줄러 등록 키 (프로세스 안에서 유일)
+    """
+    state = None
+    # 다음 틱에 프레임을 보내야 하는지 (액션으로 상태가 바뀜)
+    broadcast_pending = False
+    last_frame_at = 0.0
+    last_snapshot_at = 0.0
+    # 프로세스 풀에서 도는 중인 틱 (asyncio.Task)
+    inflight = None
+
+    def __init__(self, session_id, channel_layer, key):
+        self.session_id = session_id
+        self.group_name = group_name(session_id)
+        self.channel_layer = channel_layer
+        self.key = key
+        self.scheduler = None
+        # 전투 단계 인라인 / 프로세스 풀 선택 (틱마다 잰 시간 기준)
+        self.offload = CombatOffload(session_id)
+
+    async def start(self, fresh_connect=False):
+        """
+        마지막 체크포인트에서 이어가고 틱 등록.
+        Redis에 상태가 없으면 DB 스냅샷에서 복구, 그것도 없으면 새 게임. 끝난 게임은 새 접속일 때만 새로 시작,
+        승격/재시작이면 끝난 상태 그대로 (틱은 아무것도 안 함)
+        """
+        r = get_async_redis()
+        st = await aload_state(r, self.session_id)
+        if not st:
+            st = await aload_snapshot(self.session_id)
+            if st:
+                logger.info("session %s restored from snapshot (stage %s)", self.session_id, st["stage"])
+        if not st or (fresh_connect and not st.get("is_active")):
+            st = simulation.new_state()
+        self.state = st
+        self.dirty = True
+        # 필드 단위 기록 (바뀐 볼/업그레이드/meta 만)
+        self.writer = StateWriter(self.session_id)
+        self.ticks_since_checkpoint = 0
+        self.snapshots = get_snapshot_writer()
+        self.last_snapshot_at = asyncio.get_running_loop().time()
+        # 틱 단계별 계측 (세션 단위)
+        self.profiler = get_profiler(self.session_id)
+        # 비영속 런타임 (타겟 격자, numpy 백엔드, 죽은 적 버퍼)
+        # 웨이브 계획은 템플릿 캐시 기준 컴파일, 프로세스 내 공유 (바뀌면 refresh_schedule 이 교체)
+        schedule = await database_sync_to_async(waves.current_schedule)()
+        self.rt = simulation.SimRuntime(self.profiler, schedule)
+        await self.checkpoint()
+
+        # 세션마다 루프를 돌리지 않고 프로세스 공용 스케줄러에 등록
+        self.scheduler = get_scheduler(INTERNAL_TICK)
+        self.scheduler.register(self.key, self.tick)
+        # 소유자가 바뀌면 모두 다음 프레임을 keyframe으로
+        await self.channel_layer.group_send(self.group_name, {"type":"owner_changed"})
+
+    async def stop(self, save=True):
+        """
+        save: 체크포인트 + 스냅샷 후 중단 (상태는 활성 그대로 남겨 다음 소유자가 이어받음).
+        lease 를 잃었을 때는 save=False (다른 소유자가 이미 쓰고 있을 수 있음)
+        """
+        if self.scheduler:
+            self.scheduler.unregister(self.key)
+            self.scheduler = None
+        if self.inflight is not None:
+            # 풀 결과는 버림 (world 는 보내기 전 값 그대로 => 그 틱의 이동/전투만 빠짐)
+            self.inflight.cancel()
+            await asyncio.wait([self.inflight])
+        if self.state is None:
+            return
+        self.offload.close()
+        if save:
+            await self.checkpoint()
+            self.snapshot()
+        drop_profiler(self.session_id)
+        self.state = None
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    async def checkpoint(self):
+        """
+        메모리 상태를 Redis에 기록. 변경이 없으면(dirty=False) 건너뜀
+        바뀐 필드만 한 pipeline으로 (session_store.StateWriter)
+        """
+        self.ticks_since_checkpoint = 0
+        if not self.dirty:
+            return
+        simulation.sync(self.state, self.rt)
+        r = get_async_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            pending = self.writer.queue(pipe, self.state)
+            if pending:
+                await pipe.execute()
+                self.writer.confirm(pending)
+        self.dirty = False
+
+    def snapshot(self):
+        """
+        DB 스냅샷 요청 (JSON 인코딩만 여기서, 압축/기록은 writer가 모아서 스레드에서)
+        """
+        simulation.sync(self.state, self.rt)
+        self.snapshots.submit(self.session_id, self.state)
+        self.last_snapshot_at = asyncio.get_running_loop().time()
+
+    async def sync_profiler(self):
+        """
+        CHECKPOINT_TICKS마다: 캡처 요청 확인, 끝난 캡처 저장, 요약 통계 게시
+        """
+        prof = self.profiler
+        r = get_async_redis()
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.get(profile_request_key(self.session_id))
+            pipe.delete(profile_request_key(self.session_id))
+            pipe.set(profile_stats_key(self.session_id),
+                     json.dumps({**prof.summary(), "offload": self.offload.summary()}), ex=60)
+            requested, _, _ = await pipe.execute()
+        if requested and not prof.start_capture(requested):
+            # 다른 세션이 캡처 중 => 요청을 남겨 두고 다음 체크포인트에 다시
+            await r.set(profile_request_key(self.session_id), requested, ex=60)
+        path = prof.finish_capture_if_due()
+        if path:
+            await r.set(profile_result_key(self.session_id), path, ex=24*3600)
+            logger.info("session %s profile saved => %s", self.session_id, path)
+
+    async def refresh_schedule(self):
+        """
+        CHECKPOINT_TICKS마다: 템플릿이 바뀌었으면 (template_cache.invalidate / 다른 프로세스의 버전 증가)
+        다시 컴파일된 웨이브 계획으로 교체. 보통은 메모리 확인만, 재확인 시점에만 스레드에서
+        """
+        schedule = waves.cached_schedule()
+        if schedule is None:
+            schedule = await database_sync_to_async(waves.current_schedule)()
+        if schedule is not self.rt.schedule:
+            self.rt.schedule = schedule
+            logger.info("session %s wave schedule reloaded", self.session_id)
+
+    async def apply_action(self, content, reply):
+        """
+        reply(msg, close=False) 로 요청한 연결에 응답
+        end_game 만 즉시, 나머지는 검증 후 입력 큐 => 다음 틱 시작에 적용
+        """
+        action = content.get("action")
+        if action == "end_game":
+            await self.end_game(reply)
+        elif action == "summon_ball":
+            await self.summon_ball(reply)
+        else:
+            try:
+                kind, args = parse_command(content)
+            except CommandError as e:
+                await reply({"error": str(e)})
+                return
+            await self.enqueue(kind, args, reply)
+
+    async def enqueue(self, kind, args, reply):
+        """
+        검증된 액션을 입력 큐에 넣음. 적용/응답은 다음 틱 시작에
+        """
+        if not simulation.queue_command(self.rt, kind, args, reply):
+            await reply({"error":"too many actions", "retry_after": INTERNAL_TICK})
+
+    async def tick(self):
+        if self.inflight is not None:
+            # 앞 틱의 전투 단계가 아직 프로세스 풀에서 안 끝남
+            self.offload.skipped += 1
+            return
+        if self.offload.usable(self.rt):
+            self.inflight = asyncio.create_task(self.run_tick())
+            self.inflight.add_done_callback(self._tick_done)
+            return
+        await self.run_tick()
+
+    def _tick_done(self, task):
+        self.inflight = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("offloaded tick failed", exc_info=task.exception())
+
+    async def step(self, st):
+        """
+        simulation.step 과 같음. 전투 단계만 offload 가 켜져 있으면 프로세스 풀에서
+        cProfile 캡처는 동기 구간만 (풀을 기다리는 동안은 다른 코루틴이 돈다)
+        """
+        rt = self.rt
+        prof = self.profiler
+        with prof.capturing():
+            wave = simulation.begin_step(st, INTERNAL_TICK, rt)
+            offloaded = self.offload.usable(rt)
+            if not offloaded:
+                self.offload.observe(simulation.combat(st, INTERNAL_TICK, rt))
+        if offloaded:
+            await self.offload.run(st, INTERNAL_TICK, rt)
+        with prof.capturing():
+            return simulation.end_step(st, rt, wave)
+
+    async def run_tick(self):
+        st = self.state
+        if not st or not st["is_active"]: return
+        self.mark_dirty()
+        prof = self.profiler
+        started = prof.begin_tick()
+        try:
+            # 게임 규칙은 game/simulation.py (큐에 쌓인 액션도 여기서 적용)
+            stage_changed = await self.step(st)
+            if self.state is not st or not st["is_active"]:
+                # 풀을 기다리는 동안 stop / end_game
+                return
+            if stage_changed:
+                logger.debug("session %s stage => %s", self.session_id, st["stage"])
+            mark = prof.now()
+
+            # 적용된 액션 응답 (요청한 클라이언트에게만)
+            if self.rt.results:
+                results, self.rt.results = self.rt.results, []
+                for reply, msg in results:
+                    if msg.get("ack") in ("summon_ball", "upgrade_color", "spawn_enemy"):
+                        self.request_broadcast()
+                    if reply is not None:
+                        await reply(msg)
+
+            # broadcast: 주기(BROADCAST_INTERVAL) 또는 액션 변경분이 쌓였을 때, 틱당 최대 1번
+            since = asyncio.get_running_loop().time() - self.last_frame_at
+            if since >= BROADCAST_INTERVAL or (self.broadcast_pending and since >= MIN_BROADCAST_INTERVAL):
+                await self.broadcast_state()
+                st["last_broadcast"] = st["time_in_stage"]
+            mark = prof.lap("broadcast", mark)
+
+            # write-behind: 스테이지 변경 시 즉시, 아니면 N틱마다
+            self.ticks_since_checkpoint += 1
+            if stage_changed or self.ticks_since_checkpoint >= CHECKPOINT_TICKS:
+                await self.checkpoint()
+                await self.sync_profiler()
+                await self.refresh_schedule()
+                if asyncio.get_running_loop().time() - self.last_snapshot_at >= SNAPSHOT_INTERVAL:
+                    self.snapshot()
+            prof.lap("redis", mark)
+        finally:
+            prof.end_tick(started)
+
+    async def summon_ball(self, reply):
+        st= self.state
+        if not st:return
+        # 보통은 메모리 캐시, 만료/미로드일 때만 스레드에서 DB/Redis 확인
+        table= template_cache.cached_ball_table()
+        if table is None:
+            table= await database_sync_to_async(template_cache.get_ball_table)()
+        tpl= table.pick()
+        if tpl is None:
+            await reply({"error":"No BallTemplate in DB"})
+            return
+        await self.enqueue("summon_ball", (tpl["color"], tpl["rarity"], tpl["base_damage"]), reply)
+
+    async def end_game(self, reply):
+        if self.state:
+            self.state["is_active"]=False
+            self.mark_dirty()
+            await self.checkpoint()
+            self.snapshot()
+        # 마지막 프레임은 합치지 않고 바로
+        await self.broadcast_state()
+        await reply({"message":"게임 종료"}, close=True)
+
+    def request_broadcast(self):
+        """
+        상태가 바뀌었음을 표시만 함. 실제 프레임은 tick 에서 틱당 최대 1번
+        """
+        self.broadcast_pending = True
+
+    async def broadcast_state(self):
+        st= self.state
+        if not st:return
+        self.broadcast_pending = False
+        self.last_frame_at = asyncio.get_running_loop().time()
+        data= simulation.build_frame(st, self.rt)
+        await self.channel_layer.group_send(
+            self.group_name,
+            {
+                "type":"send_state",
+                "payload": data
+            }
+        )
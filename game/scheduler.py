@@ -0,0 +1,112 @@
+# game/scheduler.py
+import asyncio
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 한 틱 주기를 몇 개 구간(slot)으로 나눠 세션을 분산할지
+TICK_SLOTS = int(getattr(settings, 'GAME_TICK_SLOTS', 10))
+
+
+class TickEntry:
+    """
+    스케줄러에 등록된 세션 하나. lag = 예정 시각 대비 실제 실행이 늦은 시간(초)
+    """
+    __slots__ = ("callback", "slot", "ticks", "last_lag", "max_lag", "skipped")
+
+    def __init__(self, callback, slot):
+        self.callback = callback
+        self.slot = slot
+        self.ticks = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.skipped = 0
+
+
+class TickScheduler:
+    """
+    프로세스당 하나. 등록된 모든 세션을 고정 주기(period)로 step 한다.
+    - 다음 틱 시각을 start + n*slot_len 절대 시각으로 계산 => 드리프트 누적 없음
+    - period를 slots개 구간으로 나누고 세션을 가장 한가한 구간에 배정
+    - 한 주기 이상 밀리면 놓친 틱은 건너뛰고(skipped) 주기를 맞춘다
+    """
+
+    def __init__(self, period, slots=TICK_SLOTS):
+        self.period = period
+        self.slots = max(1, slots)
+        self.slot_len = period / self.slots
+        self.buckets = [dict() for _ in range(self.slots)]
+        self.entries = {}
+        self.task = None
+
+    def register(self, key, callback):
+        if key in self.entries:
+            self.unregister(key)
+        slot = min(range(self.slots), key=lambda i: len(self.buckets[i]))
+        entry = TickEntry(callback, slot)
+        self.buckets[slot][key] = entry
+        self.entries[key] = entry
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        return entry
+
+    def unregister(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.buckets[entry.slot].pop(key, None)
+
+    def stats(self):
+        lags = [e.last_lag for e in self.entries.values()]
+        return {
+            "sessions": len(self.entries),
+            "max_lag": max(lags, default=0.0),
+            "avg_lag": (sum(lags) / len(lags)) if lags else 0.0,
+            "skipped": sum(e.skipped for e in self.entries.values()),
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        n = 0
+        while self.entries:
+            deadline = start + n * self.slot_len
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag = loop.time() - deadline
+            bucket = self.buckets[n % self.slots]
+
+            if lag >= self.period:
+                # 한 주기 이상 밀림 => 같은 slot 위치를 유지한 채 놓친 주기만큼 건너뜀
+                missed = int(lag // self.period)
+                n += missed * self.slots
+                lag -= missed * self.period
+                for e in bucket.values():
+                    e.skipped += missed
+                logger.warning("tick scheduler behind by %d period(s)", missed)
+
+            if bucket:
+                entries = list(bucket.values())
+                results = await asyncio.gather(
+                    *(e.callback() for e in entries), return_exceptions=True
+                )
+                for e, res in zip(entries, results):
+                    e.ticks += 1
+                    e.last_lag = lag
+                    if lag > e.max_lag:
+                        e.max_lag = lag
+                    if isinstance(res, Exception):
+                        logger.error("tick failed", exc_info=res)
+            n += 1
+
+
+_scheduler = None
+
+
+def get_scheduler(period):
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = TickScheduler(period)
+    return _scheduler
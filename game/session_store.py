@@ -0,0 +1,331 @@
+# game/session_store.py
+"""
+세션 상태의 Redis 레이아웃 (필드 단위).
+
+    session:{id}:meta      HASH   stage, time_in_stage, frame, next_id, is_active, ... (스칼라)
+    session:{id}:upgrades  HASH   color -> level            (업그레이드 = HINCRBY)
+    session:{id}:balls     HASH   ball id -> ball JSON      (볼 이동 = 필드 하나 HSET)
+    session:{id}:enemies   STRING 적 리스트 JSON            (매 틱 움직이므로 통째로)
+
+만료: 모든 세션 키는 SESSION_TTL 후 만료. 활성 세션은 StateWriter 가 TOUCH_INTERVAL 마다 연장하고
+sessions:active (ZSET, session id -> 마지막 활동 unix 시각) 에 기록한다.
+오래 활동이 없는 세션은 reap_sessions 명령이 이 인덱스를 보고 정리 (UNLINK, GameSession 비활성).
+
+예전 형식 (migrate_session 으로 변환):
+    session:{id}:state                      consumer 가 쓰던 전체 JSON blob
+    session:{id}:balls/enemies/color_upgrades/info   REST view 가 쓰던 JSON 문자열
+
+쓰기는 모두 호출자가 넘겨준 pipeline 에 쌓기만 하고 execute 는 호출자 몫.
+"""
+import json
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .entities import new_pool, alloc_id
+from .path import CUMULATIVE, PATH_POINTS
+
+LAYOUT_VERSION = "2"
+
+# 세션 키 TTL(초)과 활성 세션의 TTL 연장 주기(초)
+SESSION_TTL = int(getattr(settings, 'GAME_SESSION_TTL', 6 * 3600))
+TOUCH_INTERVAL = float(getattr(settings, 'GAME_SESSION_TOUCH_INTERVAL', 60.0))
+# ZSET: session id -> 마지막 활동 시각
+ACTIVE_INDEX = "sessions:active"
+
+
+class SessionKeys(NamedTuple):
+    meta: str
+    balls: str
+    upgrades: str
+    enemies: str
+
+
+def keys(session_id):
+    p = f"session:{session_id}"
+    return SessionKeys(f"{p}:meta", f"{p}:balls", f"{p}:upgrades", f"{p}:enemies")
+
+
+def legacy_keys(session_id):
+    p = f"session:{session_id}"
+    return {
+        "state": f"{p}:state",
+        "balls": f"{p}:balls",
+        "enemies": f"{p}:enemies",
+        "color_upgrades": f"{p}:color_upgrades",
+        "info": f"{p}:info",
+    }
+
+
+def _dumps(v):
+    return json.dumps(v, separators=(",", ":"))
+
+
+def _bool(v):
+    return v not in ("0", "", "False", "false")
+
+
+# meta 필드 => (인코더, 디코더)
+META_FIELDS = {
+    "stage": (str, int),
+    "time_in_stage": (repr, float),
+    "frame": (str, int),
+    "next_id": (str, int),
+    "last_broadcast": (repr, float),
+    "is_active": (lambda v: "1" if v else "0", _bool),
+    "enemy_pool": (_dumps, json.loads),
+}
+# 예전 버전이 meta 에 기록하던 필드 (첫 기록 때 지움)
+DROPPED_META_FIELDS = ("attack_effects",)
+
+
+def encode_meta(st):
+    return {k: enc(st[k]) for k, (enc, _) in META_FIELDS.items() if k in st}
+
+
+def decode_state(meta, balls, upgrades, enemies):
+    """
+    HGETALL/GET 결과 => simulation 상태 dict. meta가 비어 있으면 None
+    """
+    if not meta:
+        return None
+    st = {}
+    for k, (_, dec) in META_FIELDS.items():
+        if k in meta:
+            st[k] = dec(meta[k])
+    st["balls"] = [json.loads(balls[f]) for f in sorted(balls or {}, key=int)]
+    st["color_upgrades"] = {c: int(v) for c, v in (upgrades or {}).items()}
+    st["enemies"] = json.loads(enemies) if enemies else []
+    return st
+
+
+def queue_touch(pipe, session_id):
+    """
+    세션 키 TTL 연장 + 인덱스에 활동 시각 기록
+    """
+    for key in keys(session_id):
+        pipe.expire(key, SESSION_TTL)
+    pipe.zadd(ACTIVE_INDEX, {str(session_id): time.time()})
+
+
+def queue_new_session(pipe, session_id, st, **extra_meta):
+    """
+    빈 세션 전체 기록 (기존 키는 지움)
+    """
+    k = keys(session_id)
+    pipe.delete(*k)
+    pipe.hset(k.meta, mapping={**encode_meta(st), **{f: str(v) for f, v in extra_meta.items()},
+                               "layout": LAYOUT_VERSION})
+    if st["color_upgrades"]:
+        pipe.hset(k.upgrades, mapping={c: str(v) for c, v in st["color_upgrades"].items()})
+    if st["balls"]:
+        pipe.hset(k.balls, mapping={str(b["id"]): _dumps(b) for b in st["balls"]})
+    pipe.set(k.enemies, _dumps(st["enemies"]))
+    queue_touch(pipe, session_id)
+
+
+def queue_delete(pipe, session_id):
+    pipe.delete(*keys(session_id), *legacy_keys(session_id).values())
+    pipe.zrem(ACTIVE_INDEX, str(session_id))
+
+
+def queue_load(pipe, session_id):
+    """
+    pipe.execute() 결과를 decode_state(*결과) 로 넘긴다
+    """
+    k = keys(session_id)
+    pipe.hgetall(k.meta)
+    pipe.hgetall(k.balls)
+    pipe.hgetall(k.upgrades)
+    pipe.get(k.enemies)
+
+
+def load_state(r, session_id):
+    pipe = r.pipeline(transaction=False)
+    queue_load(pipe, session_id)
+    return decode_state(*pipe.execute())
+
+
+async def aload_state(r, session_id):
+    async with r.pipeline(transaction=False) as pipe:
+        queue_load(pipe, session_id)
+        return decode_state(*await pipe.execute())
+
+
+class StateWriter:
+    """
+    write-behind 용. 마지막으로 기록한 값과 비교해 바뀐 필드만 pipeline에 쌓는다.
+    - 업그레이드: 증가분만큼 HINCRBY
+    - 볼: 바뀐 볼만 HSET (필드 = ball id)
+    - meta: 바뀐 스칼라만 HSET. next_id 는 증가분만큼 HINCRBY (REST SUMMON_BALL 과 같은 카운터,
+      처음 기록 뒤에는 덮어쓰지 않는다 => 카운터가 뒤로 가서 id 가 겹치는 일 없음)
+    - 적: 리스트가 바뀌었으면 SET (KEEPTTL)
+    - TTL/인덱스: 처음 기록 때와 그 뒤 TOUCH_INTERVAL 마다 (queue_touch)
+
+        pending = writer.queue(pipe, st)
+        if pending:
+            await pipe.execute()
+            writer.confirm(pending)
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.keys = keys(session_id)
+        self.meta = {}
+        self.balls = {}
+        self.upgrades = {}
+        self.enemies = None
+        self.touched_at = None
+
+    def queue(self, pipe, st):
+        """
+        return 확정 대기 중인 새 스냅샷 (바뀐 것이 없으면 None)
+        """
+        k = self.keys
+        meta = encode_meta(st)
+        meta_diff = {f: v for f, v in meta.items() if self.meta.get(f) != v}
+        next_id_delta = 0
+        if not self.meta:
+            meta_diff["layout"] = LAYOUT_VERSION
+        elif "next_id" in meta_diff and "next_id" in self.meta:
+            next_id_delta = int(meta_diff.pop("next_id")) - int(self.meta["next_id"])
+
+        balls = {str(b["id"]): _dumps(b) for b in st["balls"]}
+        balls_diff = {f: v for f, v in balls.items() if self.balls.get(f) != v}
+        balls_gone = [f for f in self.balls if f not in balls]
+
+        upgrades = dict(st["color_upgrades"])
+        up_diff = {c: lv - self.upgrades.get(c, 0) for c, lv in upgrades.items()
+                   if lv != self.upgrades.get(c, 0)}
+
+        enemies = _dumps(st["enemies"])
+        enemies_changed = enemies != self.enemies
+
+        if not (meta_diff or next_id_delta or balls_diff or balls_gone or up_diff or enemies_changed):
+            return None
+        if not self.meta:
+            # 처음 기록: 이전 세션이 남긴 볼/업그레이드 필드 제거
+            pipe.delete(k.balls, k.upgrades)
+            pipe.hdel(k.meta, *DROPPED_META_FIELDS)
+        if meta_diff:
+            pipe.hset(k.meta, mapping=meta_diff)
+        if next_id_delta:
+            pipe.hincrby(k.meta, "next_id", next_id_delta)
+        if balls_diff:
+            pipe.hset(k.balls, mapping=balls_diff)
+        if balls_gone:
+            pipe.hdel(k.balls, *balls_gone)
+        if not self.meta and upgrades:
+            pipe.hset(k.upgrades, mapping={c: str(lv) for c, lv in upgrades.items()})
+        else:
+            for c, delta in up_diff.items():
+                pipe.hincrby(k.upgrades, c, delta)
+        if enemies_changed:
+            pipe.set(k.enemies, enemies, keepttl=True)
+        now = time.monotonic()
+        if self.touched_at is None or now - self.touched_at >= TOUCH_INTERVAL:
+            queue_touch(pipe, self.session_id)
+        else:
+            now = self.touched_at
+        return meta, balls, upgrades, enemies, now
+
+    def confirm(self, pending):
+        self.meta, self.balls, self.upgrades, self.enemies, self.touched_at = pending
+
+
+def _legacy_dist(e):
+    """
+    예전 적 (path_idx = 마지막으로 지난 꼭짓점, x/y = 현재 위치) => 경로 이동거리
+    REST 형식처럼 경로 위치가 없으면 시작점(0)
+    """
+    if "dist" in e:
+        return float(e["dist"])
+    idx = e.get("path_idx")
+    if idx is None or "x" not in e:
+        return 0.0
+    px, py = PATH_POINTS[idx]
+    return CUMULATIVE[idx] + ((e["x"] - px)**2 + (e["y"] - py)**2) ** 0.5
+
+
+def normalize_legacy(st):
+    """
+    예전 형식 상태 dict => 지금 simulation 형식 (제자리 변환, return st)
+    - 없는 필드 (frame/next_id/enemy_pool/last_broadcast ...) 는 new_state() 기본값
+    - 볼: 위치/타겟/쿨다운 기본값, id 가 없으면 next_id 부터 할당
+    - 적: 죽은 적은 버리고, id 는 새 enemy_pool 에서 다시 할당, path_idx/x/y => dist,
+      speed 가 없으면 소환 규칙 (simulation.enemy_speed)
+    """
+    from .simulation import new_state, enemy_speed
+
+    for k, v in new_state().items():
+        st.setdefault(k, v)
+    st.pop("attack_effects", None)
+
+    balls = [{"x": 200, "y": 200, "damage": 5, "cooldown": 0, **b} for b in st["balls"]]
+    st["next_id"] = max([st["next_id"]] + [b["id"] + 1 for b in balls if "id" in b])
+    for b in balls:
+        b.setdefault("target_x", b["x"])
+        b.setdefault("target_y", b["y"])
+        if "id" not in b:
+            b["id"] = st["next_id"]
+            st["next_id"] += 1
+    st["balls"] = balls
+
+    pool = new_pool()
+    enemies = []
+    for e in st["enemies"]:
+        if e.get("is_dead"):
+            continue
+        is_boss = e.get("type") == "boss" or e.get("name") == "Boss"
+        enemies.append({
+            "id": alloc_id(pool),
+            "name": e.get("name", "?"),
+            "hp": e["hp"], "defense": e.get("defense", 0), "shield": e.get("shield", 0),
+            "dist": _legacy_dist(e), "speed": e.get("speed") or enemy_speed(is_boss),
+            "is_dead": False,
+        })
+    st["enemies"] = enemies
+    st["enemy_pool"] = pool
+    return st
+
+
+def migrate_session(r, session_id):
+    """
+    예전 형식 키를 새 레이아웃으로 변환 (sync). return 변환한 형식 이름 또는 None
+    볼/적은 normalize_legacy 로 지금 형식으로 바꿔서 기록
+    """
+    from .simulation import new_state
+
+    old = legacy_keys(session_id)
+    if r.exists(old["state"]):
+        st = normalize_legacy(json.loads(r.get(old["state"])))
+        pipe = r.pipeline(transaction=True)
+        queue_new_session(pipe, session_id, st)
+        pipe.delete(old["state"])
+        pipe.execute()
+        return "state-blob"
+
+    balls_blob = r.type(old["balls"]) == "string"
+    if balls_blob or r.exists(old["color_upgrades"]):
+        pipe = r.pipeline(transaction=False)
+        for name in ("enemies", "color_upgrades", "info"):
+            pipe.get(old[name])
+        raw_enemies, raw_colors, raw_info = pipe.execute()
+        raw_balls = r.get(old["balls"]) if balls_blob else None
+        info = json.loads(raw_info) if raw_info else {}
+        st = new_state()
+        st["stage"] = int(info.get("stage", 1))
+        if raw_colors:
+            st["color_upgrades"] = json.loads(raw_colors)
+        st["balls"] = json.loads(raw_balls) if raw_balls else []
+        st["enemies"] = json.loads(raw_enemies) if raw_enemies else []
+        normalize_legacy(st)
+        extra = {"user_id": info["user_id"]} if "user_id" in info else {}
+
+        pipe = r.pipeline(transaction=True)
+        queue_new_session(pipe, session_id, st, **extra)
+        pipe.delete(old["color_upgrades"], old["info"])
+        pipe.execute()
+        return "view-keys"
+    return None
@@ -0,0 +1,12 @@
+# game/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import BallTemplate, EnemyTemplate
+from . import template_cache
+
+
+@receiver([post_save, post_delete], sender=BallTemplate)
+@receiver([post_save, post_delete], sender=EnemyTemplate)
+def invalidate_template_cache(sender, **kwargs):
+    template_cache.invalidate()
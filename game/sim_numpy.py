@@ -0,0 +1,265 @@
+# game/sim_numpy.py
+"""
+적/볼을 NumPy 배열(structure-of-arrays)로 들고 배치로 시뮬레이션.
+numpy가 없으면 NUMPY_AVAILABLE=False 이고 consumer는 기존 dict 루프를 쓴다.
+
+dict(JSON) <-> 배열 변환은 export()에서만 한다 (Redis 기록 / broadcast 직전).
+이동/전투 단계는 배열만 쓰므로 pack_combat() => combat_step() 으로 다른 프로세스에서도 돌릴 수 있다 (game/offload.py).
+"""
+import time
+
+from django.conf import settings
+
+from .path import CUMULATIVE, LOOP_X, LOOP_Y, TOTAL_LENGTH
+from .entities import release_id
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+NUMPY_AVAILABLE = np is not None
+
+# 적 수가 이 이상이면 numpy 백엔드로 전환, 절반 아래로 내려가면 다시 dict 루프
+NUMPY_MIN_ENTITIES = int(getattr(settings, 'GAME_NUMPY_MIN_ENTITIES', 200))
+
+# 이동/전투 단계 입력 배열 (pack_combat 순서), 그중 바뀌어 돌아오는 배열
+COMBAT_FIELDS = ("edist", "espeed", "ehp", "edef", "esh", "edead", "bx", "by", "btx", "bty", "bcd")
+RESULT_FIELDS = ("edist", "ehp", "esh", "edead", "bx", "by", "bcd")
+
+
+def select_backend(enemy_count, using_numpy):
+    if not NUMPY_AVAILABLE:
+        return False
+    if using_numpy:
+        return enemy_count >= NUMPY_MIN_ENTITIES // 2
+    return enemy_count >= NUMPY_MIN_ENTITIES
+
+
+class NumpyWorld:
+    """
+    st["enemies"], st["balls"] 를 배열로 보관. 공격 이펙트는 effects.EffectRing 으로 바로 보냄.
+    원본 dict는 enemy_meta/ball_meta 로 유지하고 export() 때 값만 되돌려 쓴다.
+    """
+
+    def __init__(self, st, ball_speed, attack_range):
+        self._init_path(ball_speed, attack_range)
+
+        enemies = st["enemies"]
+        self.enemy_meta = list(enemies)
+        self.edist = np.array([e["dist"] for e in enemies], dtype=np.float64)
+        self.espeed = np.array([e["speed"] for e in enemies], dtype=np.float64)
+        self.ehp = np.array([e["hp"] for e in enemies], dtype=np.int64)
+        self.edef = np.array([e.get("defense", 0) for e in enemies], dtype=np.int64)
+        self.esh = np.array([e.get("shield", 0) for e in enemies], dtype=np.int64)
+        self.edead = np.array([e["is_dead"] for e in enemies], dtype=bool)
+
+        balls = st["balls"]
+        self.ball_meta = list(balls)
+        self.bx = np.array([b["x"] for b in balls], dtype=np.float64)
+        self.by = np.array([b["y"] for b in balls], dtype=np.float64)
+        self.btx = np.array([b.get("target_x", b["x"]) for b in balls], dtype=np.float64)
+        self.bty = np.array([b.get("target_y", b["y"]) for b in balls], dtype=np.float64)
+        self.bdmg = np.array([b.get("damage", 5) for b in balls], dtype=np.int64)
+        self.bcd = np.array([b.get("cooldown", 0) for b in balls], dtype=np.float64)
+
+    def _init_path(self, ball_speed, attack_range):
+        self.cum = np.asarray(CUMULATIVE, dtype=np.float64)
+        self.loop_x = np.asarray(LOOP_X, dtype=np.float64)
+        self.loop_y = np.asarray(LOOP_Y, dtype=np.float64)
+        self.ball_speed = ball_speed
+        self.attack_range = attack_range
+
+    @classmethod
+    def from_arrays(cls, arrays, ball_speed, attack_range):
+        """
+        pack_combat() 배열만으로 만든 world (메타 dict 없음 => 이동/전투 단계만 가능)
+        """
+        w = cls.__new__(cls)
+        w._init_path(ball_speed, attack_range)
+        for name, a in zip(COMBAT_FIELDS, arrays):
+            setattr(w, name, a)
+        w.enemy_meta = w.ball_meta = None
+        return w
+
+    @property
+    def enemy_count(self):
+        return len(self.enemy_meta)
+
+    # --- 추가/변경 (consumer 액션) ---
+
+    def add_enemy(self, e):
+        self.enemy_meta.append(e)
+        self.edist = np.append(self.edist, e["dist"])
+        self.espeed = np.append(self.espeed, e["speed"])
+        self.ehp = np.append(self.ehp, e["hp"])
+        self.edef = np.append(self.edef, e.get("defense", 0))
+        self.esh = np.append(self.esh, e.get("shield", 0))
+        self.edead = np.append(self.edead, e["is_dead"])
+
+    def add_ball(self, b):
+        self.ball_meta.append(b)
+        self.bx = np.append(self.bx, b["x"])
+        self.by = np.append(self.by, b["y"])
+        self.btx = np.append(self.btx, b.get("target_x", b["x"]))
+        self.bty = np.append(self.bty, b.get("target_y", b["y"]))
+        self.bdmg = np.append(self.bdmg, b.get("damage", 5))
+        self.bcd = np.append(self.bcd, b.get("cooldown", 0))
+
+    def set_ball_target(self, idx, tx, ty):
+        self.btx[idx] = tx
+        self.bty[idx] = ty
+
+    # --- 틱 단계 ---
+
+    def move_enemies(self, dt):
+        # 경로 이동거리만 증가 (죽은 적은 speed 0 취급)
+        self.edist += np.where(self.edead, 0.0, self.espeed * dt)
+
+    def positions(self):
+        """
+        이동거리 -> (x, y) 배열. 누적 길이 위 선형보간
+        """
+        d = np.mod(self.edist, TOTAL_LENGTH)
+        return np.interp(d, self.cum, self.loop_x), np.interp(d, self.cum, self.loop_y)
+
+    def move_balls(self, dt):
+        dx = self.btx - self.bx
+        dy = self.bty - self.by
+        dist = np.sqrt(dx*dx + dy*dy)
+        step = self.ball_speed * dt
+        moving = dist > 0
+        arrive = moving & (step >= dist)
+        ratio = np.divide(step, dist, out=np.zeros_like(dist), where=moving & ~arrive)
+        self.bx = np.where(arrive, self.btx, self.bx + dx*ratio)
+        self.by = np.where(arrive, self.bty, self.by + dy*ratio)
+
+    def ball_damage(self, color_upgrades):
+        """
+        볼별 공격력 + 색 업그레이드
+        """
+        bonus = [color_upgrades.get(b["color"], 0) for b in self.ball_meta]
+        return self.bdmg + np.asarray(bonus, dtype=np.int64)
+
+    def balls_attack(self, dt, color_upgrades, effects, tick):
+        self.attack(dt, self.ball_damage(color_upgrades), effects, tick)
+
+    def attack(self, dt, damage, effects, tick):
+        if not len(self.bcd):
+            return
+        cd = self.bcd
+        cooling = cd > 0
+        cd[cooling] = np.maximum(cd[cooling] - dt, 0)
+        ready = np.flatnonzero(cd <= 0)
+        if not len(ready) or not len(self.edead):
+            return
+
+        ex, ey = self.positions()
+        for bi in ready:
+            # 앞 볼이 죽인 적은 제외해야 하므로 볼 단위로 순차 처리 (적 방향은 벡터화)
+            bx, by = self.bx[bi], self.by[bi]
+            dx = ex - bx
+            dy = ey - by
+            dist = np.sqrt(dx*dx + dy*dy)
+            dist[self.edead] = np.inf
+            ti = int(np.argmin(dist))
+            if not dist[ti] < self.attack_range:
+                continue
+            net = max(0, int(damage[bi]) - int(self.edef[ti]))
+            sh = int(self.esh[ti])
+            if sh > 0 and net > 0:
+                if sh >= net:
+                    self.esh[ti] -= net
+                    net = 0
+                else:
+                    net -= sh
+                    self.esh[ti] = 0
+            if net > 0:
+                self.ehp[ti] -= net
+                if self.ehp[ti] <= 0:
+                    self.ehp[ti] = 0
+                    self.edead[ti] = True
+            effects.push(tick, float(bx), float(by), float(ex[ti]), float(ey[ti]))
+            cd[bi] = 1.0
+
+    def compact(self, pool):
+        """
+        죽은 적을 배열/메타에서 제거하고 id를 풀에 반납. return 죽은 적 id 리스트
+        """
+        if not self.edead.any():
+            return []
+        keep = ~self.edead
+        killed = []
+        alive_meta = []
+        for m, k in zip(self.enemy_meta, keep.tolist()):
+            if k:
+                alive_meta.append(m)
+            else:
+                killed.append(m["id"])
+                release_id(pool, m["id"])
+        self.enemy_meta = alive_meta
+        self.edist = self.edist[keep]
+        self.espeed = self.espeed[keep]
+        self.ehp = self.ehp[keep]
+        self.edef = self.edef[keep]
+        self.esh = self.esh[keep]
+        self.edead = self.edead[keep]
+        return killed
+
+    # --- 프로세스 풀 경계 (game/offload.py) ---
+
+    def pack_combat(self, color_upgrades):
+        """
+        이동/전투 단계 입력: (COMBAT_FIELDS 배열들, 볼별 공격력). 배열은 그대로 pickle (protocol 5 = 원시 버퍼)
+        """
+        return tuple(getattr(self, name) for name in COMBAT_FIELDS), self.ball_damage(color_upgrades)
+
+    def unpack_combat(self, arrays):
+        for name, a in zip(RESULT_FIELDS, arrays):
+            setattr(self, name, a)
+
+    # --- dict(JSON) 경계 ---
+
+    def export(self, st):
+        """
+        배열 값을 원본 dict에 되돌려 쓰고 st 리스트를 갱신 (persist/broadcast 직전)
+        """
+        for e, d, hp, sh, dead in zip(
+            self.enemy_meta, self.edist.tolist(),
+            self.ehp.tolist(), self.esh.tolist(), self.edead.tolist()
+        ):
+            e["dist"] = d
+            e["hp"] = hp; e["shield"] = sh; e["is_dead"] = dead
+        for b, x, y, tx, ty, cd in zip(
+            self.ball_meta, self.bx.tolist(), self.by.tolist(),
+            self.btx.tolist(), self.bty.tolist(), self.bcd.tolist()
+        ):
+            b["x"] = x; b["y"] = y
+            b["target_x"] = tx; b["target_y"] = ty
+            b["cooldown"] = cd
+        st["enemies"] = self.enemy_meta
+        st["balls"] = self.ball_meta
+
+
+class EffectLog(list):
+    """
+    다른 프로세스에서 쌓은 이펙트 (EffectRing.push 와 같은 인터페이스, 돌아와서 ring 에 다시 넣음)
+    """
+
+    def push(self, tick, x1, y1, x2, y2):
+        self.append((tick, x1, y1, x2, y2))
+
+
+def combat_step(packed, dt, tick, ball_speed, attack_range):
+    """
+    프로세스 풀 워커에서 실행: move_enemies + move_balls + attack.
+    return (RESULT_FIELDS 배열들, 이펙트 [(tick, x1, y1, x2, y2)], 계산 시간(초))
+    """
+    started = time.perf_counter()
+    arrays, damage = packed
+    w = NumpyWorld.from_arrays(arrays, ball_speed, attack_range)
+    w.move_enemies(dt)
+    w.move_balls(dt)
+    log = EffectLog()
+    w.attack(dt, damage, log, tick)
+    return tuple(getattr(w, name) for name in RESULT_FIELDS), log, time.perf_counter() - started
@@ -0,0 +1,267 @@
+# game/sim_workers.py
+"""
+시뮬레이션 전용 워커 프로세스 (manage.py run_sim_workers --procs N).
+
+GAME_SIM_WORKERS=N (>0) 이면 ASGI(daphne) 프로세스는 소켓/HTTP 만 처리하고
+세션 틱은 워커 N개가 나눠 돌린다. 무거운 세션이 같은 프로세스의 다른 소켓/HTTP 지연을 늘리지 않고,
+프론트와 시뮬레이션을 서로 다른 코어 수로 늘릴 수 있다.
+
+- 세션 => 워커: consistent hashing (HashRing, 워커 수가 바뀌어도 약 1/N 세션만 이동)
+- 프론트 => 워커: channel layer 의 고정 채널 "sim.worker.{i}" 로 메시지
+    {"type":"sim.join",   session_id, frontend, count, fresh}  이 프로세스의 연결 수 (0 = 모두 떠남)
+    {"type":"sim.action", session_id, content, reply_to}       게임 액션 (응답은 reply_to 로 action_reply)
+- 워커 => 클라이언트: session_{id} group 으로 프레임 (consumer.send_state 그대로)
+- 프론트는 HEARTBEAT 마다 sim.join 을 다시 보냄. 워커는 FRONTEND_TIMEOUT 동안 소식 없는 프론트를 지우고
+  연결이 하나도 없는 세션은 체크포인트 후 내려놓음 (프론트가 죽어도 세션이 남지 않음).
+  워커가 재시작돼도 다음 heartbeat 에 세션을 마지막 체크포인트에서 다시 올린다.
+- 소유권은 그대로 Redis lease (game/ownership.py) => 워커 수 변경 중에도 세션당 소유자 하나
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import signal
+from collections import defaultdict
+
+from django.conf import settings
+from channels.layers import get_channel_layer
+
+from .ownership import get_lease_manager, lease_token, PROCESS_ID
+from .runner import SessionRunner, INTERNAL_TICK
+
+logger = logging.getLogger(__name__)
+
+# 0 = 시뮬레이션을 ASGI 프로세스 안에서 (워커 없음)
+WORKER_COUNT = int(getattr(settings, 'GAME_SIM_WORKERS', 0))
+HEARTBEAT = float(getattr(settings, 'GAME_SIM_HEARTBEAT', 2.0))
+FRONTEND_TIMEOUT = HEARTBEAT * 3
+RING_REPLICAS = 64
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    워커 번호 0..n-1 을 가상 노드 RING_REPLICAS 개씩 원 위에 배치
+    """
+
+    def __init__(self, n, replicas=RING_REPLICAS):
+        points = sorted((_hash(f"sim-worker-{i}-{v}"), i) for i in range(n) for v in range(replicas))
+        self.hashes = [h for h, _ in points]
+        self.nodes = [i for _, i in points]
+
+    def node_for(self, session_id):
+        i = bisect.bisect_right(self.hashes, _hash(session_id)) % len(self.hashes)
+        return self.nodes[i]
+
+
+def worker_channel(index):
+    return f"sim.worker.{index}"
+
+
+_rings = {}
+
+
+def channel_for(session_id, n=None):
+    n = n or WORKER_COUNT
+    ring = _rings.get(n)
+    if ring is None:
+        ring = _rings[n] = HashRing(n)
+    return worker_channel(ring.node_for(session_id))
+
+
+# --- 프론트(ASGI) 쪽 ---
+
+class SimRelay:
+    """
+    프로세스당 하나. 이 프로세스의 세션별 연결 수를 워커에 알리고 (heartbeat) 액션을 넘긴다
+    """
+
+    def __init__(self):
+        self.members = defaultdict(set)
+        self.task = None
+
+    async def _send_join(self, session_id, fresh=False):
+        await get_channel_layer().send(channel_for(session_id), {
+            "type": "sim.join", "session_id": session_id, "frontend": PROCESS_ID,
+            "count": len(self.members.get(session_id, ())), "fresh": fresh,
+        })
+
+    async def join(self, consumer):
+        self.members[consumer.session_id].add(consumer)
+        await self._send_join(consumer.session_id, fresh=True)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def leave(self, consumer):
+        sid = consumer.session_id
+        cs = self.members.get(sid)
+        if cs is not None:
+            cs.discard(consumer)
+            if not cs:
+                del self.members[sid]
+        await self._send_join(sid)
+
+    async def send_action(self, consumer, content):
+        await get_channel_layer().send(channel_for(consumer.session_id), {
+            "type": "sim.action", "session_id": consumer.session_id,
+            "content": content, "reply_to": consumer.channel_name,
+        })
+
+    async def _run(self):
+        while self.members:
+            await asyncio.sleep(HEARTBEAT)
+            for sid in list(self.members):
+                try:
+                    await self._send_join(sid)
+                except Exception:
+                    logger.exception("sim heartbeat failed for session %s", sid)
+
+
+_relay = None
+
+
+def get_relay():
+    global _relay
+    if _relay is None:
+        _relay = SimRelay()
+    return _relay
+
+
+# --- 워커 쪽 ---
+
+class WorkerSession:
+    """
+    워커 안의 세션 하나 (LeaseManager 가 보는 consumer 인터페이스)
+    """
+
+    def __init__(self, worker, session_id):
+        self.worker = worker
+        self.session_id = session_id
+        self.lease_token = lease_token(f"{worker.channel}:{session_id}")
+        self.runner = None
+        self.frontends = {}   # frontend id -> 마지막 heartbeat 시각
+
+    async def become_owner(self, fresh_connect=False):
+        self.runner = SessionRunner(self.session_id, self.worker.layer, self.lease_token)
+        await self.runner.start(fresh_connect)
+
+    async def lose_ownership(self):
+        await self.runner.stop(save=False)
+        self.runner = None
+        self.worker.leases.add_viewer(self)
+
+
+class SimWorker:
+    def __init__(self, index):
+        self.index = index
+        self.channel = worker_channel(index)
+        self.layer = get_channel_layer()
+        self.leases = get_lease_manager()
+        self.sessions = {}
+
+    async def run(self):
+        logger.info("sim worker %d listening on %s", self.index, self.channel)
+        reaper = asyncio.create_task(self._expire_frontends())
+        try:
+            while True:
+                msg = await self.layer.receive(self.channel)
+                try:
+                    if msg["type"] == "sim.join":
+                        await self.on_join(msg)
+                    elif msg["type"] == "sim.action":
+                        await self.on_action(msg)
+                except Exception:
+                    logger.exception("sim worker %d failed on %s", self.index, msg.get("type"))
+        finally:
+            reaper.cancel()
+            for ws in list(self.sessions.values()):
+                await self.close_session(ws)
+
+    async def open_session(self, session_id, frontend, fresh):
+        ws = self.sessions[session_id] = WorkerSession(self, session_id)
+        ws.frontends[frontend] = asyncio.get_running_loop().time()
+        if await self.leases.claim(ws):
+            try:
+                await ws.become_owner(fresh_connect=fresh)
+            except Exception:
+                del self.sessions[session_id]
+                await self.leases.release(ws)
+                raise
+        else:
+            # 다른 워커(워커 수 변경 중) 가 아직 들고 있음 => lease 가 풀리면 승격
+            self.leases.add_viewer(ws)
+        return ws
+
+    async def close_session(self, ws):
+        self.sessions.pop(ws.session_id, None)
+        if ws.runner is not None:
+            await ws.runner.stop(save=True)
+            ws.runner = None
+            await self.leases.release(ws)
+        else:
+            self.leases.remove_viewer(ws)
+
+    async def on_join(self, msg):
+        sid = msg["session_id"]
+        ws = self.sessions.get(sid)
+        if msg["count"] > 0:
+            if ws is None:
+                await self.open_session(sid, msg["frontend"], msg.get("fresh", False))
+            else:
+                ws.frontends[msg["frontend"]] = asyncio.get_running_loop().time()
+        elif ws is not None:
+            ws.frontends.pop(msg["frontend"], None)
+            if not ws.frontends:
+                await self.close_session(ws)
+
+    async def on_action(self, msg):
+        ws = self.sessions.get(msg["session_id"])
+        reply_to = msg["reply_to"]
+
+        async def reply(payload, close=False):
+            await self.layer.send(reply_to, {"type":"action_reply", "payload": payload, "close": close})
+
+        if ws is None or ws.runner is None:
+            await reply({"error":"session not ready", "retry_after": INTERNAL_TICK})
+            return
+        await ws.runner.apply_action(msg["content"], reply)
+
+    async def _expire_frontends(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT)
+            cutoff = asyncio.get_running_loop().time() - FRONTEND_TIMEOUT
+            for ws in list(self.sessions.values()):
+                for fid, seen in list(ws.frontends.items()):
+                    if seen < cutoff:
+                        del ws.frontends[fid]
+                if not ws.frontends:
+                    try:
+                        await self.close_session(ws)
+                    except Exception:
+                        logger.exception("closing session %s failed", ws.session_id)
+
+
+async def _serve(index):
+    # SIGTERM => 세션 체크포인트 후 종료 (SimWorker.run 의 finally)
+    task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    try:
+        await SimWorker(index).run()
+    except asyncio.CancelledError:
+        pass
+
+
+def run_worker(index):
+    """
+    run_sim_workers 가 띄우는 자식 프로세스 진입점
+    """
+    import django
+    django.setup()
+    logging.basicConfig(level=logging.INFO, format=f"[sim-{index}] %(levelname)s %(message)s")
+    try:
+        asyncio.run(_serve(index))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,424 @@
+# game/simulation.py
+"""
+게임 규칙(스폰, 이동, 공격, 이펙트, 스테이지 진행)만 담은 순수 시뮬레이션 모듈.
+Channels / WebSocket / Redis 없이 돌아간다.
+
+    st = new_state()
+    rt = SimRuntime()
+    stage_changed = step(st, TICK, rt)
+    # = begin_step => combat => end_step (combat 만 프로세스 풀로 보낼 수 있음, game/offload.py)
+
+- st : JSON 직렬화 가능한 세션 상태 (Redis에 저장되는 그대로)
+- rt : 저장하지 않는 런타임 (타겟 격자, numpy 백엔드, 죽은 적 id 버퍼, 이펙트 버퍼, 프로파일러, 입력 큐)
+플레이어 액션은 rt.commands 에 넣어두면 다음 step 시작에 도착 순서대로 적용되고,
+결과 (reply, 메시지) 는 rt.results 에 쌓인다.
+공격 이펙트는 상태에 넣지 않고 rt.effects 에 이벤트로 쌓아 다음 프레임에 한 번 보낸다 (game/effects.py).
+numpy 백엔드 사용 중에는 st의 enemies/balls가 낡을 수 있으므로
+저장/전송 직전에 sync(st, rt)를 호출한다.
+"""
+import random
+
+from .waves import default_schedule, DEFAULT_NORMALS
+from .path import position_at
+from .spatial import SpatialGrid
+from .sim_numpy import NumpyWorld, select_backend
+from .entities import new_pool, alloc_id, compact_enemies
+from .profiling import TickProfiler
+from .commands import Command, CommandQueue
+from .effects import EffectRing, EFFECT_DURATION
+
+TICK = 0.1
+ATTACK_RANGE = 80  # 볼 사거리
+BALL_SPEED = 15.0  # 볼 이동속도
+
+COLORS = ["red","orange","yellow","green","blue","navy","purple"]
+# 이펙트가 보이는 틱 수 (이보다 오래된 이벤트는 프레임에 안 실음)
+EFFECT_TICKS = round(EFFECT_DURATION / TICK)
+
+
+def new_state():
+    return {
+        "stage": 1,
+        "time_in_stage": 0.0,
+        "enemies": [],
+        "balls": [],
+        "color_upgrades": {c: 0 for c in COLORS},
+        "last_broadcast": 0.0,
+        "frame": 0,
+        "next_id": 1,
+        "enemy_pool": new_pool(),
+        "is_active": True
+    }
+
+
+class SimRuntime:
+    """
+    세션 하나의 비영속 런타임
+    """
+
+    def __init__(self, profiler=None, schedule=None):
+        # 볼 타겟 탐색용 격자 (칸 크기 = 사거리)
+        self.grid = SpatialGrid(ATTACK_RANGE)
+        # 적이 많아지면 numpy 배열 백엔드 (None이면 dict 루프)
+        self.world = None
+        # 죽은 적 id (다음 broadcast에서 한 번만 전송)
+        self.pending_kills = []
+        # 시뮬레이션 틱 번호 (이펙트 발생 시각 기준, 저장 안 함)
+        self.tick = 0
+        # 공격 이펙트 이벤트 (다음 프레임에 한 번 전송)
+        self.effects = EffectRing()
+        self.profiler = profiler if profiler is not None else TickProfiler("headless")
+        # 컴파일된 웨이브 계획 (DB 템플릿). 없으면 기본 적
+        self.schedule = schedule if schedule is not None else default_schedule()
+        # 플레이어 액션 입력 큐와 적용 결과 [(reply, msg), ...]
+        self.commands = CommandQueue()
+        self.results = []
+
+
+def new_entity_id(st):
+    eid = st["next_id"]
+    st["next_id"] = eid + 1
+    return eid
+
+
+def sync(st, rt):
+    """
+    numpy 백엔드 사용 중이면 배열 값을 st dict로 내보냄
+    """
+    if rt.world is not None:
+        rt.world.export(st)
+
+
+def update_backend(st, rt):
+    enemy_count = rt.world.enemy_count if rt.world else len(st["enemies"])
+    use_numpy = select_backend(enemy_count, rt.world is not None)
+    if use_numpy and rt.world is None:
+        rt.world = NumpyWorld(st, BALL_SPEED, ATTACK_RANGE)
+    elif not use_numpy and rt.world is not None:
+        rt.world.export(st)
+        rt.world = None
+        rt.grid.stale = True
+
+
+def step(st, dt=TICK, rt=None):
+    """
+    한 틱 진행. return 스테이지가 바뀌었으면 True
+    """
+    if rt is None:
+        rt = SimRuntime()
+    wave = begin_step(st, dt, rt)
+    combat(st, dt, rt)
+    return end_step(st, rt, wave)
+
+
+# step 을 나눈 단계. 이동/전투(combat)만 다른 프로세스로 보낼 수 있도록 (game/offload.py)
+
+def begin_step(st, dt, rt):
+    """
+    입력 적용, 시간 진행, 스폰, 백엔드 선택. return 이번 스테이지 웨이브 계획
+    """
+    prof = rt.profiler
+    mark = prof.now()
+
+    # 입력은 틱 시작에 한 번에 (도착 순서 = 적용 순서)
+    if rt.commands:
+        apply_commands(st, rt, rt.commands.drain())
+        mark = prof.lap("input", mark)
+
+    rt.tick += 1
+    st["time_in_stage"] += dt
+    t = st["time_in_stage"]
+    wave = rt.schedule.plan(st["stage"])
+
+    # 1초마다 적 스폰 (어떤 적인지는 계획에 미리 정해져 있음)
+    sec_int = int(t)
+    sec_prev = int(t - dt)
+    if sec_int != sec_prev and t <= wave.spawn_duration:
+        spec = wave.spawn_at(sec_int)
+        if spec is not None:
+            spawn_enemy(st, rt, spec)
+    prof.lap("spawn", mark)
+
+    update_backend(st, rt)
+    return wave
+
+
+def combat(st, dt, rt):
+    """
+    적/볼 이동 + 공격 (이 프로세스에서). return 걸린 시간(초)
+    """
+    prof = rt.profiler
+    started = mark = prof.now()
+    if rt.world is not None:
+        w = rt.world
+        w.move_enemies(dt)
+        mark = prof.lap("move_enemies", mark)
+        w.move_balls(dt)
+        mark = prof.lap("move_balls", mark)
+        w.balls_attack(dt, st["color_upgrades"], rt.effects, rt.tick)
+        mark = prof.lap("balls_attack", mark)
+    else:
+        move_enemies(st, dt)
+        rt.grid.stale = True  # 적이 움직였으므로 다음 탐색 때 재구성
+        mark = prof.lap("move_enemies", mark)
+        move_balls(st, dt)
+        mark = prof.lap("move_balls", mark)
+        balls_attack(st, rt, dt)
+        mark = prof.lap("balls_attack", mark)
+    return mark - started
+
+
+def end_step(st, rt, wave):
+    """
+    죽은 적 제거, 스테이지 진행. return 스테이지가 바뀌었으면 True
+    """
+    prof = rt.profiler
+    mark = prof.now()
+    # 죽은 적은 바로 제거 => 상태 크기/틱 비용이 살아있는 적 수에 비례
+    if rt.world is not None:
+        rt.pending_kills.extend(rt.world.compact(st["enemy_pool"]))
+    else:
+        rt.pending_kills.extend(compact_enemies(st))
+    prof.lap("compact", mark)
+
+    if st["time_in_stage"] >= wave.duration:
+        st["stage"] += 1
+        st["time_in_stage"] = 0
+        # 적 죽이는 코드 제거 => 적이 계속 유지
+        return True
+    return False
+
+
+def enemy_speed(is_boss):
+    """
+    보스 8.0, 일반몹 5~8 랜덤 (REST 소환/예전 세션 변환도 이 규칙)
+    """
+    return 8.0 if is_boss else random.uniform(5,8)
+
+
+def enemy_fields(spec):
+    """
+    id 를 뺀 새 적 (경로 시작점). REST 소환은 id 를 Lua 스크립트가 enemy_pool 에서 할당
+    spec: waves.EnemySpec
+    """
+    return {
+        "name": spec.name,
+        "hp": spec.hp, "defense": spec.defense, "shield": spec.shield,
+        "dist": 0.0, "speed": enemy_speed(spec.enemy_type == "boss"),
+        "is_dead": False,
+    }
+
+
+def spawn_enemy(st, rt, spec=None):
+    """
+    적을 (20,20)에서 시작 (dist = 경로를 따라 이동한 거리)
+    spec: waves.EnemySpec (없으면 기본 일반몹 중 하나)
+    """
+    if spec is None:
+        spec = random.choice(DEFAULT_NORMALS)
+    e = {"id": alloc_id(st["enemy_pool"]), **enemy_fields(spec)}
+    if rt.world is not None:
+        rt.world.add_enemy(e)
+    else:
+        st["enemies"].append(e)
+    return e
+
+
+def move_enemies(st, dt=TICK):
+    """
+    경로 위 이동거리만 증가. dt가 커도 꼭짓점을 여러 개 지나갈 수 있음
+    """
+    for e in st["enemies"]:
+        if e["is_dead"]:
+            continue
+        e["dist"] += e["speed"] * dt
+
+
+def enemy_positions(enemies):
+    """
+    dist -> (x,y). 죽은 적은 계산하지 않음 (0,0)
+    """
+    xs = [0.0]*len(enemies)
+    ys = [0.0]*len(enemies)
+    for i, e in enumerate(enemies):
+        if not e["is_dead"]:
+            xs[i], ys[i] = position_at(e["dist"])
+    return xs, ys
+
+
+def move_balls(st, dt=TICK):
+    for b in st["balls"]:
+        tx = b.get("target_x", b["x"])
+        ty = b.get("target_y", b["y"])
+        spd= BALL_SPEED
+        dx= tx - b["x"]
+        dy= ty - b["y"]
+        dist= (dx*dx + dy*dy)**0.5
+        if dist>0:
+            step= spd* dt
+            if step>= dist:
+                b["x"]= tx
+                b["y"]= ty
+            else:
+                rr= step/dist
+                b["x"]+= dx* rr
+                b["y"]+= dy* rr
+
+
+def balls_attack(st, rt, dt=TICK):
+    eff= rt.effects
+    color_up= st["color_upgrades"]
+    grid= rt.grid
+
+    for b in st["balls"]:
+        cd= b.get("cooldown",0)
+        if cd>0:
+            cd-= dt
+            if cd<0: cd=0
+            b["cooldown"]= cd
+            if cd>0:
+                continue
+        # 공격력 + 업그레이드
+        dmg= b.get("damage",5) + color_up.get(b["color"],0)
+
+        # 사거리=80 (좀 늘림), 격자에서 주변 칸만 탐색
+        bx, by= b["x"], b["y"]
+        if grid.stale:
+            grid.rebuild(st["enemies"], *enemy_positions(st["enemies"]))
+        ti= grid.nearest(bx, by, ATTACK_RANGE, st["enemies"])
+        if ti is not None:
+            target= st["enemies"][ti]
+            net= max(0, dmg- target.get("defense",0))
+            sh= target.get("shield",0)
+            if sh>0 and net>0:
+                if sh>= net:
+                    target["shield"]-= net
+                    net=0
+                else:
+                    net-= sh
+                    target["shield"]=0
+            if net>0:
+                target["hp"]-= net
+                if target["hp"]<=0:
+                    target["hp"]=0
+                    target["is_dead"]=True
+
+            eff.push(rt.tick, bx, by, grid.xs[ti], grid.ys[ti])
+            b["cooldown"]=1.0
+
+
+# --- 플레이어 액션 ---
+
+def ball_count(st, rt):
+    return len(rt.world.ball_meta) if rt.world is not None else len(st["balls"])
+
+
+def add_ball(st, rt, color, rarity, damage=5):
+    b={
+        "id": new_entity_id(st),
+        "x":200,"y":200,
+        "target_x":200,"target_y":200,
+        "color":color,
+        "rarity":rarity,
+        "damage":damage,
+        "cooldown":0
+    }
+    if rt.world is not None:
+        rt.world.add_ball(b)
+    else:
+        st["balls"].append(b)
+    return b
+
+
+def set_ball_target(st, rt, idx, tx, ty):
+    """
+    return 잘못된 idx면 False
+    """
+    if idx<0 or idx>= ball_count(st, rt):
+        return False
+    if rt.world is not None:
+        rt.world.set_ball_target(idx, tx, ty)
+    else:
+        b= st["balls"][idx]
+        b["target_x"]= tx
+        b["target_y"]= ty
+    return True
+
+
+def upgrade_color(st, color):
+    up= st["color_upgrades"]
+    if color not in up: up[color]=0
+    up[color]+=1
+    return up[color]
+
+
+def apply_command(st, rt, cmd):
+    """
+    검증된 Command 하나 적용. return 요청자에게 보낼 메시지
+    """
+    if cmd.kind == "move_ball":
+        idx, tx, ty = cmd.args
+        if not set_ball_target(st, rt, idx, tx, ty):
+            return {"error": "invalid ball idx"}
+        return {
+            "message":f"볼 {idx} 이동 => ({tx:.1f},{ty:.1f})",
+            "ack":"move_ball", "ball_idx": idx, "tx": tx, "ty": ty,
+        }
+    if cmd.kind == "summon_ball":
+        c, rty, damage = cmd.args
+        ball = add_ball(st, rt, c, rty, damage=damage)
+        return {"message":f"볼 소환: {c}/{rty}", "ack":"summon_ball", "ball": dict(ball),
+                "ball_count": ball_count(st, rt)}
+    if cmd.kind == "upgrade_color":
+        c, = cmd.args
+        level = upgrade_color(st, c)
+        return {"message":f"{c} 업그레이드 => {level}", "ack":"upgrade_color", "color": c, "level": level}
+    if cmd.kind == "spawn_enemy":
+        stage, = cmd.args
+        specs = rt.schedule.templates_for_stage(stage)
+        if not specs:
+            return {"message":"No EnemyTemplate for stage", "ack":"spawn_enemy", "enemies": []}
+        names = [spawn_enemy(st, rt, spec)["name"] for spec in specs]
+        return {"message":f"Stage {stage} 적 소환", "ack":"spawn_enemy", "enemies": names}
+    return {"error": "unknown action"}
+
+
+def apply_commands(st, rt, cmds):
+    for cmd in cmds:
+        rt.results.append((cmd.reply, apply_command(st, rt, cmd)))
+
+
+def queue_command(rt, kind, args, reply=None):
+    """
+    return 큐가 가득 차서 거절됐으면 False
+    """
+    return rt.commands.push(Command(kind, args, reply))
+
+
+# --- broadcast 용 프레임 ---
+
+def build_frame(st, rt):
+    """
+    tick_update payload. 호출마다 frame 번호 증가, 죽은 적 id / 이펙트 버퍼 비움
+    """
+    sync(st, rt)
+    # 죽은 적은 틱마다 compact 되므로 st["enemies"]는 살아있는 적만
+    living= []
+    for e in st["enemies"]:
+        x, y= position_at(e["dist"])
+        living.append({**e, "x": x, "y": y})
+    killed= rt.pending_kills
+    rt.pending_kills= []
+    st["frame"]+= 1
+    return {
+        "kind":"tick_update",
+        "frame": st["frame"],
+        "tick": rt.tick,
+        "stage": st["stage"],
+        "time_in_stage": st["time_in_stage"],
+        "enemies": living,
+        "killed": killed,
+        "balls": [dict(b) for b in st["balls"]],
+        "upgrades": dict(st["color_upgrades"]),
+        "effects": rt.effects.drain(rt.tick, EFFECT_TICKS)
+    }
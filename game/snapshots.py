@@ -0,0 +1,144 @@
+# game/snapshots.py
+"""
+세션 스냅샷 (PostgreSQL, Redis 유실 대비).
+
+소유자 consumer 가 SNAPSHOT_INTERVAL 마다 (그리고 disconnect / end_game 때) submit() 하면
+프로세스당 SnapshotWriter 하나가 FLUSH_INTERVAL 마다 모아서 한 번에 기록한다
+(기존 행은 bulk_update, 새 세션은 bulk_create, DB 작업은 스레드에서 => 틱을 막지 않음).
+같은 세션이 기록 전에 다시 들어오면 최신 것만 남긴다.
+
+세션당 최신 스냅샷 한 행 (SessionSnapshot). data = zlib(JSON), schema = 형식 버전,
+version = 기록 횟수. 재접속 시 Redis 에 상태가 없으면 consumer 가 aload_snapshot() 으로 복구.
+GameSession 행이 없는 세션(부하 테스트 등)은 기록하지 않는다.
+"""
+import asyncio
+import json
+import logging
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from channels.db import database_sync_to_async
+
+from .models import GameSession, SessionSnapshot
+
+logger = logging.getLogger(__name__)
+
+# 세션별 스냅샷 주기(초)
+SNAPSHOT_INTERVAL = float(getattr(settings, 'GAME_SNAPSHOT_INTERVAL', 30.0))
+# 모아서 기록하는 주기(초)와 한 번에 기록하는 최대 세션 수
+FLUSH_INTERVAL = float(getattr(settings, 'GAME_SNAPSHOT_FLUSH_INTERVAL', 1.0))
+BATCH_SIZE = int(getattr(settings, 'GAME_SNAPSHOT_BATCH_SIZE', 200))
+
+SCHEMA = 1
+# 스냅샷에 넣는 상태 필드 (공격 이펙트 등 런타임 값은 제외)
+FIELDS = ("stage", "time_in_stage", "frame", "next_id", "is_active",
+          "enemy_pool", "balls", "color_upgrades", "enemies")
+
+
+def encode_snapshot(st):
+    """
+    상태 dict => JSON 문자열 (압축은 writer 스레드에서)
+    """
+    return json.dumps({k: st[k] for k in FIELDS if k in st}, separators=(",", ":"))
+
+
+def decode_snapshot(schema, data):
+    """
+    return 상태 dict (모르는 형식이면 None)
+    """
+    if schema != SCHEMA:
+        return None
+    st = json.loads(zlib.decompress(bytes(data)))
+    st.setdefault("last_broadcast", 0.0)
+    return st
+
+
+def write_batch(batch):
+    """
+    batch: {session_id: (json 문자열, stage, is_active)}. return 기록한 세션 수
+    """
+    now = timezone.now()
+    rows = {}
+    for sid, (raw, stage, is_active) in batch.items():
+        rows[int(sid)] = SessionSnapshot(
+            session_id=int(sid), schema=SCHEMA, stage=stage, is_active=is_active,
+            data=zlib.compress(raw.encode()), updated_at=now,
+        )
+    ids = list(rows)
+    with transaction.atomic():
+        existing = set(SessionSnapshot.objects.filter(session_id__in=ids)
+                       .values_list("session_id", flat=True))
+        new_ids = [sid for sid in ids if sid not in existing]
+        if new_ids:
+            known = set(GameSession.objects.filter(id__in=new_ids).values_list("id", flat=True))
+            new_ids = [sid for sid in new_ids if sid in known]
+            SessionSnapshot.objects.bulk_create([rows[sid] for sid in new_ids])
+        if existing:
+            updates = [rows[sid] for sid in existing]
+            for snap in updates:
+                snap.version = F("version") + 1
+            SessionSnapshot.objects.bulk_update(
+                updates, ["version", "schema", "stage", "is_active", "data", "updated_at"])
+    return len(existing) + len(new_ids)
+
+
+def load_snapshot(session_id):
+    """
+    진행 중 세션의 최신 스냅샷 => 상태 dict (없으면 None)
+    """
+    try:
+        sid = int(session_id)
+    except (TypeError, ValueError):
+        return None
+    snap = (SessionSnapshot.objects.filter(session_id=sid, session__is_active=True)
+            .only("schema", "data").first())
+    return decode_snapshot(snap.schema, snap.data) if snap else None
+
+
+aload_snapshot = database_sync_to_async(load_snapshot)
+
+
+class SnapshotWriter:
+    def __init__(self):
+        self.pending = {}
+        self.task = None
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, session_id, st):
+        self.pending[session_id] = (encode_snapshot(st), st["stage"], bool(st["is_active"]))
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def flush(self):
+        while self.pending:
+            batch = {}
+            for sid in list(self.pending)[:BATCH_SIZE]:
+                batch[sid] = self.pending.pop(sid)
+            try:
+                self.written += await database_sync_to_async(write_batch)(batch)
+            except Exception:
+                logger.exception("snapshot write failed (%d sessions)", len(batch))
+                self.failed += len(batch)
+                # 다음 flush 때 다시 (그 사이 더 새 스냅샷이 들어왔으면 그것만)
+                for sid, item in batch.items():
+                    self.pending.setdefault(sid, item)
+                return
+
+    async def _run(self):
+        while self.pending:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flush()
+
+
+_writer = None
+
+
+def get_snapshot_writer():
+    global _writer
+    if _writer is None:
+        _writer = SnapshotWriter()
+    return _writer
@@ -0,0 +1,69 @@
+# game/spatial.py
+"""
+균일 격자(uniform grid) 공간 인덱스.
+맵(400x400)을 cell_size 크기 칸으로 나누고, 살아있는 적의 인덱스와 좌표를 칸별로 보관한다.
+cell_size를 사거리와 같게 잡으면 최근접 탐색은 주변 3x3 칸만 보면 된다.
+"""
+import math
+
+MAP_WIDTH = 400
+MAP_HEIGHT = 400
+
+
+class SpatialGrid:
+    def __init__(self, cell_size, width=MAP_WIDTH, height=MAP_HEIGHT):
+        self.cell_size = float(cell_size)
+        self.cols = int(math.ceil(width / self.cell_size)) + 1
+        self.rows = int(math.ceil(height / self.cell_size)) + 1
+        self.cells = [[] for _ in range(self.cols * self.rows)]
+        self.xs = []
+        self.ys = []
+        self.stale = True
+
+    def _col(self, x):
+        c = int(x // self.cell_size)
+        return 0 if c < 0 else (self.cols - 1 if c >= self.cols else c)
+
+    def _row(self, y):
+        r = int(y // self.cell_size)
+        return 0 if r < 0 else (self.rows - 1 if r >= self.rows else r)
+
+    def rebuild(self, items, xs, ys):
+        """
+        items: is_dead 를 가진 dict 리스트 (st["enemies"]), xs/ys: 같은 순서의 좌표.
+        리스트 인덱스를 저장
+        """
+        for cell in self.cells:
+            cell.clear()
+        self.xs = xs
+        self.ys = ys
+        cols = self.cols
+        for i, e in enumerate(items):
+            if e["is_dead"]:
+                continue
+            self.cells[self._row(ys[i]) * cols + self._col(xs[i])].append(i)
+        self.stale = False
+
+    def nearest(self, x, y, radius, items):
+        """
+        (x,y)에서 radius 미만 거리의 살아있는 최근접 항목의 인덱스 (없으면 None).
+        거리가 같으면 리스트 앞쪽(인덱스 작은 쪽) => 전수 탐색과 같은 결과
+        """
+        xs, ys = self.xs, self.ys
+        best = None
+        best_dist = radius
+        c0, c1 = self._col(x - radius), self._col(x + radius)
+        r0, r1 = self._row(y - radius), self._row(y + radius)
+        cols = self.cols
+        for row in range(r0, r1 + 1):
+            base = row * cols
+            for col in range(c0, c1 + 1):
+                for i in self.cells[base + col]:
+                    if items[i]["is_dead"]:
+                        continue
+                    dx = xs[i] - x; dy = ys[i] - y
+                    dist = (dx*dx + dy*dy)**0.5
+                    if dist < best_dist or (dist == best_dist and best is not None and i < best):
+                        best_dist = dist
+                        best = i
+        return best
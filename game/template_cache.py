@@ -0,0 +1,157 @@
+# game/template_cache.py
+"""
+BallTemplate / EnemyTemplate 프로세스 로컬 캐시.
+
+- 볼: 누적 가중치 배열을 미리 만들어 두고 bisect로 뽑는다 (O(log n), 쿼리 없음)
+- 무효화: 모델 signal(post_save/post_delete, game/signals.py) 과 load_templates 명령.
+  같은 프로세스면 즉시 비우고, 다른 프로세스(서버 워커)는 Redis 버전 키를
+  최대 CHECK_INTERVAL 초마다 확인해서 바뀌었으면 다시 읽는다.
+
+sync 전용 (DB 접근). async 코드에서는 cached_ball_table()로 먼저 확인하고
+None이면 database_sync_to_async(get_ball_table) 를 쓴다.
+"""
+import random
+import threading
+import time
+from bisect import bisect_right
+from itertools import accumulate
+
+from django.conf import settings
+
+from .redis_manager import get_redis
+
+VERSION_KEY = "game:templates:version"
+CHECK_INTERVAL = float(getattr(settings, 'GAME_TEMPLATE_CHECK_INTERVAL', 5.0))
+
+
+class BallTable:
+    """
+    가중치 뽑기용 불변 테이블
+    """
+    __slots__ = ("templates", "cumulative", "total")
+
+    def __init__(self, templates):
+        # weight <= 0 인 템플릿은 뽑히지 않음
+        self.templates = [t for t in templates if t["weight"] > 0]
+        self.cumulative = list(accumulate(t["weight"] for t in self.templates))
+        self.total = self.cumulative[-1] if self.cumulative else 0
+
+    def __len__(self):
+        return len(self.templates)
+
+    def pick(self, rng=random):
+        """
+        return 템플릿 dict (비어 있으면 None)
+        """
+        if not self.total:
+            return None
+        i = bisect_right(self.cumulative, rng.random() * self.total)
+        return self.templates[min(i, len(self.templates) - 1)]
+
+
+class _Cache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.balls = None
+        self.enemies = None
+        self.version = None
+        self.checked_at = 0.0
+
+    def clear(self):
+        self.balls = None
+        self.enemies = None
+        self.checked_at = 0.0
+
+
+_cache = _Cache()
+
+
+def _remote_version():
+    try:
+        return get_redis().get(VERSION_KEY)
+    except Exception:
+        # Redis가 없으면 프로세스 로컬 무효화만
+        return _cache.version
+
+
+def _revalidate():
+    """
+    lock 안에서 호출. Redis 버전이 바뀌었으면 캐시 비움
+    """
+    now = time.monotonic()
+    if now - _cache.checked_at < CHECK_INTERVAL:
+        return
+    version = _remote_version()
+    if version != _cache.version:
+        _cache.clear()
+        _cache.version = version
+    _cache.checked_at = now
+
+
+def get_ball_table():
+    from .models import BallTemplate
+    with _cache.lock:
+        _revalidate()
+        if _cache.balls is None:
+            _cache.balls = BallTable(list(
+                BallTemplate.objects.order_by("id").values(
+                    "id", "color", "rarity", "weight",
+                    "base_damage", "base_attack_speed", "special_option",
+                )
+            ))
+        return _cache.balls
+
+
+def cached_ball_table():
+    """
+    DB/Redis 접근 없이 확인. 로드 전이거나 재확인 시점이 지났으면 None
+    """
+    table = _cache.balls
+    if table is None or time.monotonic() - _cache.checked_at >= CHECK_INTERVAL:
+        return None
+    return table
+
+
+def get_enemy_templates():
+    from .models import EnemyTemplate
+    with _cache.lock:
+        _revalidate()
+        if _cache.enemies is None:
+            _cache.enemies = list(
+                EnemyTemplate.objects.order_by("id").values(
+                    "id", "name", "enemy_type", "hp", "defense", "shield",
+                    "stage_min", "stage_max",
+                )
+            )
+        return _cache.enemies
+
+
+def cached_enemy_templates():
+    """
+    DB/Redis 접근 없이 확인. 로드 전이거나 재확인 시점이 지났으면 None
+    """
+    templates = _cache.enemies
+    if templates is None or time.monotonic() - _cache.checked_at >= CHECK_INTERVAL:
+        return None
+    return templates
+
+
+def enemy_templates_for_stage(stage, templates=None):
+    """
+    templates: 템플릿 dict 리스트 (없으면 캐시된 전체). 조회가 잦으면 waves.StageIndex
+    """
+    if templates is None:
+        templates = get_enemy_templates()
+    return [t for t in templates if t["stage_min"] <= stage <= t["stage_max"]]
+
+
+def invalidate():
+    """
+    이 프로세스 캐시를 비우고 Redis 버전을 올려 다른 프로세스에도 알림
+    """
+    with _cache.lock:
+        _cache.clear()
+        try:
+            _cache.version = str(get_redis().incr(VERSION_KEY))
+        except Exception:
+            pass
@@ -1,3 +1,1140 @@
-from django.test import TestCase
+import copy
+import json
+import pickle
+import random
+import zlib
+from concurrent.futures import Future
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from . import interest, offload, sim_workers, redis_manager, session_store, simulation, template_cache, waves
+from .consumers import GameConsumer
+from .commands import MAX_PER_TICK, Command, CommandError, CommandQueue, parse_command
+from .models import BallTemplate, EnemyTemplate, GameSession, SessionSnapshot
+from .ownership import lease_key
+from .runner import SessionRunner
+from .path import SEGMENT_LENGTHS, TOTAL_LENGTH, position_at, segment_at
+from .spatial import MAP_HEIGHT, SpatialGrid
+from .entities import SLOT_BITS, SLOT_MASK, alloc_id, compact_enemies, new_pool, release_id
+from .effects import EffectRing
+from .snapshots import SnapshotWriter, encode_snapshot, load_snapshot, write_batch
+from .delta import DeltaEncoder, FRAME_HISTORY
+from .codec import COORD_KEYS, COORD_SCALE, MsgpackCodec, JsonCodec, negotiate
+from .sim_numpy import NUMPY_AVAILABLE, NUMPY_MIN_ENTITIES, NumpyWorld, select_backend
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@skipUnless(fakeredis, "fakeredis 필요 (Lua 스크립트는 lupa 도)")
+class RedisTestCase(TestCase):
+    """
+    Redis 를 in-process fakeredis 로 바꿔서 실행
+    """
+
+    def setUp(self):
+        self.prev_redis = redis_manager.get_redis()
+        server = fakeredis.FakeServer()
+        self.r = fakeredis.FakeRedis(server=server, decode_responses=True)
+        # async 코드(runner 등)도 같은 서버
+        redis_manager.configure(
+            sync_client=self.r,
+            async_factory=lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+        )
+
+    def tearDown(self):
+        redis_manager.configure(sync_client=self.prev_redis)
+
+    def assert_runnable(self, st, ticks=20):
+        """
+        simulation 형식인지: id 중복 없음 + 틱이 예외 없이 돈다
+        """
+        ids = [b["id"] for b in st["balls"]]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertTrue(all(i < st["next_id"] for i in ids))
+        enemy_ids = [e["id"] for e in st["enemies"]]
+        self.assertEqual(len(enemy_ids), len(set(enemy_ids)))
+        rt = simulation.SimRuntime()
+        for _ in range(ticks):
+            simulation.step(st, rt=rt)
+        simulation.sync(st, rt)
+
+
+class MigrateSessionTests(RedisTestCase):
+
+    def test_state_blob(self):
+        # 예전 consumer 의 전체 blob: 볼 id 없음, 적은 path_idx/x/y, frame/next_id/enemy_pool 없음
+        legacy = {
+            "stage": 2, "time_in_stage": 3.0,
+            "enemies": [
+                {"name": "Boss", "hp": 200, "defense": 10, "shield": 10,
+                 "path_idx": 1, "speed": 8.0, "is_dead": False, "x": 20, "y": 200},
+                {"name": "Slime", "hp": 0, "defense": 1, "shield": 0,
+                 "path_idx": 0, "speed": 6.0, "is_dead": True, "x": 20, "y": 20},
+            ],
+            "balls": [
+                {"x": 200, "y": 200, "target_x": 250, "target_y": 200,
+                 "color": "red", "rarity": "common", "damage": 5, "cooldown": 0},
+                {"x": 100, "y": 100, "target_x": 100, "target_y": 100,
+                 "color": "blue", "rarity": "rare", "damage": 7, "cooldown": 0},
+            ],
+            "color_upgrades": {c: 0 for c in simulation.COLORS},
+            "attack_effects": [],
+            "last_broadcast": 0.0,
+            "is_active": True,
+        }
+        self.r.set("session:7:state", json.dumps(legacy))
+
+        self.assertEqual(session_store.migrate_session(self.r, 7), "state-blob")
+        st = session_store.load_state(self.r, 7)
+
+        self.assertEqual(st["stage"], 2)
+        self.assertEqual(st["frame"], 0)
+        self.assertEqual([b["id"] for b in st["balls"]], [1, 2])
+        self.assertEqual(st["next_id"], 3)
+        # 죽은 적은 버리고, (20,380) 을 지나 (20,200) 까지 온 보스 => 360 + 180
+        self.assertEqual(len(st["enemies"]), 1)
+        boss = st["enemies"][0]
+        self.assertAlmostEqual(boss["dist"], 540.0)
+        self.assertEqual(boss["speed"], 8.0)
+        self.assertEqual(st["enemy_pool"]["gens"], [0])
+        self.assertFalse(self.r.exists("session:7:state"))
+        self.assert_runnable(st)
+
+    def test_view_keys(self):
+        # 예전 REST view 키: 볼은 위치/id 없음, 적은 id/dist/speed 없음
+        self.r.set("session:8:balls", json.dumps([
+            {"color": "red", "rarity": "common", "damage": 5, "speed": 1.0,
+             "special": None, "is_moving": False},
+            {"color": "green", "rarity": "epic", "damage": 9, "speed": 1.5,
+             "special": None, "is_moving": False},
+        ]))
+        self.r.set("session:8:enemies", json.dumps([
+            {"name": "Slime", "type": "normal", "hp": 10, "defense": 1, "shield": 0, "is_dead": False},
+            {"name": "King", "type": "boss", "hp": 300, "defense": 5, "shield": 20, "is_dead": False},
+        ]))
+        self.r.set("session:8:color_upgrades", json.dumps({c: 1 for c in simulation.COLORS}))
+        self.r.set("session:8:info", json.dumps({"stage": 3, "user_id": 1}))
+
+        self.assertEqual(session_store.migrate_session(self.r, 8), "view-keys")
+        st = session_store.load_state(self.r, 8)
+
+        self.assertEqual(st["stage"], 3)
+        self.assertEqual(self.r.hget("session:8:meta", "user_id"), "1")
+        self.assertEqual([b["id"] for b in st["balls"]], [1, 2])
+        self.assertEqual(st["next_id"], 3)
+        self.assertTrue(all(b["x"] == 200 and b["target_x"] == 200 for b in st["balls"]))
+        slime, king = st["enemies"]
+        self.assertEqual((slime["dist"], king["dist"]), (0.0, 0.0))
+        self.assertTrue(5 <= slime["speed"] <= 8)
+        self.assertEqual(king["speed"], 8.0)
+        self.assertEqual(len(st["enemy_pool"]["gens"]), 2)
+        # 이어서 새로 할당되는 id 와 겹치지 않아야 함
+        rt = simulation.SimRuntime()
+        self.assertEqual(simulation.add_ball(st, rt, "red", "common")["id"], 3)
+        self.assertNotIn(simulation.spawn_enemy(st, rt)["id"], (slime["id"], king["id"]))
+        self.assert_runnable(st)
+
+
+class StateWriterTests(RedisTestCase):
+
+    def write(self, writer, st):
+        pipe = self.r.pipeline(transaction=False)
+        pending = writer.queue(pipe, st)
+        pipe.execute()
+        writer.confirm(pending)
+
+    def test_next_id_is_never_overwritten(self):
+        st = simulation.new_state()
+        rt = simulation.SimRuntime()
+        simulation.add_ball(st, rt, "red", "common")
+        writer = session_store.StateWriter(9)
+        self.write(writer, st)
+        self.assertEqual(self.r.hget("session:9:meta", "next_id"), "2")
+
+        # 소유자가 기록하는 사이 다른 쪽(REST SUMMON_BALL)이 카운터에서 id 두 개를 가져감
+        self.r.hincrby("session:9:meta", "next_id", 2)
+        simulation.add_ball(st, rt, "blue", "common")
+        self.write(writer, st)
+        self.assertEqual(self.r.hget("session:9:meta", "next_id"), "5")
+
+
+def enemy_tpl(name, stage_min, stage_max, enemy_type="normal"):
+    return {"id": name, "name": name, "enemy_type": enemy_type, "hp": 10, "defense": 0,
+            "shield": 0, "stage_min": stage_min, "stage_max": stage_max}
+
+
+class StageIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        # 3~4, 9~9 겹침 / 7~8 빈 구간 / 12 이후 없음
+        self.templates = [
+            enemy_tpl("Slime", 1, 4),
+            enemy_tpl("Wolf", 3, 6),
+            enemy_tpl("King", 5, 5, "boss"),
+            enemy_tpl("Orc", 9, 11),
+            enemy_tpl("Troll", 9, 9),
+        ]
+        self.index = waves.StageIndex(self.templates)
+
+    def names(self, stage):
+        return [s.name for s in self.index.lookup(stage)]
+
+    def test_matches_linear_scan(self):
+        for stage in range(0, 15):
+            expected = [t["name"] for t in self.templates if t["stage_min"] <= stage <= t["stage_max"]]
+            self.assertEqual(self.names(stage), expected, stage)
+
+    def test_boundaries_gaps_and_overlaps(self):
+        self.assertEqual(self.names(0), [])
+        self.assertEqual(self.names(1), ["Slime"])
+        self.assertEqual(self.names(2), ["Slime"])
+        self.assertEqual(self.names(3), ["Slime", "Wolf"])
+        self.assertEqual(self.names(4), ["Slime", "Wolf"])
+        self.assertEqual(self.names(5), ["Wolf", "King"])
+        self.assertEqual(self.names(6), ["Wolf"])
+        self.assertEqual(self.names(7), [])
+        self.assertEqual(self.names(8), [])
+        self.assertEqual(self.names(9), ["Orc", "Troll"])
+        self.assertEqual(self.names(10), ["Orc"])
+        self.assertEqual(self.names(11), ["Orc"])
+        self.assertEqual(self.names(12), [])
+        self.assertEqual(self.names(10**6), [])
+
+    def test_empty_stage_falls_back_to_defaults(self):
+        schedule = waves.WaveSchedule(self.templates)
+        self.assertEqual(schedule.plan(7).templates, ())
+        self.assertIn(schedule.plan(7).spawn_at(1), waves.DEFAULT_NORMALS + (waves.DEFAULT_BOSS,))
+        self.assertEqual(waves.StageIndex([]).lookup(3), ())
+
+
+class RunningScheduleTests(RedisTestCase):
+
+    def test_template_change_reaches_running_session(self):
+        EnemyTemplate.objects.create(name="Slime", enemy_type="normal", stage_min=1, stage_max=5)
+        template_cache.invalidate()
+        runner = SessionRunner(42, None, "test")
+        runner.rt = simulation.SimRuntime(schedule=waves.current_schedule())
+
+        # 그대로면 같은 계획
+        async_to_sync(runner.refresh_schedule)()
+        self.assertEqual([t.name for t in runner.rt.schedule.templates_for_stage(3)], ["Slime"])
+
+        # 다른 프로세스가 템플릿을 바꾸고 버전을 올림 (이 프로세스 signal 없음) => 다음 재확인 때 교체
+        EnemyTemplate.objects.bulk_create([
+            EnemyTemplate(name="Orc", enemy_type="normal", stage_min=3, stage_max=5),
+        ])
+        self.r.incr(template_cache.VERSION_KEY)
+        async_to_sync(runner.refresh_schedule)()
+        self.assertEqual([t.name for t in runner.rt.schedule.templates_for_stage(3)], ["Slime"])
+        with mock.patch.object(template_cache, "CHECK_INTERVAL", 0):
+            async_to_sync(runner.refresh_schedule)()
+        self.assertEqual([t.name for t in runner.rt.schedule.templates_for_stage(3)], ["Slime", "Orc"])
+
+
+class BallTableTests(SimpleTestCase):
+
+    def setUp(self):
+        self.table = template_cache.BallTable([
+            {"id": 1, "color": "red", "weight": 1},
+            {"id": 2, "color": "blue", "weight": 0},
+            {"id": 3, "color": "green", "weight": 3},
+            {"id": 4, "color": "gold", "weight": 6},
+        ])
+
+    def test_pick_follows_weights(self):
+        # 같은 시드 => 같은 결과, 누적 가중치 구간 그대로
+        draws = [self.table.pick(random.Random(7)) for _ in range(3)]
+        self.assertEqual(len({t["id"] for t in draws}), 1)
+        rng, check = random.Random(11), random.Random(11)
+        for _ in range(200):
+            r = check.random() * 10
+            expected = 1 if r < 1 else 3 if r < 4 else 4
+            self.assertEqual(self.table.pick(rng)["id"], expected)
+
+        rng = random.Random(3)
+        counts = dict.fromkeys((1, 2, 3, 4), 0)
+        n = 20000
+        for _ in range(n):
+            counts[self.table.pick(rng)["id"]] += 1
+        self.assertEqual(counts[2], 0)  # weight 0 은 안 뽑힘
+        for tid, weight in ((1, 1), (3, 3), (4, 6)):
+            self.assertAlmostEqual(counts[tid] / n, weight / 10, delta=0.015)
+
+    def test_empty_table(self):
+        table = template_cache.BallTable([{"id": 1, "weight": 0}])
+        self.assertEqual(len(table), 0)
+        self.assertIsNone(table.pick(random.Random(1)))
+
+
+class TemplateCacheTests(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        BallTemplate.objects.create(color="red", rarity="common", weight=1)
+        template_cache.invalidate()
+
+    def test_version_key_invalidates_other_processes(self):
+        table = template_cache.get_ball_table()
+        self.assertEqual(len(table), 1)
+        self.assertIs(template_cache.cached_ball_table(), table)
+
+        # 다른 프로세스에서 바뀜 (이 프로세스 signal 없음)
+        BallTemplate.objects.bulk_create([BallTemplate(color="blue", rarity="rare", weight=2)])
+        with mock.patch.object(template_cache, "CHECK_INTERVAL", 0):
+            # 버전이 그대로면 재확인해도 캐시 유지
+            self.assertIs(template_cache.get_ball_table(), table)
+            self.assertIsNone(template_cache.cached_ball_table())
+            self.r.incr(template_cache.VERSION_KEY)
+            fresh = template_cache.get_ball_table()
+        self.assertIsNot(fresh, table)
+        self.assertEqual([t["color"] for t in fresh.templates], ["red", "blue"])
+        # 재확인 주기 안에서는 Redis 도 안 봄
+        self.r.incr(template_cache.VERSION_KEY)
+        self.assertIs(template_cache.get_ball_table(), fresh)
+
+    def test_local_save_invalidates(self):
+        table = template_cache.get_ball_table()
+        BallTemplate.objects.create(color="blue", rarity="rare", weight=2)
+        self.assertEqual(len(template_cache.get_ball_table()), 2)
+        self.assertIsNot(template_cache.get_ball_table(), table)
+
+
+class SpawnEnemyViewTests(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user = get_user_model().objects.create_user("player", password="pw")
+        self.api = APIClient()
+        self.api.force_authenticate(user)
+        EnemyTemplate.objects.create(name="Slime", enemy_type="normal", hp=10, defense=1,
+                                     stage_min=1, stage_max=5)
+        EnemyTemplate.objects.create(name="King", enemy_type="boss", hp=300, defense=5, shield=20,
+                                     stage_min=3, stage_max=5)
+        template_cache.invalidate()
+        res = self.api.post("/api/game/start_game_session/", {"user_id": user.id}, format="json")
+        self.sid = res.data["session_id"]
+
+    def post(self, name, **body):
+        return self.api.post(f"/api/game/{name}/", {"session_id": self.sid, **body}, format="json")
+
+    def test_spawned_enemies_run_in_simulation(self):
+        self.assertEqual(self.post("spawn_enemy", stage=3).status_code, 201)
+        self.assertEqual(self.post("spawn_enemy", stage=1).status_code, 201)
+
+        st = session_store.load_state(self.r, self.sid)
+        self.assertEqual([e["name"] for e in st["enemies"]], ["Slime", "King", "Slime"])
+        self.assertTrue(all(e["dist"] == 0.0 and 5 <= e["speed"] <= 8 for e in st["enemies"]))
+        self.assertEqual(st["enemies"][1]["speed"], 8.0)
+        # id 는 enemy_pool 에서 => 소유자가 로드 후 이어서 소환해도 겹치지 않음
+        self.assertEqual(len(st["enemy_pool"]["gens"]), 3)
+        rt = simulation.SimRuntime()
+        self.assertNotIn(simulation.spawn_enemy(st, rt)["id"], [e["id"] for e in st["enemies"][:3]])
+        self.assert_runnable(st)
+
+    def test_rest_writes_touch_ttl_and_index(self):
+        k = session_store.keys(self.sid)
+        for key in k:
+            self.r.persist(key)
+        self.r.zadd(session_store.ACTIVE_INDEX, {str(self.sid): 0})
+
+        self.assertEqual(self.post("spawn_enemy", stage=1).status_code, 201)
+        for key in (k.meta, k.upgrades, k.enemies):
+            self.assertGreater(self.r.ttl(key), 0)
+        self.assertGreater(self.r.zscore(session_store.ACTIVE_INDEX, str(self.sid)), 0)
+
+    def test_expired_session_is_refused(self):
+        k = session_store.keys(self.sid)
+        self.r.delete(*k)
+        self.assertEqual(self.post("spawn_enemy", stage=1).status_code, 400)
+        self.assertEqual(self.post("upgrade_color", color="red").status_code, 400)
+        # TTL 없는 키를 다시 만들지 않음
+        self.assertEqual(self.r.exists(*k), 0)
+
+    def test_forwarded_to_owner_while_owned(self):
+        self.r.set(lease_key(self.sid), "other-host:1")
+        enemies_key = session_store.keys(self.sid).enemies
+        before = self.r.get(enemies_key)
+        ack = {"message": "Stage 3 적 소환", "ack": "spawn_enemy", "enemies": ["Slime", "King"]}
+
+        with mock.patch("game.views.ask_owner", mock.AsyncMock(return_value=ack)) as ask:
+            res = self.post("spawn_enemy", stage=3)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.data, ack)
+        ask.assert_awaited_once_with(self.sid, {"action": "spawn_enemy", "stage": 3})
+        # Redis 는 소유자 체크포인트만 씀
+        self.assertEqual(self.r.get(enemies_key), before)
+        self.assertEqual(self.post("attack").status_code, 409)
+
+        # 소유자 쪽: 넘겨받은 액션을 명령으로 적용
+        kind, args = parse_command({"action": "spawn_enemy", "stage": 3})
+        st = session_store.load_state(self.r, self.sid)
+        rt = simulation.SimRuntime(schedule=waves.current_schedule())
+        msg = simulation.apply_command(st, rt, Command(kind, args))
+        self.assertEqual(msg["enemies"], ["Slime", "King"])
+        self.assert_runnable(st)
+
+
+class SpatialGridTests(SimpleTestCase):
+
+    @staticmethod
+    def brute_nearest(x, y, radius, items, xs, ys):
+        best, best_dist = None, radius
+        for i, e in enumerate(items):
+            if e["is_dead"]:
+                continue
+            dist = ((xs[i] - x)**2 + (ys[i] - y)**2)**0.5
+            if dist < best_dist:
+                best, best_dist = i, dist
+        return best
+
+    def test_matches_brute_force(self):
+        rng = random.Random(4)
+        radius = simulation.ATTACK_RANGE
+        grid = SpatialGrid(radius)
+        for _ in range(50):
+            n = rng.randint(0, 60)
+            items = [{"is_dead": rng.random() < 0.2} for _ in range(n)]
+            # 정수 좌표 => 같은 거리(동률)도 자주 나옴
+            xs = [float(rng.randint(-10, 410)) for _ in range(n)]
+            ys = [float(rng.randint(-10, 410)) for _ in range(n)]
+            grid.rebuild(items, xs, ys)
+            # rebuild 뒤에 죽은 적도 건너뛰어야 함
+            for e in rng.sample(items, n // 10):
+                e["is_dead"] = True
+            for _ in range(40):
+                x, y = rng.uniform(0, 400), rng.uniform(0, 400)
+                self.assertEqual(grid.nearest(x, y, radius, items),
+                                 self.brute_nearest(x, y, radius, items, xs, ys))
+
+    def test_range_boundary_is_exclusive(self):
+        radius = simulation.ATTACK_RANGE
+        grid = SpatialGrid(radius)
+        items = [{"is_dead": False}, {"is_dead": False}]
+        xs, ys = [200.0 + radius, 200.0], [200.0, 200.0 - radius + 0.5]
+        grid.rebuild(items, xs, ys)
+        # 정확히 사거리 거리는 밖, 0.5 안쪽은 안
+        self.assertEqual(grid.nearest(200.0, 200.0, radius, items), 1)
+        items[1]["is_dead"] = True
+        self.assertIsNone(grid.nearest(200.0, 200.0, radius, items))
+
+    def test_tie_prefers_lower_index(self):
+        grid = SpatialGrid(simulation.ATTACK_RANGE)
+        items = [{"is_dead": False} for _ in range(3)]
+        xs, ys = [250.0, 150.0, 200.0], [200.0, 200.0, 250.0]
+        grid.rebuild(items, xs, ys)
+        self.assertEqual(grid.nearest(200.0, 200.0, simulation.ATTACK_RANGE, items), 0)
+
+
+def make_battle(n_enemies=300, n_balls=40, seed=5):
+    """
+    경로 위 적 + 맵 곳곳의 볼 (백엔드 비교/오프로드 테스트용)
+    """
+    rng = random.Random(seed)
+    st = simulation.new_state()
+    rt = simulation.SimRuntime()
+    for _ in range(n_enemies):
+        e = simulation.spawn_enemy(st, rt)
+        e["dist"] = rng.uniform(0, 1400)
+        e["hp"] = rng.randint(5, 60)
+        e["shield"] = rng.randint(0, 10)
+    colors = list(simulation.COLORS)
+    for _ in range(n_balls):
+        b = simulation.add_ball(st, rt, rng.choice(colors), "common", damage=rng.randint(3, 9))
+        b["x"] = b["target_x"] = rng.uniform(0, 400)
+        b["y"] = b["target_y"] = rng.uniform(0, 400)
+    st["color_upgrades"]["red"] = 2
+    return st
+
+
+@skipUnless(NUMPY_AVAILABLE, "numpy 필요")
+class NumpyBackendTests(SimpleTestCase):
+
+    def run_combat(self, st, use_numpy, ticks):
+        rt = simulation.SimRuntime()
+        if use_numpy:
+            rt.world = NumpyWorld(st, simulation.BALL_SPEED, simulation.ATTACK_RANGE)
+        for _ in range(ticks):
+            rt.tick += 1
+            simulation.combat(st, simulation.TICK, rt)
+        simulation.sync(st, rt)
+        return st
+
+    def test_parity_with_dict_backend(self):
+        base = make_battle()
+        plain = self.run_combat(copy.deepcopy(base), False, 60)
+        fast = self.run_combat(copy.deepcopy(base), True, 60)
+        self.assertTrue(any(e["is_dead"] for e in plain["enemies"]))
+        for a, b in zip(plain["enemies"], fast["enemies"]):
+            self.assertEqual(a["id"], b["id"])
+            self.assertAlmostEqual(a["dist"], b["dist"], places=6)
+            self.assertEqual((a["hp"], a["shield"], a["is_dead"]), (b["hp"], b["shield"], b["is_dead"]))
+        for a, b in zip(plain["balls"], fast["balls"]):
+            self.assertAlmostEqual(a["x"], b["x"], places=6)
+            self.assertAlmostEqual(a["cooldown"], b["cooldown"], places=6)
+
+    def test_select_backend_hysteresis(self):
+        n = NUMPY_MIN_ENTITIES
+        self.assertFalse(select_backend(n - 1, False))
+        self.assertTrue(select_backend(n, False))
+        # 켜진 뒤에는 절반까지 유지
+        self.assertTrue(select_backend(n - 1, True))
+        self.assertTrue(select_backend(n // 2, True))
+        self.assertFalse(select_backend(n // 2 - 1, True))
+
+    def test_update_backend_switches_and_exports(self):
+        st = make_battle(n_enemies=NUMPY_MIN_ENTITIES, n_balls=1)
+        rt = simulation.SimRuntime()
+        simulation.update_backend(st, rt)
+        self.assertIsNotNone(rt.world)
+        rt.world.edead[: NUMPY_MIN_ENTITIES // 2 + 1] = True
+        rt.world.compact(st["enemy_pool"])
+        simulation.update_backend(st, rt)
+        self.assertIsNone(rt.world)
+        self.assertEqual(len(st["enemies"]), NUMPY_MIN_ENTITIES // 2 - 1)
+
+    def test_compact_returns_ids_to_pool(self):
+        st = make_battle(n_enemies=10, n_balls=0)
+        world = NumpyWorld(st, simulation.BALL_SPEED, simulation.ATTACK_RANGE)
+        dead = [st["enemies"][i]["id"] for i in (2, 5)]
+        world.edead[[2, 5]] = True
+        self.assertEqual(world.compact(st["enemy_pool"]), dead)
+        self.assertEqual(world.enemy_count, 8)
+        self.assertEqual(sorted(st["enemy_pool"]["free"]), [2, 5])
+        # 반납된 슬롯은 세대가 올라가서 재사용
+        reused = alloc_id(st["enemy_pool"])
+        self.assertIn(reused & SLOT_MASK, (2, 5))
+        self.assertNotIn(reused, dead)
+
+
+def frame_payload(frame, enemies, balls=(), upgrades=None):
+    return {
+        "kind": "tick_update", "frame": frame, "tick": frame, "stage": 1,
+        "enemies": [dict(e) for e in enemies], "balls": [dict(b) for b in balls],
+        "upgrades": upgrades or {"red": 0},
+    }
+
+
+class DeltaEncoderTests(SimpleTestCase):
+
+    def test_delta_against_last_acked_frame(self):
+        enc = DeltaEncoder(keyframe_interval=100)
+        e1 = {"id": 1, "dist": 10.0, "hp": 10}
+        e2 = {"id": 2, "dist": 20.0, "hp": 10}
+        first = enc.encode(frame_payload(1, [e1, e2]))
+        self.assertTrue(first["keyframe"])  # ack 전
+
+        enc.ack(1)
+        out = enc.encode(frame_payload(2, [{**e1, "dist": 11.0}, {"id": 3, "dist": 0.0, "hp": 5}]))
+        self.assertFalse(out["keyframe"])
+        self.assertEqual(out["base"], 1)
+        self.assertEqual(out["enemies"]["set"], [{"dist": 11.0, "id": 1}, {"id": 3, "dist": 0.0, "hp": 5}])
+        self.assertEqual(out["enemies"]["del"], [2])
+        self.assertNotIn("upgrades", out)
+
+        # 프레임 2 를 ack 안 했으면 base 는 여전히 1 (2의 변경분도 다시 포함)
+        out = enc.encode(frame_payload(3, [{**e1, "dist": 12.0}], upgrades={"red": 1}))
+        self.assertEqual(out["base"], 1)
+        self.assertEqual(out["enemies"]["set"], [{"dist": 12.0, "id": 1}])
+        self.assertEqual(out["enemies"]["del"], [2])
+        self.assertEqual(out["upgrades"], {"red": 1})
+
+    def test_resync_forces_keyframe(self):
+        enc = DeltaEncoder(keyframe_interval=100)
+        enc.encode(frame_payload(1, []))
+        enc.ack(1)
+        self.assertFalse(enc.encode(frame_payload(2, []))["keyframe"])
+        enc.request_keyframe()
+        self.assertTrue(enc.encode(frame_payload(3, []))["keyframe"])
+        self.assertFalse(enc.encode(frame_payload(4, []))["keyframe"])
+
+    def test_keyframe_when_ack_is_lost(self):
+        enc = DeltaEncoder(keyframe_interval=1000)
+        enc.encode(frame_payload(1, []))
+        enc.ack(1)
+        # 모르는 프레임 ack 는 무시
+        enc.ack(999)
+        self.assertEqual(enc.acked, 1)
+        # ack 가 오래 안 와서 base 프레임이 history 에서 밀려남 => keyframe
+        outs = [enc.encode(frame_payload(f, [])) for f in range(2, FRAME_HISTORY + 3)]
+        self.assertFalse(outs[0]["keyframe"])
+        self.assertTrue(outs[-1]["keyframe"])
+
+    def test_keyframe_interval(self):
+        enc = DeltaEncoder(keyframe_interval=3)
+        kinds = []
+        for f in range(1, 10):
+            kinds.append(enc.encode(frame_payload(f, []))["keyframe"])
+            enc.ack(f)
+        self.assertEqual(kinds, [True, False, False, False, True, False, False, False, True])
+
+
+class CodecTests(SimpleTestCase):
+
+    def test_msgpack_quantization_round_trip(self):
+        payload = frame_payload(7, [{"id": 1, "name": "Slime", "hp": 10, "dist": 123.456,
+                                      "x": 20.0, "y": 143.456}],
+                                balls=[{"id": 2, "x": 200.04, "y": 199.96, "target_x": 250.0,
+                                        "target_y": 200.0, "damage": 5}])
+        payload["effects"] = [{"x1": 1.23, "y1": 4.56, "x2": 7.89, "y2": 0.0, "tick": 7}]
+        codec = MsgpackCodec()
+        data = codec.encode(payload)
+        self.assertIsInstance(data, bytes)
+        got = codec.decode(data)
+
+        def check(a, b):
+            if isinstance(a, dict):
+                for k, v in a.items():
+                    if k in COORD_KEYS:
+                        self.assertIsInstance(b[k], int)
+                        self.assertAlmostEqual(b[k] / COORD_SCALE, v, delta=0.5 / COORD_SCALE)
+                    else:
+                        check(v, b[k])
+            elif isinstance(a, list):
+                for x, y in zip(a, b):
+                    check(x, y)
+            else:
+                self.assertEqual(a, b)
+        check(payload, got)
+        self.assertEqual(codec.stats.frames_out, 1)
+
+    def test_negotiate(self):
+        codec, sub = negotiate({"subprotocols": ["dotgame.msgpack"]})
+        self.assertEqual((codec.name, sub), ("msgpack", "dotgame.msgpack"))
+        codec, sub = negotiate({"query_string": b"encoding=msgpack"})
+        self.assertEqual((codec.name, sub), ("msgpack", None))
+        self.assertIsInstance(negotiate({})[0], JsonCodec)
+
+
+class EntityIdTests(SimpleTestCase):
+
+    def test_free_list_reuses_slot_with_new_generation(self):
+        pool = new_pool()
+        ids = [alloc_id(pool) for _ in range(3)]
+        self.assertEqual(ids, [0, 1, 2])
+
+        release_id(pool, ids[1])
+        reused = alloc_id(pool)
+        self.assertEqual(reused & SLOT_MASK, 1)
+        self.assertEqual(reused >> SLOT_BITS, 1)
+        self.assertNotEqual(reused, ids[1])
+        # free list 가 비면 새 슬롯
+        self.assertEqual(alloc_id(pool), 3)
+
+    def test_stale_id_never_matches_reused_id(self):
+        pool = new_pool()
+        stale = eid = alloc_id(pool)
+        seen = {stale}
+        for _ in range(5):
+            release_id(pool, eid)
+            eid = alloc_id(pool)
+            self.assertEqual(eid & SLOT_MASK, 0)
+            self.assertNotIn(eid, seen)
+            seen.add(eid)
+
+        # 예전 id 반납은 무시 => 지금 살아 있는 id 의 슬롯이 free list 로 가지 않음
+        release_id(pool, stale)
+        release_id(pool, stale)
+        self.assertEqual(pool["free"], [])
+        self.assertEqual(alloc_id(pool) & SLOT_MASK, 1)
+
+    def test_compact_returns_dead_ids(self):
+        pool = new_pool()
+        st = {"enemy_pool": pool,
+              "enemies": [{"id": alloc_id(pool), "is_dead": i % 2 == 1} for i in range(4)]}
+        self.assertEqual(compact_enemies(st), [1, 3])
+        self.assertEqual([e["id"] for e in st["enemies"]], [0, 2])
+        self.assertEqual(sorted(pool["free"]), [1, 3])
+
+
+class CommandQueueTests(SimpleTestCase):
+
+    def test_bound_and_drop(self):
+        q = CommandQueue(maxlen=3)
+        pushed = [q.push(Command("upgrade_color", (c,))) for c in ("red", "blue", "green", "red", "blue")]
+        self.assertEqual(pushed, [True, True, True, False, False])
+        self.assertEqual((len(q), q.rejected), (3, 2))
+        self.assertEqual([c.args for c in q.drain(limit=2)], [("red",), ("blue",)])
+        # 빈 자리가 생기면 다시 받음
+        self.assertTrue(q.push(Command("upgrade_color", ("red",))))
+        self.assertEqual([c.args for c in q.drain()], [("green",), ("red",)])
+        self.assertEqual(q.drain(), [])
+
+    def test_parse_rejects_malformed(self):
+        bad = [
+            ({"action": "move_ball", "ball_idx": "0"}, "invalid ball idx"),
+            ({"action": "move_ball", "ball_idx": True}, "invalid ball idx"),
+            ({"action": "move_ball", "ball_idx": 0, "tx": "abc"}, "invalid coordinate"),
+            ({"action": "move_ball", "ball_idx": 0, "tx": float("nan")}, "invalid coordinate"),
+            ({"action": "move_ball", "ball_idx": 0, "ty": float("inf")}, "invalid coordinate"),
+            ({"action": "move_ball", "ball_idx": 0, "ty": None}, "invalid coordinate"),
+            ({"action": "upgrade_color", "color": "pink"}, "invalid color"),
+            ({"action": "upgrade_color", "color": ["red"]}, "invalid color"),
+            ({"action": "spawn_enemy", "stage": 0}, "invalid stage"),
+            ({"action": "spawn_enemy", "stage": "3"}, "invalid stage"),
+            ({"action": "spawn_enemy", "stage": False}, "invalid stage"),
+            ({"action": "summon_ball"}, "unknown action"),
+            ({}, "unknown action"),
+        ]
+        for content, error in bad:
+            with self.assertRaisesMessage(CommandError, error):
+                parse_command(content)
+
+        # 좌표는 맵 안으로 clamp
+        self.assertEqual(parse_command({"action": "move_ball", "ball_idx": 1, "tx": -5, "ty": 1e9}),
+                         ("move_ball", (1, 0.0, float(MAP_HEIGHT))))
+
+    def test_applied_in_order_at_next_tick(self):
+        st = simulation.new_state()
+        rt = simulation.SimRuntime()
+        # 소환 전 이동 => 실패, 소환 후 이동 => 성공 (도착 순서 그대로)
+        move = parse_command({"action": "move_ball", "ball_idx": 0})
+        self.assertTrue(simulation.queue_command(rt, *move, reply=1))
+        self.assertTrue(simulation.queue_command(rt, "summon_ball", ("red", "common", 5), reply=2))
+        self.assertTrue(simulation.queue_command(
+            rt, *parse_command({"action": "move_ball", "ball_idx": 0, "tx": 300, "ty": 250}), reply=3))
+        self.assertTrue(simulation.queue_command(rt, *parse_command({"action": "upgrade_color"}), reply=4))
+        self.assertTrue(simulation.queue_command(rt, *parse_command({"action": "upgrade_color"}), reply=5))
+
+        # 큐에 넣기만 하고 적용은 step 에서
+        self.assertEqual(st["balls"], [])
+        self.assertEqual(rt.results, [])
+        simulation.step(st, rt=rt)
+
+        replies = [reply for reply, _ in rt.results]
+        msgs = [msg for _, msg in rt.results]
+        self.assertEqual(replies, [1, 2, 3, 4, 5])
+        self.assertEqual(msgs[0], {"error": "invalid ball idx"})
+        self.assertEqual(msgs[1]["ack"], "summon_ball")
+        self.assertEqual((msgs[2]["tx"], msgs[2]["ty"]), (300.0, 250.0))
+        self.assertEqual([m["level"] for m in msgs[3:]], [1, 2])
+        self.assertEqual((st["balls"][0]["target_x"], st["balls"][0]["target_y"]), (300.0, 250.0))
+        self.assertEqual(len(rt.commands), 0)
+
+    def test_per_tick_limit(self):
+        st = simulation.new_state()
+        rt = simulation.SimRuntime()
+        n = MAX_PER_TICK + 4
+        for _ in range(n):
+            simulation.queue_command(rt, "upgrade_color", ("red",))
+        simulation.step(st, rt=rt)
+        self.assertEqual(st["color_upgrades"]["red"], MAX_PER_TICK)
+        simulation.step(st, rt=rt)
+        self.assertEqual(st["color_upgrades"]["red"], n)
+
+
+def culling_payload(n=400, seed=3):
+    rng = random.Random(seed)
+    enemies = []
+    for i in range(n):
+        dist = rng.uniform(0, TOTAL_LENGTH)
+        x, y = position_at(dist)
+        enemies.append({"id": i + 1, "dist": dist, "x": x, "y": y, "hp": 10})
+    return {
+        "kind": "tick_update", "frame": 1, "time_in_stage": 0.5, "enemies": enemies,
+        "effects": [
+            {"x1": 200, "y1": 200, "x2": 20, "y2": 30},     # 화면 쪽으로 걸침
+            {"x1": 300, "y1": 300, "x2": 380, "y2": 380},   # 화면 밖
+        ],
+        "balls": [{"id": 9000, "x": 200, "y": 200}], "killed": [], "upgrades": {},
+    }
+
+
+class InterestCullTests(SimpleTestCase):
+
+    def test_visible_and_offscreen_counts(self):
+        payload = culling_payload()
+        original = copy.deepcopy(payload)
+        vp = interest.parse_viewport({"x": 0, "y": 0, "w": 60, "h": 60})
+        self.assertEqual(vp[:4], (0.0, 0.0, 60 + interest.MARGIN, 60 + interest.MARGIN))
+        out = interest.cull(payload, vp)
+
+        inside = [e for e in payload["enemies"] if vp.contains(e["x"], e["y"])]
+        self.assertLess(len(inside), vp.enemy_limit)
+        self.assertEqual(out["enemies"], inside)
+        expected = [0] * len(SEGMENT_LENGTHS)
+        for e in payload["enemies"]:
+            if not vp.contains(e["x"], e["y"]):
+                expected[segment_at(e["dist"])] += 1
+        self.assertEqual(out["offscreen"], expected)
+        self.assertEqual(out["effects"], payload["effects"][:1])
+        self.assertEqual(out["balls"], payload["balls"])
+        # 원본 payload 는 다른 연결도 쓰므로 그대로
+        self.assertEqual(payload, original)
+
+        # 공유 프레임 인덱스로도 같은 결과
+        index = interest.frame_index((1, 1, 0.5), payload)
+        self.assertIs(interest.frame_index((1, 1, 0.5), payload), index)
+        self.assertEqual(interest.cull(payload, vp, index), out)
+
+    def test_zoom_thins_by_id(self):
+        payload = culling_payload()
+        n = len(payload["enemies"])
+        full = {"x": 0, "y": 0, "w": 400, "h": 400}
+        with mock.patch.object(interest, "MAX_ENEMIES", 40):
+            near = interest.cull(payload, interest.parse_viewport(full))
+            far = interest.cull(payload, interest.parse_viewport({**full, "zoom": 0.25}))
+            # 조금 움직인 다음 프레임에도 같은 적이 남음
+            for e in payload["enemies"]:
+                e["dist"] = (e["dist"] + 0.5) % TOTAL_LENGTH
+                e["x"], e["y"] = position_at(e["dist"])
+            far_next = interest.cull(payload, interest.parse_viewport({**full, "zoom": 0.25}))
+
+        self.assertEqual(len(near["enemies"]), 40)
+        self.assertEqual(len(far["enemies"]), 10)
+        stride = -(-n // 10)
+        self.assertTrue(all(e["id"] % stride == 0 for e in far["enemies"]))
+        self.assertEqual([e["id"] for e in far_next["enemies"]], [e["id"] for e in far["enemies"]])
+        # 솎아낸 적은 offscreen 개수로
+        for out in (near, far):
+            self.assertEqual(sum(out["offscreen"]) + len(out["enemies"]), n)
+
+    def test_no_culling_without_size(self):
+        self.assertIsNone(interest.parse_viewport({"x": 10, "y": 10}))
+        self.assertIsNone(interest.parse_viewport({"x": 10, "y": 10, "w": 100}))
+        self.assertIsNone(interest.parse_viewport({"x": 10, "y": 10, "w": 0, "h": 100}))
+        with self.assertRaises(interest.ViewportError):
+            interest.parse_viewport({"x": "a", "y": 10, "w": 100, "h": 100})
+        with self.assertRaises(interest.ViewportError):
+            interest.parse_viewport({"x": 0, "y": 0, "w": float("nan"), "h": 100})
+
+        consumer = GameConsumer()
+        consumer.session_id = 1
+        consumer.delta = None
+        consumer.send_json = mock.AsyncMock()
+        payload = culling_payload()
+
+        async_to_sync(consumer.receive_json)({"action": "viewport", "x": 0, "y": 0, "w": 60, "h": 60})
+        async_to_sync(consumer.send_state)({"payload": payload})
+        self.assertIn("offscreen", consumer.send_json.await_args.args[0])
+
+        # w/h 없는 viewport => 컬링 끔, 전체 payload
+        async_to_sync(consumer.receive_json)({"action": "viewport", "x": 0, "y": 0})
+        async_to_sync(consumer.send_state)({"payload": payload})
+        self.assertIs(consumer.send_json.await_args.args[0], payload)
+
+
+class EffectRingTests(SimpleTestCase):
+
+    def test_push_and_drain(self):
+        ring = EffectRing(size=8)
+        ring.push(1, 0, 0, 10, 10)
+        ring.push(2, 5, 5, 15, 15)
+        self.assertEqual(len(ring), 2)
+        out = ring.drain(now=2, max_age=10)
+        self.assertEqual([(fx["tick"], fx["x1"], fx["x2"]) for fx in out], [(1, 0, 10), (2, 5, 15)])
+        self.assertEqual(len(ring), 0)
+        self.assertEqual(ring.drain(now=3, max_age=10), [])
+
+        # duration 이 지난 이벤트는 보내지 않음
+        ring.push(3, 0, 0, 1, 1)
+        ring.push(9, 0, 0, 2, 2)
+        self.assertEqual([fx["tick"] for fx in ring.drain(now=12, max_age=5)], [9])
+
+    def test_wraparound_keeps_newest(self):
+        ring = EffectRing(size=4)
+        for tick in range(1, 7):
+            ring.push(tick, tick, 0, 0, 0)
+        self.assertEqual(len(ring), 4)
+        self.assertEqual([fx["tick"] for fx in ring.drain(now=6, max_age=100)], [3, 4, 5, 6])
+        self.assertEqual(ring.dropped, 2)
+
+        # 버퍼 경계를 넘어 다시 채워도 순서 유지
+        for tick in range(7, 10):
+            ring.push(tick, tick, 0, 0, 0)
+        self.assertEqual([fx["x1"] for fx in ring.drain(now=9, max_age=100)], [7, 8, 9])
+        self.assertEqual(ring.dropped, 2)
+
+    def test_frame_sends_effects_once(self):
+        st = simulation.new_state()
+        rt = simulation.SimRuntime()
+        simulation.spawn_enemy(st, rt, waves.EnemySpec("Tank", "normal", 10**6, 0, 0))
+        ball = simulation.add_ball(st, rt, "red", "common")
+        ball.update(x=20, y=20, target_x=20, target_y=20)
+
+        simulation.step(st, rt=rt)
+        effects = simulation.build_frame(st, rt)["effects"]
+        self.assertEqual(len(effects), 1)
+        self.assertEqual(effects[0]["tick"], rt.tick)
+        self.assertEqual((effects[0]["x1"], effects[0]["y1"]), (20, 20))
+
+        # 쿨다운 중 (공격 없음) => 같은 이펙트를 다시 보내지 않음
+        simulation.step(st, rt=rt)
+        self.assertEqual(simulation.build_frame(st, rt)["effects"], [])
+        self.assertEqual(simulation.build_frame(st, rt)["effects"], [])
+
+
+class SnapshotTests(RedisTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user = get_user_model().objects.create_user("player", password="pw")
+        self.sid = GameSession.objects.create(user=user).id
+        self.st = simulation.new_state()
+        rt = simulation.SimRuntime()
+        simulation.add_ball(self.st, rt, "red", "common")
+        simulation.spawn_enemy(self.st, rt)
+        self.st["stage"] = 4
+
+    def test_write_round_trip_one_row_per_session(self):
+        raw = encode_snapshot(self.st)
+        self.assertEqual(write_batch({self.sid: (raw, 4, True)}), 1)
+        snap = SessionSnapshot.objects.get(session_id=self.sid)
+        self.assertEqual((snap.version, snap.stage), (1, 4))
+        self.assertEqual(json.loads(zlib.decompress(bytes(snap.data))), json.loads(raw))
+
+        restored = load_snapshot(self.sid)
+        for key in ("stage", "balls", "enemies", "enemy_pool", "next_id", "color_upgrades"):
+            self.assertEqual(restored[key], self.st[key])
+        self.assertEqual(restored["last_broadcast"], 0.0)
+
+        # 같은 세션은 bulk_update (행 추가 없음), GameSession 없는 세션은 건너뜀
+        self.st["stage"] = 5
+        written = write_batch({self.sid: (encode_snapshot(self.st), 5, True),
+                               self.sid + 1000: (encode_snapshot(self.st), 5, True)})
+        self.assertEqual(written, 1)
+        self.assertEqual(SessionSnapshot.objects.count(), 1)
+        snap.refresh_from_db()
+        self.assertEqual((snap.version, snap.stage), (2, 5))
+        self.assertEqual(load_snapshot(self.sid)["stage"], 5)
+
+        # 끝난 세션은 복구하지 않음
+        GameSession.objects.filter(id=self.sid).update(is_active=False)
+        self.assertIsNone(load_snapshot(self.sid))
+
+    def test_writer_keeps_latest_submit(self):
+        writer = SnapshotWriter()
+
+        async def run():
+            writer.submit(self.sid, self.st)
+            writer.submit(self.sid, {**self.st, "stage": 6})
+            self.assertEqual(len(writer.pending), 1)
+            writer.task.cancel()
+            await writer.flush()
+
+        async_to_sync(run)()
+        self.assertEqual(writer.written, 1)
+        self.assertEqual(load_snapshot(self.sid)["stage"], 6)
+
+    def test_become_owner_restores_snapshot(self):
+        write_batch({self.sid: (encode_snapshot(self.st), 4, True)})
+        self.assertIsNone(session_store.load_state(self.r, self.sid))
+
+        consumer = GameConsumer()
+        consumer.session_id = self.sid
+        consumer.channel_name = "test"
+        consumer.channel_layer = mock.Mock(group_send=mock.AsyncMock())
+
+        async def run():
+            await consumer.become_owner(fresh_connect=True)
+            await consumer.runner.stop(save=False)
+
+        with mock.patch("game.runner.get_scheduler"):
+            async_to_sync(run)()
+
+        # 스냅샷 상태로 시작하고 바로 Redis 체크포인트
+        st = session_store.load_state(self.r, self.sid)
+        self.assertEqual(st["stage"], 4)
+        self.assertEqual([b["id"] for b in st["balls"]], [b["id"] for b in self.st["balls"]])
+        self.assertEqual(len(st["enemies"]), 1)
+        self.assert_runnable(st)
+
+
+class HashRingTests(SimpleTestCase):
+    SESSIONS = range(1, 4001)
+
+    def placement(self, n):
+        ring = sim_workers.HashRing(n)
+        return {sid: ring.node_for(sid) for sid in self.SESSIONS}
+
+    def test_placement_is_stable(self):
+        placed = self.placement(4)
+        self.assertEqual(self.placement(4), placed)
+        self.assertEqual(sim_workers.channel_for(123, 4), sim_workers.worker_channel(placed[123]))
+        # 워커마다 대략 1/N
+        for w in range(4):
+            share = sum(1 for node in placed.values() if node == w) / len(placed)
+            self.assertAlmostEqual(share, 0.25, delta=0.08)
+
+    def test_resize_moves_about_one_nth(self):
+        four, five = self.placement(4), self.placement(5)
+        moved = [sid for sid in self.SESSIONS if four[sid] != five[sid]]
+        # 추가: 새 워커로 가는 세션만 이동
+        self.assertTrue(all(five[sid] == 4 for sid in moved))
+        self.assertAlmostEqual(len(moved) / len(four), 1 / 5, delta=0.07)
+        # 제거: 빠진 워커의 세션만 이동
+        self.assertEqual({sid for sid in self.SESSIONS if five[sid] == 4}, set(moved))
+
+
+class SimRelayTests(SimpleTestCase):
+
+    def setUp(self):
+        self.layer = mock.Mock(send=mock.AsyncMock())
+        patches = [
+            mock.patch.object(sim_workers, "get_channel_layer", return_value=self.layer),
+            mock.patch.object(sim_workers, "WORKER_COUNT", 4),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def sent(self):
+        return [(c.args[0], c.args[1]) for c in self.layer.send.await_args_list]
+
+    def test_join_leave_routing(self):
+        relay = sim_workers.SimRelay()
+        a1 = mock.Mock(session_id=11, channel_name="a1")
+        a2 = mock.Mock(session_id=11, channel_name="a2")
+        b = mock.Mock(session_id=12, channel_name="b")
+
+        async def run():
+            await relay.join(a1)
+            await relay.join(a2)
+            await relay.join(b)
+            await relay.send_action(a2, {"action": "upgrade_color", "color": "red"})
+            await relay.leave(a1)
+            await relay.leave(a2)
+            relay.task.cancel()
+
+        async_to_sync(run)()
+        ch11, ch12 = sim_workers.channel_for(11), sim_workers.channel_for(12)
+        sent = self.sent()
+        self.assertEqual([ch for ch, _ in sent], [ch11, ch11, ch12, ch11, ch11, ch11])
+        self.assertEqual([(m["type"], m.get("count"), m.get("fresh")) for _, m in sent], [
+            ("sim.join", 1, True), ("sim.join", 2, True), ("sim.join", 1, True),
+            ("sim.action", None, None),
+            ("sim.join", 1, False), ("sim.join", 0, False),
+        ])
+        self.assertEqual(sent[3][1]["reply_to"], "a2")
+        self.assertEqual(set(relay.members), {12})
+
+    def test_worker_closes_session_when_all_frontends_leave(self):
+        with mock.patch.object(sim_workers, "get_lease_manager"):
+            worker = sim_workers.SimWorker(0)
+
+        async def open_session(sid, frontend, fresh):
+            ws = worker.sessions[sid] = sim_workers.WorkerSession(worker, sid)
+            ws.frontends[frontend] = 0.0
+            return ws
+
+        async def close_session(ws):
+            worker.sessions.pop(ws.session_id)
+
+        worker.open_session = mock.AsyncMock(side_effect=open_session)
+        worker.close_session = mock.AsyncMock(side_effect=close_session)
+
+        def join(frontend, count):
+            return worker.on_join({"type": "sim.join", "session_id": 11, "frontend": frontend,
+                                   "count": count, "fresh": True})
+
+        async def run():
+            await join("A", 1)
+            await join("B", 2)
+            await join("A", 0)
+            self.assertEqual(set(worker.sessions[11].frontends), {"B"})
+            worker.close_session.assert_not_awaited()
+            await join("B", 0)
+
+        async_to_sync(run)()
+        worker.open_session.assert_awaited_once_with(11, "A", True)
+        worker.close_session.assert_awaited_once()
+        self.assertEqual(worker.sessions, {})
+
+
+class InlinePool:
+    """
+    프로세스 풀 대신: 인자/결과를 pickle 로 한 번 왕복시켜 같은 프로세스에서 실행
+    """
+
+    def submit(self, fn, *args):
+        fut = Future()
+        result = fn(*pickle.loads(pickle.dumps(args, protocol=5)))
+        fut.set_result(pickle.loads(pickle.dumps(result, protocol=5)))
+        return fut
+
+
+class CombatOffloadTests(SimpleTestCase):
+
+    def setUp(self):
+        patches = [
+            mock.patch.object(offload, "OFFLOAD_THRESHOLD", 0.03),
+            mock.patch.object(offload, "POOL_SIZE", 2),
+            mock.patch.object(offload, "NUMPY_AVAILABLE", True),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_ewma_switch_with_dwell(self):
+        c = offload.CombatOffload(1)
+        self.addCleanup(c.close)
+        # 임계값을 넘어도 MIN_DWELL_TICKS 전에는 그대로
+        for _ in range(offload.MIN_DWELL_TICKS - 1):
+            c.observe(0.1)
+        self.assertGreater(c.step_time, 0.03)
+        self.assertFalse(c.active)
+        c.observe(0.1)
+        self.assertTrue(c.active)
+        self.assertEqual(c.switches, 1)
+
+        # 임계값 아래여도 절반 위면 유지
+        for _ in range(100):
+            c.observe(0.02)
+        self.assertTrue(c.active)
+        self.assertLess(c.step_time, 0.03)
+
+        # 절반 아래 => 인라인 (EWMA_ALPHA=0.2 로 0.02 => 0.015 까지 2틱)
+        c.observe(0.0)
+        self.assertTrue(c.active)
+        c.observe(0.0)
+        self.assertFalse(c.active)
+        self.assertEqual(c.switches, 2)
+
+        # 방금 전환했으면 다시 넘어도 dwell 동안 인라인
+        for _ in range(offload.MIN_DWELL_TICKS - 1):
+            c.observe(0.1)
+        self.assertFalse(c.active)
+        c.observe(0.1)
+        self.assertTrue(c.active)
+
+    def test_no_switch_without_pool(self):
+        c = offload.CombatOffload(1)
+        with mock.patch.object(offload, "POOL_SIZE", 0):
+            for _ in range(100):
+                c.observe(1.0)
+        self.assertFalse(c.active)
+
+    @skipUnless(NUMPY_AVAILABLE, "numpy 필요")
+    def test_pool_step_matches_inline(self):
+        base = make_battle()
+        runs = []
+        for pooled in (False, True):
+            st = copy.deepcopy(base)
+            rt = simulation.SimRuntime()
+            rt.world = NumpyWorld(st, simulation.BALL_SPEED, simulation.ATTACK_RANGE)
+            c = offload.CombatOffload(1)
+            effects = []
+            for _ in range(60):
+                rt.tick += 1
+                if pooled:
+                    with mock.patch.object(offload, "get_pool", return_value=InlinePool()):
+                        async_to_sync(c.run)(st, simulation.TICK, rt)
+                else:
+                    simulation.combat(st, simulation.TICK, rt)
+                effects += rt.effects.drain(rt.tick, 10**9)
+            simulation.sync(st, rt)
+            runs.append((st, effects, c))
+
+        (inline, inline_fx, _), (pooled, pooled_fx, c) = runs
+        self.assertEqual(c.offloaded, 60)
+        self.assertTrue(any(e["is_dead"] for e in inline["enemies"]))
+        self.assertEqual(inline["enemies"], pooled["enemies"])
+        self.assertEqual(inline["balls"], pooled["balls"])
+        self.assertTrue(inline_fx)
+        self.assertEqual(inline_fx, pooled_fx)
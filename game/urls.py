@@ -7,6 +7,7 @@ from .views import (
     SpawnEnemyView,
     UpgradeColorView,
     AttackView,
+    TickProfileView,
 )
 
 urlpatterns = [
@@ -16,4 +17,5 @@ urlpatterns = [
     path('spawn_enemy/', SpawnEnemyView.as_view(), name='spawn_enemy'),
     path('upgrade_color/', UpgradeColorView.as_view(), name='upgrade_color'),
     path('attack/', AttackView.as_view(), name='attack'),
+    path('profile/<int:session_id>/', TickProfileView.as_view(), name='tick_profile'),
 ]
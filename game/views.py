@@ -1,18 +1,41 @@
 # game/views.py
 import json
-import random
+import os
+from asgiref.sync import async_to_sync
+from django.http import FileResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
-from .models import GameSession, BallTemplate, EnemyTemplate
+from .models import GameSession
 from .redis_manager import get_redis
+from . import template_cache, waves, session_store
+from .simulation import new_state, enemy_fields
+from .redis_scripts import session_scripts, SessionStateError
+from .forwarding import ask_owner, OwnerUnavailable
+from .ownership import LEASE_TTL
+from .profiling import (
+    profile_request_key, profile_result_key, profile_stats_key, MAX_CAPTURE_SECONDS,
+)
+
+
+def forward_to_owner(session_id, content, ok_status):
+    """
+    소유자(WebSocket lease)가 돌리고 있는 세션: Redis 를 직접 고치면 다음 체크포인트에 덮어써지므로
+    액션을 소유자 입력 큐로 넘기고 그 응답을 그대로 돌려준다 (game/forwarding.py)
+    """
+    try:
+        payload = async_to_sync(ask_owner)(session_id, content)
+    except OwnerUnavailable:
+        return Response({"error":"session owner not responding", "retry_after": LEASE_TTL}, status=503)
+    if "error" in payload:
+        return Response(payload, status=503 if "retry_after" in payload else 400)
+    return Response(payload, status=ok_status)
 
 
 class StartGameSessionView(APIView):
@@ -31,12 +54,9 @@ class StartGameSessionView(APIView):
         session_id = session.id
 
         r = get_redis()
-        r.set(f"session:{session_id}:balls", json.dumps([]))
-        r.set(f"session:{session_id}:enemies", json.dumps([]))
-        r.set(f"session:{session_id}:color_upgrades", json.dumps({
-            "red":0,"orange":0,"yellow":0,"green":0,"blue":0,"navy":0,"purple":0
-        }))
-        r.set(f"session:{session_id}:info", json.dumps({"stage":1,"user_id":user_id}))
+        pipe = r.pipeline(transaction=False)
+        session_store.queue_new_session(pipe, session_id, new_state(), user_id=user_id)
+        pipe.execute()
 
         return Response({
             "message": "게임 세션 시작",
@@ -48,7 +68,7 @@ class EndGameSessionView(APIView):
     """
     POST /api/game/end_game_session/
     body: { "session_id":... }
-    => Redis: session:{session_id}:* 삭제
+    => Redis: session:{session_id}:* 삭제 (예전 형식 키 포함)
     => RDB: session.is_active=False
     """
     permission_classes = [IsAuthenticated]
@@ -60,10 +80,9 @@ class EndGameSessionView(APIView):
         session.save()
 
         r = get_redis()
-        r.delete(f"session:{session_id}:balls")
-        r.delete(f"session:{session_id}:enemies")
-        r.delete(f"session:{session_id}:color_upgrades")
-        r.delete(f"session:{session_id}:info")
+        pipe = r.pipeline(transaction=False)
+        session_store.queue_delete(pipe, session_id)
+        pipe.execute()
 
         return Response({"message": f"세션 {session_id} 종료. Redis data cleared."}, status=200)
 
@@ -72,7 +91,8 @@ class SummonBallView(APIView):
     """
     POST /api/game/summon_ball/
     body: { "session_id":3 }
-    => DB BallTemplate(가중치pick) -> Redis balls append
+    => DB BallTemplate(가중치pick) -> Redis balls HSET (필드 = 새 ball id)
+    => 소유자가 돌리는 세션이면 소유자에게 summon_ball 로 넘김
     """
     permission_classes = [IsAuthenticated]
 
@@ -82,47 +102,34 @@ class SummonBallView(APIView):
         if not session.is_active:
             return Response({"detail":"session not active"}, status=400)
 
-        # 1) 템플릿 전부 가져오기
-        templates = BallTemplate.objects.all()
-        if not templates.exists():
+        # 캐시된 누적 가중치 테이블에서 bisect로 pick (쿼리 없음)
+        chosen = template_cache.get_ball_table().pick()
+        if chosen is None:
             return Response({"error":"No BallTemplate in DB"}, status=400)
 
-        # 2) weight 합
-        total_weight = templates.aggregate(Sum('weight'))['weight__sum'] or 1
-        pick = random.randint(0, total_weight-1)
-
-        current = 0
-        chosen = None
-        for tpl in templates:
-            if current + tpl.weight > pick:
-                chosen = tpl
-                break
-            current += tpl.weight
-        if not chosen:
-            chosen = templates.last()
-
-        r = get_redis()
-        balls_key = f"session:{session_id}:balls"
-        raw_balls = r.get(balls_key)
-        if not raw_balls:
-            ball_list = []
-        else:
-            ball_list = json.loads(raw_balls)
-
         new_ball = {
-            "color": chosen.color,
-            "rarity": chosen.rarity,
-            "damage": chosen.base_damage,
-            "speed": chosen.base_attack_speed,
-            "special": chosen.special_option,
-            "is_moving": False,  # etc
+            "x":200,"y":200,
+            "target_x":200,"target_y":200,
+            "color": chosen["color"],
+            "rarity": chosen["rarity"],
+            "damage": chosen["base_damage"],
+            "cooldown":0,
+            "speed": chosen["base_attack_speed"],
+            "special": chosen["special_option"],
         }
-        ball_list.append(new_ball)
-        r.set(balls_key, json.dumps(ball_list))
+        # id 할당 + HSET 을 Lua 한 번으로
+        try:
+            _, ball_count = session_scripts().summon_ball(session_id, new_ball)
+        except SessionStateError as e:
+            if e.code == "OWNED":
+                return forward_to_owner(session_id, {"action":"summon_ball"}, 201)
+            if e.code == "NO_SESSION":
+                return Response({"error":"No session state in Redis"}, status=400)
+            raise
 
         return Response({
-            "message": f"볼 소환: {chosen.color}/{chosen.rarity}",
-            "ball_count": len(ball_list)
+            "message": f"볼 소환: {chosen['color']}/{chosen['rarity']}",
+            "ball_count": ball_count
         }, status=201)
 
 
@@ -130,7 +137,8 @@ class SpawnEnemyView(APIView):
     """
     POST /api/game/spawn_enemy/
     body: { "session_id":3, "stage":10 }
-    => DB EnemyTemplate(stage_min<=stage<=stage_max) -> Redis enemies
+    => DB EnemyTemplate(stage_min<=stage<=stage_max) -> Redis enemies (simulation 형식, id 는 enemy_pool)
+    => 소유자가 돌리는 세션이면 소유자에게 spawn_enemy 로 넘김
     """
     permission_classes = [IsAuthenticated]
 
@@ -142,29 +150,23 @@ class SpawnEnemyView(APIView):
         if not session.is_active:
             return Response({"detail":"session not active"}, status=400)
 
-        candidates = EnemyTemplate.objects.filter(stage_min__lte=stage, stage_max__gte=stage)
-        if not candidates.exists():
+        # 컴파일된 웨이브 계획의 구간 인덱스 조회 (쿼리 없음)
+        candidates = waves.current_schedule().templates_for_stage(stage)
+        if not candidates:
             return Response({"message":"No EnemyTemplate for stage"}, status=200)
 
-        r = get_redis()
-        enemies_key = f"session:{session_id}:enemies"
-        raw = r.get(enemies_key)
-        enemy_list = json.loads(raw) if raw else []
-
-        created_names = []
-        for tpl in candidates:
-            e = {
-                "name": tpl.name,
-                "type": tpl.enemy_type,
-                "hp": tpl.hp,
-                "defense": tpl.defense,
-                "shield": tpl.shield,
-                "is_dead": False
-            }
-            enemy_list.append(e)
-            created_names.append(tpl.name)
-
-        r.set(enemies_key, json.dumps(enemy_list))
+        # 틱이 그대로 돌릴 수 있는 형식 (dist/speed 는 simulation.spawn_enemy 와 같은 규칙)
+        new_enemies = [enemy_fields(tpl) for tpl in candidates]
+        # 기존 리스트 뒤에 원자적으로 이어붙임 (GET/SET 경합 없음)
+        try:
+            session_scripts().spawn_enemies(session_id, new_enemies)
+        except SessionStateError as e:
+            if e.code == "OWNED":
+                return forward_to_owner(session_id, {"action":"spawn_enemy", "stage": stage}, 201)
+            if e.code == "NO_SESSION":
+                return Response({"error":"No session state in Redis"}, status=400)
+            raise
+        created_names = [e["name"] for e in new_enemies]
 
         return Response({
             "message": f"Stage {stage} 적 소환",
@@ -176,7 +178,8 @@ class UpgradeColorView(APIView):
     """
     POST /api/game/upgrade_color/
     body: { "session_id":3, "color":"red" }
-    => Redis color_upgrades[color] += 1
+    => Redis upgrades[color] += 1 (Lua: 존재 확인 + HINCRBY)
+    => 소유자가 돌리는 세션이면 소유자에게 upgrade_color 로 넘김
     """
     permission_classes = [IsAuthenticated]
 
@@ -188,21 +191,21 @@ class UpgradeColorView(APIView):
         if not session.is_active:
             return Response({"detail":"session not active"}, status=400)
 
-        r = get_redis()
-        color_key = f"session:{session_id}:color_upgrades"
-        raw_colors = r.get(color_key)
-        if not raw_colors:
-            return Response({"error":"No color_upgrades in Redis"}, status=400)
-        upgrades = json.loads(raw_colors)
-
-        if color not in upgrades:
+        if not color:
+            return Response({"error":"Invalid color"}, status=400)
+        try:
+            level = session_scripts().upgrade_color(session_id, color)
+        except SessionStateError as e:
+            if e.code == "OWNED":
+                return forward_to_owner(session_id, {"action":"upgrade_color", "color": color}, 200)
+            if e.code == "NO_SESSION":
+                return Response({"error":"No session state in Redis"}, status=400)
+            if e.code == "NO_UPGRADES":
+                return Response({"error":"No color_upgrades in Redis"}, status=400)
             return Response({"error":"Invalid color"}, status=400)
-
-        upgrades[color] += 1
-        r.set(color_key, json.dumps(upgrades))
 
         return Response({
-            "message": f"{color} 업그레이드 +1 => {upgrades[color]}"
+            "message": f"{color} 업그레이드 +1 => {level}"
         }, status=200)
 
 
@@ -210,7 +213,9 @@ class AttackView(APIView):
     """
     POST /api/game/attack/
     body: { "session_id":3 }
-    => Redis: balls + enemies + color_upgrades -> 전투
+    => Redis: balls + enemies + color_upgrades -> 전투 (Lua 스크립트, 원자적)
+    => 소유자가 돌리는 세션은 409: 전투는 매 틱 시뮬레이션이 하고, Redis 에 쓴 결과는
+       다음 체크포인트에 덮어써진다 (넘겨서 돌릴 액션도 없음)
     """
     permission_classes = [IsAuthenticated]
 
@@ -220,57 +225,58 @@ class AttackView(APIView):
         if not session.is_active:
             return Response({"detail":"session not active"}, status=400)
 
-        r = get_redis()
-        balls_key = f"session:{session_id}:balls"
-        enemies_key = f"session:{session_id}:enemies"
-        color_key = f"session:{session_id}:color_upgrades"
+        # 전투 전체를 Redis 안에서 (Lua) => 동시 요청도 업데이트 유실 없음
+        try:
+            attacked, killed = session_scripts().attack(session_id)
+        except SessionStateError as e:
+            if e.code == "OWNED":
+                return Response({"error":"session is running live (combat runs every tick)"}, status=409)
+            return Response({"message":"볼/적/업그레이드 정보 없음"}, status=200)
 
-        raw_balls = r.get(balls_key)
-        raw_enemies = r.get(enemies_key)
-        raw_colors = r.get(color_key)
+        return Response({
+            "message":"Attack done",
+            "attacked_enemies": attacked,
+            "killed_enemies": killed
+        }, status=200)
 
-        if not raw_balls or not raw_enemies or not raw_colors:
-            return Response({"message":"볼/적/업그레이드 정보 없음"}, status=200)
 
-        ball_list = json.loads(raw_balls)
-        enemy_list = json.loads(raw_enemies)
-        color_upgrades = json.loads(raw_colors)
-
-        attacked = []
-        killed = []
-
-        for b in ball_list:
-            color = b["color"]
-            base_dmg = b["damage"]
-            plus = color_upgrades.get(color, 0)
-            total_dmg = base_dmg + plus
-
-            for e in enemy_list:
-                if e["is_dead"]:
-                    continue
-                net_damage = max(0, total_dmg - e["defense"])
-                # shield
-                if net_damage>0 and e["shield"]>0:
-                    if e["shield"]>= net_damage:
-                        e["shield"]-= net_damage
-                        net_damage=0
-                    else:
-                        net_damage-= e["shield"]
-                        e["shield"]=0
-
-                if net_damage>0:
-                    e["hp"]-= net_damage
-                    if e["hp"]<=0:
-                        e["hp"]=0
-                        e["is_dead"]=True
-                        killed.append(e["name"])
-                attacked.append(e["name"])
-
-        # 다시 저장
-        r.set(enemies_key, json.dumps(enemy_list))
+class TickProfileView(APIView):
+    """
+    GET  /api/game/profile/<session_id>/             => 틱 단계별 히스토그램/overrun 요약
+    GET  /api/game/profile/<session_id>/?download=1  => 마지막 cProfile 캡처(.prof) 다운로드
+    POST /api/game/profile/<session_id>/  body: { "seconds":10 } => cProfile 캡처 시작 요청
+    staff 전용
+    """
+    permission_classes = [IsAdminUser]
 
+    def get(self, request, session_id):
+        r = get_redis()
+        if request.query_params.get("download"):
+            path = r.get(profile_result_key(session_id))
+            if not path or not os.path.exists(path):
+                return Response({"error":"No capture for session"}, status=404)
+            return FileResponse(open(path, "rb"), as_attachment=True,
+                                filename=os.path.basename(path))
+
+        raw = r.get(profile_stats_key(session_id))
+        if not raw:
+            return Response({"error":"Session not running"}, status=404)
         return Response({
-            "message":"Attack done",
-            "attacked_enemies": list(set(attacked)),
-            "killed_enemies": list(set(killed))
+            "stats": json.loads(raw),
+            "capture_pending": bool(r.exists(profile_request_key(session_id))),
+            "last_capture": r.get(profile_result_key(session_id)),
         }, status=200)
+
+    def post(self, request, session_id):
+        try:
+            seconds = int(request.data.get("seconds", 10))
+        except (TypeError, ValueError):
+            return Response({"error":"Invalid seconds"}, status=400)
+        seconds = max(1, min(seconds, MAX_CAPTURE_SECONDS))
+
+        r = get_redis()
+        # 세션을 돌리는 consumer가 다음 checkpoint 때 가져감
+        r.set(profile_request_key(session_id), seconds, ex=60)
+        return Response({
+            "message": f"세션 {session_id} 프로파일 캡처 요청 ({seconds}초)"
+        }, status=202)
@@ -0,0 +1,150 @@
+# game/waves.py
+"""
+웨이브 컴파일러: wave_config.py 파라미터 + EnemyTemplate 행 => 스테이지별 불변 스폰 계획.
+
+    schedule = current_schedule()      # sync (템플릿 캐시 사용)
+    plan = schedule.plan(stage)        # LRU 메모이즈
+    tpl = plan.spawns[sec]             # 그 초에 스폰할 EnemySpec (없으면 None)
+
+- 스테이지 -> 템플릿 조회는 구간 인덱스 (stage_min/stage_max 경계 bisect)
+- 계획은 튜플/NamedTuple만 담으므로 세션 간 공유해도 안전
+- 틱 루프/REST 스폰은 계획 조회만 하므로 쿼리도 dict 생성도 없음
+"""
+from bisect import bisect_right
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+from .wave_config import get_stage_info
+
+PLAN_CACHE_SIZE = int(getattr(settings, 'GAME_WAVE_PLAN_CACHE', 256))
+
+
+class EnemySpec(NamedTuple):
+    name: str
+    enemy_type: str
+    hp: int
+    defense: int
+    shield: int
+    stage_min: int = 1
+    stage_max: int = 10**9
+
+
+class WavePlan(NamedTuple):
+    stage: int
+    duration: float
+    spawn_duration: float
+    boss: bool
+    # spawns[sec] = 그 초에 스폰할 EnemySpec (0초는 항상 None)
+    spawns: tuple
+    templates: tuple
+
+    def spawn_at(self, sec) -> Optional[EnemySpec]:
+        return self.spawns[sec] if 0 <= sec < len(self.spawns) else None
+
+
+# DB에 해당 스테이지 템플릿이 없을 때 쓰는 기본 적 (예전 하드코딩 값)
+DEFAULT_NORMALS = (
+    EnemySpec("Slime", "normal", 10, 1, 0),
+    EnemySpec("Wolf", "normal", 10, 1, 0),
+    EnemySpec("Goblin", "normal", 10, 1, 0),
+)
+DEFAULT_BOSS = EnemySpec("Boss", "boss", 200, 10, 10)
+
+
+class StageIndex:
+    """
+    구간 인덱스. 모든 stage_min, stage_max+1 을 경계로 잘라
+    구간마다 활성 템플릿 튜플을 미리 계산해 둔다 (template_cache.enemy_templates_for_stage)
+    => 조회는 bisect 한 번
+    """
+
+    def __init__(self, templates):
+        from .template_cache import enemy_templates_for_stage
+        points = sorted({t["stage_min"] for t in templates} | {t["stage_max"] + 1 for t in templates})
+        self.points = points
+        self.segments = [
+            tuple(spec_from_template(t) for t in enemy_templates_for_stage(start, templates))
+            for start in points
+        ]
+
+    def lookup(self, stage):
+        i = bisect_right(self.points, stage) - 1
+        return self.segments[i] if i >= 0 else ()
+
+
+def spec_from_template(t):
+    return EnemySpec(t["name"], t["enemy_type"], t["hp"], t["defense"], t["shield"],
+                     t["stage_min"], t["stage_max"])
+
+
+class WaveSchedule:
+    def __init__(self, templates=()):
+        self.index = StageIndex(list(templates))
+        # 스테이지가 끝없이 올라가므로 크기 제한
+        self.plan = lru_cache(maxsize=PLAN_CACHE_SIZE)(self.compile)
+
+    def templates_for_stage(self, stage):
+        return self.index.lookup(stage)
+
+    def compile(self, stage):
+        info = get_stage_info(stage)
+        active = self.index.lookup(stage)
+        normals = tuple(s for s in active if s.enemy_type != "boss") or DEFAULT_NORMALS
+        bosses = tuple(s for s in active if s.enemy_type == "boss") or (DEFAULT_BOSS,)
+
+        # 1초 ~ spawn_duration초 사이 매초 한 마리, 템플릿은 순서대로 돌아가며
+        last_sec = int(info["spawn_duration"])
+        spawns = [None] * (last_sec + 1)
+        for sec in range(1, last_sec + 1):
+            spawns[sec] = normals[(sec - 1) % len(normals)]
+        if info["boss"] and last_sec >= 1:
+            spawns[1] = bosses[0]
+
+        return WavePlan(
+            stage=stage,
+            duration=info["duration"],
+            spawn_duration=info["spawn_duration"],
+            boss=info["boss"],
+            spawns=tuple(spawns),
+            templates=active,
+        )
+
+
+_default_schedule = None
+_current = (None, None)
+
+
+def default_schedule():
+    """
+    DB 없이 (headless/벤치마크) 쓰는 기본 계획
+    """
+    global _default_schedule
+    if _default_schedule is None:
+        _default_schedule = WaveSchedule()
+    return _default_schedule
+
+
+def current_schedule():
+    """
+    sync 전용. 템플릿 캐시가 바뀌었을 때만 다시 컴파일
+    """
+    from . import template_cache
+    global _current
+    templates = template_cache.get_enemy_templates()
+    if _current[0] is not templates:
+        _current = (templates, WaveSchedule(templates))
+    return _current[1]
+
+
+def cached_schedule():
+    """
+    DB/Redis 접근 없이 확인 (async 코드용). 템플릿 재확인 시점이 지났거나 아직 컴파일 전이면 None
+    => 그때만 current_schedule 을 스레드에서
+    """
+    from . import template_cache
+    templates = template_cache.cached_enemy_templates()
+    if templates is None or _current[0] is not templates:
+        return None
+    return _current[1]